@@ -0,0 +1,105 @@
+"""Mide hit rate, latencia y tokens de /chat con y sin cache, usando el Gemini local
+
+Uso:
+    python bench_cache.py [--mensajes 300] [--semilla 0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+os.environ["GEMINI_LOCAL"] = "1"
+
+import gemini_local  # noqa: E402
+from app import app, cache, crear_prompt_nutricional, INSTRUCCION_SISTEMA  # noqa: E402
+from cliente_gemini import ClienteGemini  # noqa: E402
+
+# Preguntas frecuentes con variantes de redacción (mismo significado)
+PREGUNTAS = [
+    ["¿Cuántas calorías tiene la manzana?", "calorias de una manzana", "Calorías manzana"],
+    ["¿Qué alimentos tienen más vitamina C?", "alimentos con mas vitamina c", "vitamina C alimentos"],
+    ["¿Es bueno el aguacate para bajar de peso?", "aguacate bajar peso es bueno"],
+    ["¿Cuánta proteína tiene el maíz?", "proteina del maiz", "Proteína maíz"],
+    ["Dame ideas de snacks saludables", "ideas snacks saludables"],
+    ["¿Cuánta fibra tiene la pera?", "fibra pera"],
+    ["¿Qué combina bien con la banana?", "combina bien banana"],
+    ["¿La sandía hidrata?", "sandia hidrata"],
+]
+
+
+def generar_carga(n, semilla):
+    rng = random.Random(semilla)
+    # Distribución tipo Zipf: unas pocas preguntas concentran la mayoría del tráfico
+    pesos = [1 / (i + 1) for i in range(len(PREGUNTAS))]
+    mensajes = []
+    for _ in range(n):
+        variantes = rng.choices(PREGUNTAS, weights=pesos)[0]
+        mensajes.append(rng.choice(variantes))
+    # Algunas preguntas únicas que nunca se repiten
+    for i in range(n // 10):
+        mensajes.insert(rng.randrange(len(mensajes)), f"pregunta única número {i} sobre el mango")
+    return mensajes
+
+
+async def escenario_anterior(mensajes):
+    """Como antes: prompt completo (datos + instrucciones) en cada llamada y sin cache"""
+    cliente = ClienteGemini("local", "gemini-local", base_url="http://gemini-local",
+                            transport=httpx.ASGITransport(app=gemini_local.app))
+    llamadas_inicio = gemini_local.estado["llamadas"]
+    latencias, tokens, cacheados = [], 0, 0
+    for mensaje in mensajes:
+        inicio = time.perf_counter()
+        _, uso = await cliente.generar(INSTRUCCION_SISTEMA + crear_prompt_nutricional(mensaje))
+        latencias.append(time.perf_counter() - inicio)
+        tokens += uso["totalTokenCount"]
+        cacheados += uso["cachedContentTokenCount"]
+    await cliente.cerrar()
+    return latencias, tokens, cacheados, gemini_local.estado["llamadas"] - llamadas_inicio
+
+
+async def escenario_actual(mensajes):
+    """Endpoint /chat real: system instruction fija + cache de respuestas"""
+    llamadas_inicio = gemini_local.estado["llamadas"]
+    latencias = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://asistente") as http:
+        for mensaje in mensajes:
+            inicio = time.perf_counter()
+            await http.post('/chat', json={'mensaje': mensaje})
+            latencias.append(time.perf_counter() - inicio)
+    return latencias, gemini_local.estado["llamadas"] - llamadas_inicio
+
+
+def resumen(nombre, latencias):
+    latencias_ms = sorted(l * 1000 for l in latencias)
+    p95 = latencias_ms[int(len(latencias_ms) * 0.95) - 1]
+    print(f"{nombre:<10} media {statistics.mean(latencias_ms):7.1f} ms   "
+          f"p50 {statistics.median(latencias_ms):7.1f} ms   p95 {p95:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mensajes', type=int, default=300)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    mensajes = generar_carga(args.mensajes, args.semilla)
+    print(f"Mensajes: {len(mensajes)}\n")
+
+    lat_antes, tokens_antes, cacheados_antes, llamadas_antes = asyncio.run(escenario_anterior(mensajes))
+    lat_ahora, llamadas_ahora = asyncio.run(escenario_actual(mensajes))
+    stats = cache.estadisticas()
+
+    resumen("anterior", lat_antes)
+    resumen("actual", lat_ahora)
+    print(f"\nLlamadas a Gemini: {llamadas_antes} -> {llamadas_ahora}")
+    print(f"Hit rate de la cache: {stats['hit_rate'] * 100:.1f}%")
+    print(f"Tokens totales (anterior): {tokens_antes} ({cacheados_antes} reutilizados)")
+    print(f"Tokens ahorrados por la cache: {stats['tokens_ahorrados']}")
+
+
+if __name__ == '__main__':
+    main()
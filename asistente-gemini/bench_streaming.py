@@ -0,0 +1,110 @@
+"""Mide tiempo hasta el primer token y chats concurrentes sostenidos contra un Gemini falso
+
+Arranca gemini_local.py y app.py con uvicorn (la cache se desactiva para que cada chat
+llegue a "Gemini") y lanza N chats simultáneos por /chat/stream y por /chat.
+
+Uso:
+    python bench_streaming.py [--concurrencias 1 8 32] [--chats 64]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+PUERTO_GEMINI = 5101
+PUERTO_APP = 5102
+
+
+def lanzar(modulo, puerto, entorno=None):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{modulo}:app", "--port", str(puerto), "--log-level", "warning"],
+        env={**os.environ, **(entorno or {})},
+    )
+
+
+async def esperar_servidor(url, timeout=30):
+    limite = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.perf_counter() < limite:
+            try:
+                await http.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"El servidor {url} no arrancó")
+
+
+async def chat_stream(http, mensaje):
+    inicio = time.perf_counter()
+    primer_token = None
+    async with http.stream("POST", "/chat/stream", json={"mensaje": mensaje}) as respuesta:
+        async for linea in respuesta.aiter_lines():
+            if primer_token is None and linea.startswith("data:") and '"texto"' in linea:
+                primer_token = time.perf_counter() - inicio
+    return primer_token, time.perf_counter() - inicio
+
+
+async def chat_completo(http, mensaje):
+    inicio = time.perf_counter()
+    await http.post("/chat", json={"mensaje": mensaje})
+    total = time.perf_counter() - inicio
+    # Sin streaming el primer texto llega con la respuesta completa
+    return total, total
+
+
+async def ejecutar(modo, concurrencia, chats):
+    limites = httpx.Limits(max_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO_APP}", timeout=120, limits=limites) as http:
+        semaforo = asyncio.Semaphore(concurrencia)
+        funcion = chat_stream if modo == "stream" else chat_completo
+
+        async def uno(i):
+            async with semaforo:
+                return await funcion(http, f"pregunta {i} sobre la manzana")
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*[uno(i) for i in range(chats)])
+        duracion = time.perf_counter() - inicio
+
+    ttft = sorted(r[0] * 1000 for r in resultados if r[0] is not None)
+    totales = sorted(r[1] * 1000 for r in resultados)
+    print(f"{modo:<7} concurrencia {concurrencia:>3}: TTFT p50 {statistics.median(ttft):7.1f} ms  "
+          f"p95 {ttft[int(len(ttft) * 0.95) - 1]:7.1f} ms | total p50 {statistics.median(totales):7.1f} ms | "
+          f"{chats / duracion:6.1f} chats/s")
+
+
+async def principal(args):
+    await esperar_servidor(f"http://127.0.0.1:{PUERTO_GEMINI}/estadisticas")
+    await esperar_servidor(f"http://127.0.0.1:{PUERTO_APP}/cache/stats")
+    for concurrencia in args.concurrencias:
+        for modo in ("stream", "chat"):
+            await ejecutar(modo, concurrencia, args.chats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--chats", type=int, default=64)
+    args = parser.parse_args()
+
+    gemini = lanzar("gemini_local", PUERTO_GEMINI)
+    asistente = lanzar("app", PUERTO_APP, {
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{PUERTO_GEMINI}",
+        "CHAT_CACHE_SIZE": "0",
+        "GEMINI_MAX_CONCURRENCIA": str(max(args.concurrencias)),
+    })
+    try:
+        asyncio.run(principal(args))
+    finally:
+        for proceso in (asistente, gemini):
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Palabras que no cambian el sentido de la pregunta
+STOPWORDS = {
+    "a", "al", "de", "del", "el", "la", "las", "los", "un", "una", "unos", "unas",
+    "y", "o", "en", "por", "para", "con", "que", "me", "mi", "se", "es", "son",
+    "hay", "tiene", "tienen", "cuanto", "cuanta", "cuantos", "cuantas", "cual",
+    "cuales", "puedes", "podrias", "dime", "decirme", "sobre", "porfa", "favor",
+    "hola", "gracias", "the", "of", "an", "is", "are", "how", "much", "many",
+    "does", "do", "what", "in", "please",
+}
+
+
+def normalizar_pregunta(texto):
+    """Clave de cache: sin tildes ni signos, sin palabras vacías y con las palabras ordenadas
+
+    Así "¿Cuántas calorías tiene la manzana?" y "calorias de una manzana" comparten respuesta.
+    """
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    palabras = re.findall(r"[a-z0-9]+", texto)
+    significativas = sorted({p for p in palabras if p not in STOPWORDS})
+    return " ".join(significativas) or " ".join(palabras)
+
+
+class CacheRespuestas:
+    """Cache LRU con TTL de respuestas de Gemini indexada por la pregunta normalizada
+
+    `contexto` identifica todo lo demás que decide la respuesta (base nutricional,
+    instrucción de sistema, modelo): si cambia, las respuestas anteriores ya no coinciden.
+    """
+
+    def __init__(self, max_entradas=1000, ttl=3600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.tokens_ahorrados = 0
+        self._datos = OrderedDict()  # clave -> (expira, respuesta, tokens)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(pregunta, contexto=""):
+        return f"{contexto}|{normalizar_pregunta(pregunta)}"
+
+    def obtener(self, pregunta, contexto=""):
+        clave = self.clave(pregunta, contexto)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                expira, respuesta, tokens = entrada
+                if expira > time.time():
+                    self._datos.move_to_end(clave)
+                    self.hits += 1
+                    self.tokens_ahorrados += tokens
+                    return respuesta
+                del self._datos[clave]
+            self.misses += 1
+            return None
+
+    def guardar(self, pregunta, respuesta, tokens=0, contexto=""):
+        clave = self.clave(pregunta, contexto)
+        with self._lock:
+            self._datos[clave] = (time.time() + self.ttl, respuesta, tokens)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "tokens_ahorrados": self.tokens_ahorrados,
+            "entradas": len(self._datos),
+            "max_entradas": self.max_entradas,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import random
+import httpx
+
+URL_GEMINI = "https://generativelanguage.googleapis.com"
+
+
+class ErrorGemini(Exception):
+    pass
+
+
+class ClienteGemini:
+    """Cliente asíncrono de la API REST de Gemini con conexiones reutilizadas
+
+    - Un único httpx.AsyncClient (keep-alive) para todas las peticiones
+    - Semáforo que limita las llamadas simultáneas a Gemini
+    - Timeout por petición y reintentos con backoff exponencial con jitter
+    """
+
+    def __init__(self, api_key, modelo, system_instruction=None, base_url=URL_GEMINI,
+                 max_concurrencia=8, timeout=30.0, reintentos=3, backoff_base=0.5, transport=None):
+        self.api_key = api_key
+        self.modelo = modelo if modelo.startswith("models/") else f"models/{modelo}"
+        self.system_instruction = system_instruction
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self._semaforo = asyncio.Semaphore(max_concurrencia)
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_concurrencia, max_keepalive_connections=max_concurrencia),
+            transport=transport,
+        )
+
+    async def cerrar(self):
+        await self._http.aclose()
+
+    def _cuerpo(self, prompt):
+        cuerpo = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if self.system_instruction:
+            cuerpo["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        return cuerpo
+
+    @staticmethod
+    def _reintentable(error):
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    async def _esperar_reintento(self, intento):
+        # "Full jitter": espera aleatoria entre 0 y base * 2^intento
+        await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** intento)))
+
+    @staticmethod
+    def _texto(respuesta):
+        partes = respuesta.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+        return "".join(parte.get("text", "") for parte in partes)
+
+    async def generar(self, prompt):
+        """Respuesta completa: devuelve (texto, usage_metadata)"""
+        async with self._semaforo:
+            for intento in range(self.reintentos + 1):
+                try:
+                    respuesta = await self._http.post(
+                        f"/v1beta/{self.modelo}:generateContent",
+                        params={"key": self.api_key},
+                        json=self._cuerpo(prompt),
+                    )
+                    respuesta.raise_for_status()
+                    datos = respuesta.json()
+                    return self._texto(datos), datos.get("usageMetadata", {})
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    if intento == self.reintentos or not self._reintentable(e):
+                        raise ErrorGemini(str(e)) from e
+                    await self._esperar_reintento(intento)
+
+    async def generar_stream(self, prompt, uso=None):
+        """Genera los fragmentos de texto a medida que Gemini los produce (SSE)
+
+        Solo se reintenta si falla antes del primer fragmento; después ya se envió texto al cliente.
+        Si se pasa el dict `uso`, al terminar contiene el usage_metadata de la respuesta.
+        """
+        async with self._semaforo:
+            for intento in range(self.reintentos + 1):
+                emitido = False
+                try:
+                    async with self._http.stream(
+                        "POST",
+                        f"/v1beta/{self.modelo}:streamGenerateContent",
+                        params={"key": self.api_key, "alt": "sse"},
+                        json=self._cuerpo(prompt),
+                    ) as respuesta:
+                        respuesta.raise_for_status()
+                        async for linea in respuesta.aiter_lines():
+                            if not linea.startswith("data:"):
+                                continue
+                            datos = json.loads(linea[5:])
+                            if uso is not None and "usageMetadata" in datos:
+                                # Cada fragmento trae el uso acumulado: vale el último
+                                uso.update(datos["usageMetadata"])
+                            texto = self._texto(datos)
+                            if texto:
+                                emitido = True
+                                yield texto
+                    return
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    if emitido or intento == self.reintentos or not self._reintentable(e):
+                        raise ErrorGemini(str(e)) from e
+                    await self._esperar_reintento(intento)
+
+    async def listar_modelos(self):
+        respuesta = await self._http.get("/v1beta/models", params={"key": self.api_key})
+        respuesta.raise_for_status()
+        return [modelo["name"] for modelo in respuesta.json().get("models", [])]
@@ -0,0 +1,98 @@
+"""Servidor falso de Gemini para medir sin red ni API key
+
+Implementa los endpoints REST usados por cliente_gemini.py (generateContent,
+streamGenerateContent con SSE y models) con una latencia proporcional a los tokens.
+Imita el cacheo implícito de Gemini: si la instrucción de sistema se repite entre
+llamadas, sus tokens se cuentan como cacheados y no suman latencia.
+
+Uso como servidor:
+    uvicorn gemini_local:app --port 5101
+"""
+import asyncio
+import json
+import os
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+MS_POR_TOKEN_ENTRADA = float(os.getenv("FAKE_MS_POR_TOKEN_ENTRADA", "0.05"))
+MS_POR_TOKEN_SALIDA = float(os.getenv("FAKE_MS_POR_TOKEN_SALIDA", "2.0"))
+TOKENS_RESPUESTA = int(os.getenv("FAKE_TOKENS_RESPUESTA", "150"))
+TOKENS_POR_FRAGMENTO = 10
+
+app = FastAPI()
+estado = {"llamadas": 0, "prefijo_cacheado": None}
+
+
+def contar_tokens(texto):
+    # Aproximación habitual: ~4 caracteres por token
+    return max(1, len(texto) // 4) if texto else 0
+
+
+def leer_peticion(cuerpo):
+    sistema = "".join(p.get("text", "") for p in cuerpo.get("systemInstruction", {}).get("parts", []))
+    mensaje = "".join(p.get("text", "") for c in cuerpo.get("contents", []) for p in c.get("parts", []))
+    return sistema, mensaje
+
+
+def uso_tokens(sistema, mensaje):
+    estado["llamadas"] += 1
+    cacheados = contar_tokens(sistema) if sistema and estado["prefijo_cacheado"] == sistema else 0
+    estado["prefijo_cacheado"] = sistema
+    prompt = contar_tokens(sistema) + contar_tokens(mensaje)
+    return {
+        "promptTokenCount": prompt,
+        "cachedContentTokenCount": cacheados,
+        "candidatesTokenCount": TOKENS_RESPUESTA,
+        "totalTokenCount": prompt + TOKENS_RESPUESTA,
+    }
+
+
+def fragmento(texto, uso=None):
+    datos = {"candidates": [{"content": {"role": "model", "parts": [{"text": texto}]}}]}
+    if uso:
+        datos["usageMetadata"] = uso
+    return datos
+
+
+def texto_respuesta(mensaje):
+    return f"🍎 Respuesta simulada a: {mensaje.strip()[:80]}"
+
+
+@app.post("/v1beta/models/{modelo}:generateContent")
+async def generate_content(modelo: str, request: Request):
+    sistema, mensaje = leer_peticion(await request.json())
+    uso = uso_tokens(sistema, mensaje)
+    procesados = uso["promptTokenCount"] - uso["cachedContentTokenCount"]
+    await asyncio.sleep((procesados * MS_POR_TOKEN_ENTRADA + TOKENS_RESPUESTA * MS_POR_TOKEN_SALIDA) / 1000)
+    return fragmento(texto_respuesta(mensaje), uso)
+
+
+@app.post("/v1beta/models/{modelo}:streamGenerateContent")
+async def stream_generate_content(modelo: str, request: Request):
+    sistema, mensaje = leer_peticion(await request.json())
+    uso = uso_tokens(sistema, mensaje)
+    procesados = uso["promptTokenCount"] - uso["cachedContentTokenCount"]
+    palabras = texto_respuesta(mensaje).split(" ")
+    num_fragmentos = max(1, TOKENS_RESPUESTA // TOKENS_POR_FRAGMENTO)
+
+    async def generar():
+        # Primero se procesa el prompt (tiempo hasta el primer token), luego se emite la salida
+        await asyncio.sleep(procesados * MS_POR_TOKEN_ENTRADA / 1000)
+        for i in range(num_fragmentos):
+            await asyncio.sleep(TOKENS_POR_FRAGMENTO * MS_POR_TOKEN_SALIDA / 1000)
+            trozo = palabras[i * len(palabras) // num_fragmentos:(i + 1) * len(palabras) // num_fragmentos]
+            texto = " ".join(trozo) + (" " if i < num_fragmentos - 1 else "")
+            datos = fragmento(texto, uso if i == num_fragmentos - 1 else None)
+            yield f"data: {json.dumps(datos, ensure_ascii=False)}\r\n\r\n"
+
+    return StreamingResponse(generar(), media_type="text/event-stream")
+
+
+@app.get("/v1beta/models")
+async def listar_modelos():
+    return {"models": [{"name": "models/gemini-2.5-flash"}, {"name": "models/gemini-local"}]}
+
+
+@app.get("/estadisticas")
+async def estadisticas():
+    return {"llamadas": estado["llamadas"]}
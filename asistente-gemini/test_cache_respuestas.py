@@ -0,0 +1,63 @@
+import pytest
+import cache_respuestas
+from cache_respuestas import CacheRespuestas, normalizar_pregunta
+
+
+@pytest.mark.parametrize("a, b", [
+    ("¿Cuántas calorías tiene la manzana?", "calorias de una manzana"),
+    ("CALORÍAS MANZANA!!!", "manzana calorias"),
+    ("How many calories in an apple?", "apple calories"),
+    ("proteína   del\tplátano", "platano proteina"),
+])
+def test_preguntas_equivalentes_comparten_clave(a, b):
+    assert normalizar_pregunta(a) == normalizar_pregunta(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("calorías de la manzana", "calorías del plátano"),
+    ("calorías de la manzana", "proteína de la manzana"),
+    ("100 g de manzana", "200 g de manzana"),
+])
+def test_preguntas_distintas_no_comparten_clave(a, b):
+    assert normalizar_pregunta(a) != normalizar_pregunta(b)
+
+
+def test_solo_palabras_vacias_no_da_clave_vacia():
+    # Sin palabras significativas se usan todas, en su orden
+    assert normalizar_pregunta("¿Qué es?") == "que es"
+
+
+def test_contexto_separa_las_respuestas():
+    cache = CacheRespuestas()
+    cache.guardar("calorías de la manzana", "52 kcal", contexto="modelo:1:abc")
+
+    assert cache.obtener("manzana calorías", contexto="modelo:1:abc") == "52 kcal"
+    # Otra versión de la base nutricional o de la instrucción de sistema
+    assert cache.obtener("manzana calorías", contexto="modelo:2:abc") is None
+
+
+def test_tokens_ahorrados_y_estadisticas():
+    cache = CacheRespuestas()
+    cache.guardar("calorías de la manzana", "52 kcal", tokens=120)
+    cache.obtener("calorias manzana")
+    cache.obtener("calorias manzana")
+    cache.obtener("proteina manzana")
+
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["hits"], estadisticas["misses"]) == (2, 1)
+    assert estadisticas["tokens_ahorrados"] == 240
+
+
+def test_lru_y_ttl(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_respuestas.time, "time", lambda: ahora[0])
+    cache = CacheRespuestas(max_entradas=2, ttl=60)
+    cache.guardar("manzana", "a")
+    cache.guardar("platano", "b")
+    cache.obtener("manzana")
+    cache.guardar("kiwi", "c")
+    assert cache.obtener("platano") is None
+
+    ahora[0] += 61
+    assert cache.obtener("manzana") is None
+    assert cache.estadisticas()["entradas"] == 1
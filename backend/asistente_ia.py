@@ -1,50 +1,27 @@
-import openai
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+import asyncio
 import json
+import logging
+import os
+import sys
+import time
+import httpx
+from buscador_alimentos import buscador
+from cliente_llm import ClienteLLM, PresupuestoExcedido, tokens_mensajes
 
-# Configurar OpenAI (necesitas API key)
-# openai.api_key = "tu-api-key-aqui"
+# Base nutricional compartida con el asistente Gemini (comun/nutricion.csv)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "comun"))
+from nutricion import tabla
+from metricas import registro
+
+logger = logging.getLogger("uvicorn.error")
 
 class ChatMessage(BaseModel):
     message: str
 
-# Base de datos nutricional exacta para las 20 clases del modelo
-nutricion_completa = {
-    "Apple 10": {"calorias": 52, "carbs": 14, "proteina": 0.3, "grasa": 0.2, "fibra": 2.4, "vitamina_c": 4.6},
-    "Banana 1": {"calorias": 89, "carbs": 23, "proteina": 1.1, "grasa": 0.3, "fibra": 2.6, "potasio": 358},
-    "Orange 1": {"calorias": 47, "carbs": 12, "proteina": 0.9, "grasa": 0.1, "fibra": 2.4, "vitamina_c": 53.2},
-    "Tomato 1": {"calorias": 18, "carbs": 3.9, "proteina": 0.9, "grasa": 0.2, "fibra": 1.2, "licopeno": "alto"},
-    "Carrot 1": {"calorias": 41, "carbs": 10, "proteina": 0.9, "grasa": 0.2, "fibra": 2.8, "vitamina_a": "muy_alto"},
-    "Cucumber 1": {"calorias": 16, "carbs": 4, "proteina": 0.7, "grasa": 0.1, "fibra": 0.5, "agua": "95%"},
-    "Onion 2": {"calorias": 40, "carbs": 9, "proteina": 1.1, "grasa": 0.1, "fibra": 1.7, "antioxidantes": "alto"},
-    "Peach 1": {"calorias": 39, "carbs": 10, "proteina": 0.9, "grasa": 0.3, "fibra": 1.5, "vitamina_a": "alto"},
-    "Pear 1": {"calorias": 57, "carbs": 15, "proteina": 0.4, "grasa": 0.1, "fibra": 3.1, "vitamina_k": "alto"},
-    "Cherry 1": {"calorias": 63, "carbs": 16, "proteina": 1.1, "grasa": 0.2, "fibra": 2.1, "antioxidantes": "muy_alto"},
-    "Grape Blue 1": {"calorias": 62, "carbs": 16, "proteina": 0.6, "grasa": 0.2, "fibra": 0.9, "resveratrol": "alto"},
-    "Pepper Green 1": {"calorias": 31, "carbs": 7, "proteina": 1, "grasa": 0.3, "fibra": 2.5, "vitamina_c": "muy_alto"},
-    "Potato Red 1": {"calorias": 77, "carbs": 17, "proteina": 2, "grasa": 0.1, "fibra": 2.2, "potasio": "alto"},
-    "Avocado 1": {"calorias": 160, "carbs": 9, "proteina": 2, "grasa": 15, "fibra": 7, "grasas_saludables": "muy_alto"},
-    "Mango 1": {"calorias": 60, "carbs": 15, "proteina": 0.8, "grasa": 0.4, "fibra": 1.6, "vitamina_a": "muy_alto"},
-    "Strawberry 1": {"calorias": 32, "carbs": 8, "proteina": 0.7, "grasa": 0.3, "fibra": 2, "vitamina_c": "muy_alto"},
-    "Lemon 1": {"calorias": 17, "carbs": 5, "proteina": 0.6, "grasa": 0.2, "fibra": 1.6, "vitamina_c": "extremo"},
-    "Watermelon 1": {"calorias": 30, "carbs": 8, "proteina": 0.6, "grasa": 0.2, "fibra": 0.4, "agua": "92%"},
-    "Corn 1": {"calorias": 86, "carbs": 19, "proteina": 3.3, "grasa": 1.4, "fibra": 2.7, "antioxidantes": "alto"},
-    "Eggplant 1": {"calorias": 25, "carbs": 6, "proteina": 1, "grasa": 0.2, "fibra": 3, "antioxidantes": "alto"}
-}
-
-def crear_prompt_nutricional(mensaje_usuario, alimento_detectado=None):
-    """Crea un prompt inteligente para el asistente nutricional"""
-    
-    prompt = f"""
-Eres un asistente nutricional experto y amigable. Tu trabajo es ayudar a las personas con información nutricional precisa y consejos de salud.
-
-Base de datos nutricional disponible:
-{json.dumps(nutricion_completa, indent=2)}
-
-Mensaje del usuario: "{mensaje_usuario}"
-
-{f"Alimento detectado en imagen: {alimento_detectado}" if alimento_detectado else ""}
+# Instrucciones fijas: van como mensaje de sistema y no cambian entre llamadas
+INSTRUCCIONES_SISTEMA = """Eres un asistente nutricional experto y amigable. Tu trabajo es ayudar a las personas con información nutricional precisa y consejos de salud.
 
 Instrucciones:
 1. Responde de manera conversacional y amigable
@@ -53,31 +30,133 @@ Instrucciones:
 4. Si mencionan un alimento de la base de datos, incluye sus valores nutricionales
 5. Sugiere combinaciones saludables cuando sea apropiado
 6. Usa emojis para hacer la respuesta más atractiva
-7. Mantén las respuestas concisas pero informativas
-
-Respuesta:
-"""
-    return prompt
+7. Mantén las respuestas concisas pero informativas"""
+
+# Cliente LLM compatible con OpenAI; sin LLM_BASE_URL ni LLM_LOCAL se usa solo la simulación
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_LOCAL = os.getenv("LLM_LOCAL") == "1"
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_MAX_CONCURRENCIA = int(os.getenv("LLM_MAX_CONCURRENCIA", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+# Presupuesto de tokens por petición y SLO de latencia antes de caer a la simulación
+LLM_MAX_PROMPT_TOKENS = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "800"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "500"))
+LLM_SLO_MS = float(os.getenv("LLM_SLO_MS", "3000"))
+
+_cliente = None
+fallbacks = {"sin_llm": 0, "slo": 0, "presupuesto": 0, "error": 0}
+
+duracion_llm = registro.histograma(
+    "llm_duracion_segundos", "Tiempo de chat_con_ia por resultado (ok o motivo del fallback)", ("resultado",))
+registro.funcion("llm_fallbacks_total", "Respuestas simuladas en lugar del LLM, por motivo",
+                 lambda: {(motivo,): n for motivo, n in fallbacks.items()}, tipo="counter", etiquetas=("motivo",))
+registro.funcion("llm_llamadas_total", "Peticiones al cliente LLM y llamadas reales al servidor",
+                 lambda: {("peticion",): _cliente.peticiones, ("llamada",): _cliente.llamadas,
+                          ("coalescida",): _cliente.coalescidas} if _cliente is not None else None,
+                 tipo="counter", etiquetas=("tipo",))
+registro.funcion("llm_tokens_total", "Tokens consumidos en el LLM",
+                 lambda: {("prompt",): _cliente.tokens_prompt, ("respuesta",): _cliente.tokens_respuesta}
+                 if _cliente is not None else None, tipo="counter", etiquetas=("tipo",))
+
+def obtener_cliente():
+    global _cliente
+    if _cliente is None and (LLM_BASE_URL or LLM_LOCAL):
+        transport = None
+        if LLM_LOCAL:
+            import llm_local
+            transport = httpx.ASGITransport(app=llm_local.app)
+        _cliente = ClienteLLM(
+            LLM_BASE_URL or "http://llm-local",
+            api_key=LLM_API_KEY,
+            modelo=LLM_MODEL,
+            max_concurrencia=LLM_MAX_CONCURRENCIA,
+            timeout=LLM_TIMEOUT,
+            max_tokens_prompt=LLM_MAX_PROMPT_TOKENS,
+            max_tokens_respuesta=LLM_MAX_TOKENS,
+            transport=transport,
+        )
+    return _cliente
+
+async def cerrar_cliente():
+    global _cliente
+    if _cliente is not None:
+        await _cliente.cerrar()
+        _cliente = None
+
+def alimentos_relevantes(mensaje_usuario, alimento_detectado=None):
+    """Claves de la base nutricional que aplican a la consulta, la detectada primero"""
+    claves = []
+    if alimento_detectado:
+        clave = buscador.resolver(alimento_detectado)
+        if clave:
+            claves.append(clave)
+    for clave in buscador.buscar(mensaje_usuario):
+        if clave not in claves:
+            claves.append(clave)
+    return [clave for clave in claves if clave in tabla]
+
+def crear_prompt_nutricional(mensaje_usuario, alimento_detectado=None, max_tokens=None):
+    """Crea los mensajes de chat con solo las filas nutricionales relevantes
+
+    Si se pasa max_tokens, se descartan las filas menos relevantes hasta que el prompt quepa.
+    """
+    claves = alimentos_relevantes(mensaje_usuario, alimento_detectado)
+
+    while True:
+        if claves:
+            filas = "\n".join(
+                f"{clave}: {json.dumps(tabla.registro(clave), ensure_ascii=False, separators=(',', ':'))}"
+                for clave in claves
+            )
+            contexto = f"Datos nutricionales por 100g:\n{filas}"
+        else:
+            contexto = f"Alimentos en la base de datos: {', '.join(tabla.nombres)}"
+
+        detectado = f"Alimento detectado en imagen: {alimento_detectado}\n" if alimento_detectado else ""
+        usuario = f'{contexto}\n\n{detectado}Mensaje del usuario: "{mensaje_usuario}"'
+        mensajes = [
+            {"role": "system", "content": INSTRUCCIONES_SISTEMA},
+            {"role": "user", "content": usuario},
+        ]
+        if max_tokens is None or not claves or tokens_mensajes(mensajes) <= max_tokens:
+            return mensajes
+        claves = claves[:-1]
 
 async def chat_con_ia(mensaje: str, alimento_detectado=None):
-    """Función para chat con IA usando OpenAI"""
-    try:
-        prompt = crear_prompt_nutricional(mensaje, alimento_detectado)
-        
-        # Comentado porque necesitas API key
-        # response = openai.ChatCompletion.create(
-        #     model="gpt-3.5-turbo",
-        #     messages=[{"role": "user", "content": prompt}],
-        #     max_tokens=500,
-        #     temperature=0.7
-        # )
-        # return response.choices[0].message.content
-        
-        # Simulación de respuesta IA (para demo sin API key)
+    """Chat con el LLM; cae a la simulación si no hay LLM, se excede el presupuesto o el SLO"""
+    cliente = obtener_cliente()
+    if cliente is None:
+        fallbacks["sin_llm"] += 1
         return simular_respuesta_ia(mensaje, alimento_detectado)
-        
+
+    inicio = time.perf_counter()
+    try:
+        mensajes = crear_prompt_nutricional(mensaje, alimento_detectado, cliente.max_tokens_prompt)
+        texto, _ = await asyncio.wait_for(cliente.completar(mensajes), LLM_SLO_MS / 1000)
+        duracion_llm.observar(time.perf_counter() - inicio, "ok")
+        return texto
+    except asyncio.TimeoutError:
+        motivo = "slo"
+        logger.warning("LLM superó el SLO de %.0f ms; respuesta simulada", LLM_SLO_MS)
+    except PresupuestoExcedido as e:
+        motivo = "presupuesto"
+        logger.warning("%s; respuesta simulada", e)
     except Exception as e:
-        return f"Lo siento, hubo un error procesando tu consulta: {str(e)}"
+        motivo = "error"
+        logger.warning("Error del LLM (%s); respuesta simulada", e)
+
+    fallbacks[motivo] += 1
+    duracion_llm.observar(time.perf_counter() - inicio, motivo)
+    return simular_respuesta_ia(mensaje, alimento_detectado)
+
+def estadisticas_llm():
+    cliente = obtener_cliente()
+    return {
+        "llm": cliente.estadisticas() if cliente is not None else None,
+        "slo_ms": LLM_SLO_MS,
+        "fallbacks": dict(fallbacks),
+    }
 
 def simular_respuesta_ia(mensaje: str, alimento_detectado=None):
     """Simulación de IA más inteligente que la implementación básica"""
@@ -95,24 +174,27 @@ def simular_respuesta_ia(mensaje: str, alimento_detectado=None):
     else:
         return generar_respuesta_general(mensaje_lower, alimento_detectado)
 
+def lista_por_nutriente(nutriente, unidad, k=3, ascendente=False, sufijo=""):
+    """Viñetas con los k alimentos de la base con más (o menos) de un nutriente"""
+    return "\n".join(
+        f"• {tabla.nombre_es(nombre)}: {tabla.registro(nombre)[nutriente]}{unidad}{sufijo}"
+        for nombre in tabla.top_k(nutriente, k, ascendente=ascendente)
+    )
+
 def generar_respuesta_calorias(mensaje, alimento_detectado):
     """Genera respuesta enfocada en calorías"""
-    if alimento_detectado:
-        # Buscar coincidencia exacta primero
-        if alimento_detectado in nutricion_completa:
-            alimento_key = alimento_detectado
-        else:
-            # Buscar por palabra clave si no hay coincidencia exacta
-            alimento_key = None
-            for key in nutricion_completa.keys():
-                if any(word.lower() in key.lower() for word in alimento_detectado.split()):
-                    alimento_key = key
-                    break
-        
-        if alimento_key:
-            info = nutricion_completa[alimento_key]
-            return f"""
-🍎 **Información Calórica de {alimento_detectado.title()}:**
+    # Alimento detectado en la imagen o, si no hay, el primero mencionado en el mensaje
+    alimento_key = buscador.resolver(alimento_detectado) if alimento_detectado else None
+    nombre = alimento_detectado
+    if alimento_key is None:
+        mencionados = buscador.buscar(mensaje)
+        alimento_key = mencionados[0] if mencionados else None
+        nombre = alimento_key
+    
+    if alimento_key in tabla:
+        info = tabla.registro(alimento_key)
+        return f"""
+🍎 **Información Calórica de {nombre.title()}:**
 
 • **Calorías**: {info['calorias']} kcal por 100g
 • **Carbohidratos**: {info['carbs']}g (energía rápida)
@@ -124,7 +206,7 @@ def generar_respuesta_calorias(mensaje, alimento_detectado):
 ¿Te gustaría saber sobre combinaciones saludables con este alimento?
 """
     
-    return """
+    return f"""
 📊 **Información General sobre Calorías:**
 
 Las calorías son unidades de energía que tu cuerpo necesita para funcionar. 
@@ -134,24 +216,20 @@ Las calorías son unidades de energía que tu cuerpo necesita para funcionar.
 • Hombres: 2,200-2,500 kcal
 
 🥗 **Alimentos bajos en calorías** de nuestra base:
-• Pepino: 16 kcal
-• Limón: 17 kcal  
-• Tomate: 18 kcal
+{lista_por_nutriente("calorias", " kcal", ascendente=True)}
 
 ¿Hay algún alimento específico del que quieras conocer las calorías?
 """
 
 def generar_respuesta_proteinas(mensaje):
     """Genera respuesta enfocada en proteínas"""
-    return """
+    return f"""
 💪 **Todo sobre Proteínas:**
 
 Las proteínas son esenciales para construir y reparar tejidos.
 
 🏆 **Alimentos ricos en proteína** de nuestra base:
-• Maíz: 3.3g por 100g
-• Papa: 2g por 100g
-• Aguacate: 2g por 100g
+{lista_por_nutriente("proteina", "g", sufijo=" por 100g")}
 
 🌱 **Dato curioso**: Aunque las frutas y verduras no son las principales fuentes de proteína, ¡sí aportan aminoácidos esenciales!
 
@@ -191,20 +269,16 @@ Nuestros alimentos son ricos en vitaminas naturales:
 
 def generar_respuesta_dieta(mensaje):
     """Genera respuesta para consultas de dieta"""
-    return """
+    return f"""
 🎯 **Consejos para una Dieta Saludable:**
 
 **Alimentos ideales para control de peso** de nuestra base:
 
 🥒 **Muy bajos en calorías**:
-• Pepino: 16 kcal (95% agua)
-• Limón: 17 kcal (desintoxicante)
-• Tomate: 18 kcal (saciante)
+{lista_por_nutriente("calorias", " kcal", ascendente=True)}
 
 🍓 **Ricos en fibra** (te mantienen lleno):
-• Aguacate: 7g fibra
-• Pera: 3.1g fibra
-• Zanahoria: 2.8g fibra
+{lista_por_nutriente("fibra", "g", sufijo=" fibra")}
 
 💡 **Estrategia inteligente**:
 1. Llena la mitad del plato con vegetales bajos en calorías
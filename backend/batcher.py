@@ -0,0 +1,130 @@
+import asyncio
+import numpy as np
+
+
+class BatcherDetenido(Exception):
+    """El batcher se detuvo (versión retirada o apagado) antes de responder"""
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes de /predict en un solo lote para el modelo"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, lotes_en_vuelo=1, observador=None):
+        # predict_fn es una corrutina que recibe un array (N, alto, ancho, 3)
+        # y devuelve (N, num_clases); se ejecuta fuera del event loop
+        self.predict_fn = predict_fn
+        # observador(tamano_lote, segundos) se llama tras cada forward pass (métricas)
+        self.observador = observador
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.lotes_en_vuelo = lotes_en_vuelo
+        self._cola = None
+        self._tarea = None
+        self._semaforo = None
+        self._tareas_lote = set()
+        # Entradas ya sacadas de la cola para el lote que se está formando
+        self._recolectando = []
+        self._detenido = False
+
+    def iniciar(self):
+        self._cola = asyncio.Queue()
+        # Permite tantos lotes simultáneos como workers tenga el pool de inferencia
+        self._semaforo = asyncio.Semaphore(self.lotes_en_vuelo)
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        """Deja de aceptar imágenes, termina los lotes en curso y falla las que esperaban"""
+        self._detenido = True
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        # Los forward pass ya lanzados terminan y responden a sus peticiones
+        if self._tareas_lote:
+            await asyncio.gather(*self._tareas_lote, return_exceptions=True)
+        # Lo que quedaba en la cola o a medio recolectar ya no tiene quién lo procese
+        pendientes, self._recolectando = self._recolectando, []
+        while self._cola is not None and not self._cola.empty():
+            pendientes.append(self._cola.get_nowait())
+        for _, futuro, _, _ in pendientes:
+            if not futuro.done():
+                futuro.set_exception(BatcherDetenido("El modelo se retiró antes de procesar la imagen"))
+
+    @property
+    def en_cola(self):
+        return self._cola.qsize() if self._cola is not None else 0
+
+    async def predecir(self, imagen, tiempos=None):
+        """Encola una imagen (alto, ancho, 3) ya preprocesada y espera su vector de probabilidades
+
+        Si se pasa el dict `tiempos`, se anotan los segundos de espera en "cola" (hasta
+        que arranca su lote) y de "inferencia" (el forward pass del lote). Lanza
+        BatcherDetenido si el batcher no está en marcha.
+        """
+        if self._detenido or self._cola is None:
+            raise BatcherDetenido("El batcher no está en marcha")
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._cola.put_nowait((imagen, futuro, loop.time(), tiempos))
+        return await futuro
+
+    async def _recolectar_lote(self):
+        loop = asyncio.get_running_loop()
+        # El lote vive en el atributo hasta entregarlo: si se cancela, detener() lo falla
+        lote = self._recolectando = [await self._cola.get()]
+        limite = loop.time() + self.max_wait
+
+        # Esperar hasta max_wait a que lleguen más peticiones o se llene el lote
+        while len(lote) < self.max_batch_size:
+            restante = limite - loop.time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._cola.get(), restante))
+            except asyncio.TimeoutError:
+                break
+
+        return lote
+
+    async def _bucle(self):
+        while True:
+            await self._semaforo.acquire()
+            lote = await self._recolectar_lote()
+            self._recolectando = []
+            tarea = asyncio.create_task(self._procesar(lote))
+            self._tareas_lote.add(tarea)
+            tarea.add_done_callback(self._tareas_lote.discard)
+
+    async def _procesar(self, lote):
+        try:
+            # Descartar peticiones cuyo cliente ya se fue
+            lote = [entrada for entrada in lote if not entrada[1].done()]
+            if not lote:
+                return
+
+            loop = asyncio.get_running_loop()
+            imagenes = np.stack([imagen for imagen, _, _, _ in lote])
+            inicio = loop.time()
+            try:
+                # Un solo forward pass para todo el lote
+                predicciones = await self.predict_fn(imagenes)
+            except Exception as e:
+                for _, futuro, _, _ in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                return
+            duracion = loop.time() - inicio
+            if self.observador is not None:
+                self.observador(len(lote), duracion)
+
+            for (_, futuro, encolada, tiempos), prediccion in zip(lote, predicciones):
+                if tiempos is not None:
+                    tiempos["cola"] = inicio - encolada
+                    tiempos["inferencia"] = duracion
+                if not futuro.done():
+                    futuro.set_result(prediccion)
+        finally:
+            self._semaforo.release()
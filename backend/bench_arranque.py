@@ -0,0 +1,94 @@
+"""Mide el tiempo de arranque del backend hasta la primera respuesta de /chat y de /predict
+
+Lanza `uvicorn main:app` en un subproceso y sondea los endpoints hasta que responden.
+
+Uso:
+    python bench_arranque.py [--puerto 8010] [--repeticiones 3] [--timeout 180]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from preprocesamiento import imagen_calentamiento
+
+
+def post(url, cuerpo, content_type):
+    peticion = urllib.request.Request(url, data=cuerpo, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(peticion, timeout=5) as respuesta:
+        return respuesta.status, json.loads(respuesta.read())
+
+
+def cuerpo_multipart(image_bytes, limite="----bench-arranque"):
+    cuerpo = (
+        f"--{limite}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="bench.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image_bytes + f"\r\n--{limite}--\r\n".encode()
+    return cuerpo, f"multipart/form-data; boundary={limite}"
+
+
+def medir_arranque(puerto, timeout):
+    base = f"http://127.0.0.1:{puerto}"
+    chat = json.dumps({"message": "Apple 10"}).encode()
+    imagen, content_type = cuerpo_multipart(imagen_calentamiento())
+
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning"]
+    )
+    tiempos = {}
+    try:
+        while time.perf_counter() - inicio < timeout and len(tiempos) < 2:
+            if "primer_chat_s" not in tiempos:
+                try:
+                    post(f"{base}/chat", chat, "application/json")
+                    tiempos["primer_chat_s"] = time.perf_counter() - inicio
+                except (urllib.error.URLError, ConnectionError):
+                    pass
+            if "primer_predict_s" not in tiempos:
+                try:
+                    post(f"{base}/predict", imagen, content_type)
+                    tiempos["primer_predict_s"] = time.perf_counter() - inicio
+                except (urllib.error.URLError, ConnectionError):
+                    # 503 mientras el modelo carga, o el servidor aún no escucha
+                    pass
+            time.sleep(0.05)
+
+        try:
+            with urllib.request.urlopen(f"{base}/readyz", timeout=5) as respuesta:
+                tiempos["servidor"] = json.loads(respuesta.read())["tiempos_arranque"]
+        except (urllib.error.URLError, ConnectionError):
+            pass
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--puerto", type=int, default=8010)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=180)
+    args = parser.parse_args()
+
+    resultados = []
+    for i in range(args.repeticiones):
+        tiempos = medir_arranque(args.puerto, args.timeout)
+        resultados.append(tiempos)
+        print(f"Arranque {i + 1}: primer /chat {tiempos.get('primer_chat_s', float('nan')):.2f}s, "
+              f"primer /predict {tiempos.get('primer_predict_s', float('nan')):.2f}s, "
+              f"servidor {tiempos.get('servidor', {})}")
+
+    for clave in ("primer_chat_s", "primer_predict_s"):
+        valores = [r[clave] for r in resultados if clave in r]
+        if valores:
+            print(f"{clave}: media {sum(valores) / len(valores):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
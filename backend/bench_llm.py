@@ -0,0 +1,89 @@
+"""Mide tokens por prompt, coalescencia de peticiones y fallback por SLO contra un LLM local
+
+Uso:
+    python bench_llm.py [--concurrencia 32] [--slo-ms 3000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_LOCAL", "1")
+
+import asistente_ia  # noqa: E402
+import llm_local  # noqa: E402
+from cliente_llm import contar_tokens  # noqa: E402
+
+PREGUNTAS = [
+    "¿Cuántas calorías tiene la manzana?",
+    "¿Qué vitaminas tiene la naranja?",
+    "¿Es bueno el aguacate para bajar de peso?",
+    "Dame ideas de snacks saludables",
+    "¿Cuánta fibra tienen la pera y la zanahoria?",
+]
+
+
+def prompt_anterior(mensaje):
+    # Prompt original: la base nutricional completa en cada llamada
+    return f"""
+Eres un asistente nutricional experto y amigable.
+
+Base de datos nutricional disponible:
+{json.dumps(asistente_ia.tabla.como_dict(), indent=2)}
+
+Mensaje del usuario: "{mensaje}"
+"""
+
+
+def comparar_tokens():
+    print("Tokens de prompt por pregunta (anterior -> actual):")
+    for pregunta in PREGUNTAS:
+        antes = contar_tokens(prompt_anterior(pregunta))
+        mensajes = asistente_ia.crear_prompt_nutricional(pregunta)
+        ahora = asistente_ia.tokens_mensajes(mensajes)
+        print(f"  {antes:5d} -> {ahora:4d}  {pregunta}")
+
+
+async def rafaga(concurrencia):
+    """concurrencia usuarios lanzan a la vez las mismas preguntas"""
+    llamadas_inicio = llm_local.estado["llamadas"]
+    latencias = []
+
+    async def uno(i):
+        inicio = time.perf_counter()
+        await asistente_ia.chat_con_ia(PREGUNTAS[i % len(PREGUNTAS)])
+        latencias.append(time.perf_counter() - inicio)
+
+    await asyncio.gather(*[uno(i) for i in range(concurrencia)])
+    llamadas = llm_local.estado["llamadas"] - llamadas_inicio
+    latencias_ms = sorted(l * 1000 for l in latencias)
+    print(f"\nRáfaga de {concurrencia} chats: {llamadas} llamadas al LLM, "
+          f"p50 {statistics.median(latencias_ms):.1f} ms, máx {latencias_ms[-1]:.1f} ms")
+
+
+async def principal(args):
+    comparar_tokens()
+    await rafaga(args.concurrencia)
+
+    # SLO más corto que la latencia del LLM: todas las respuestas salen de la simulación
+    asistente_ia.LLM_SLO_MS = args.slo_lento_ms
+    inicio = time.perf_counter()
+    await asistente_ia.chat_con_ia("¿Cuántas calorías tiene el mango?")
+    print(f"\nCon SLO de {args.slo_lento_ms:.0f} ms: respuesta en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    print("\n" + json.dumps(asistente_ia.estadisticas_llm(), indent=2, ensure_ascii=False))
+    await asistente_ia.cerrar_cliente()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--slo-lento-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(principal(args))
+
+
+if __name__ == "__main__":
+    main()
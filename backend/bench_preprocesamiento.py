@@ -0,0 +1,83 @@
+"""Micro-benchmark: preprocess_image original vs. preprocesamiento.py con fotos de 12 MP
+
+Uso:
+    python bench_preprocesamiento.py [--iteraciones 20] [--imagen foto.jpg] [--lote 16]
+"""
+import argparse
+import io
+import time
+import numpy as np
+import cv2
+from PIL import Image
+
+from preprocesamiento import preprocesar_en, preprocesar_lote
+
+
+def preprocess_image_original(image_bytes):
+    # Implementación anterior de backend/main.py (PIL -> NumPy -> cv2 -> float32)
+    image = Image.open(io.BytesIO(image_bytes))
+    image = image.convert('RGB')
+    image_array = np.array(image)
+    image_array = cv2.resize(image_array, (224, 224))
+    image_array = image_array.astype(np.float32) / 255.0
+    image_array = np.expand_dims(image_array, axis=0)
+    return image_array
+
+
+def crear_jpeg_sintetico(ancho=4032, alto=3024, calidad=90):
+    """Foto sintética de 12 MP con gradiente y ruido (similar en tamaño a una de móvil)"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, ancho, dtype=np.float32)
+    y = np.linspace(0, 255, alto, dtype=np.float32)[:, None]
+    base = np.stack([np.broadcast_to(x, (alto, ancho)),
+                     np.broadcast_to(y, (alto, ancho)),
+                     np.broadcast_to((x + y) / 2, (alto, ancho))], axis=-1)
+    ruido = rng.normal(0, 12, size=(alto, ancho, 1)).astype(np.float32)
+    pixeles = np.clip(base + ruido, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixeles).save(buffer, format='JPEG', quality=calidad)
+    return buffer.getvalue()
+
+
+def medir(nombre, fn, iteraciones, imagenes_por_llamada=1):
+    fn()  # calentamiento
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    por_imagen = np.array(tiempos) * 1000 / imagenes_por_llamada
+    print(f"{nombre:<28} media {por_imagen.mean():8.2f} ms/img   "
+          f"p50 {np.percentile(por_imagen, 50):8.2f}   p95 {np.percentile(por_imagen, 95):8.2f}")
+    return por_imagen.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iteraciones', type=int, default=20)
+    parser.add_argument('--imagen', help='JPEG real a usar en lugar de la imagen sintética')
+    parser.add_argument('--lote', type=int, default=16)
+    args = parser.parse_args()
+
+    if args.imagen:
+        with open(args.imagen, 'rb') as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = crear_jpeg_sintetico()
+    ancho, alto = Image.open(io.BytesIO(image_bytes)).size
+    print(f"Imagen de entrada: {ancho}x{alto} ({len(image_bytes) / 1e6:.1f} MB)\n")
+
+    destino = np.empty((224, 224, 3), dtype=np.float32)
+    salida_lote = np.empty((args.lote, 224, 224, 3), dtype=np.float32)
+    lista = [image_bytes] * args.lote
+
+    original = medir("original", lambda: preprocess_image_original(image_bytes), args.iteraciones)
+    nuevo = medir("preprocesar_en", lambda: preprocesar_en(image_bytes, destino), args.iteraciones)
+    medir(f"preprocesar_lote (N={args.lote})", lambda: preprocesar_lote(lista, salida_lote),
+          max(1, args.iteraciones // 4), imagenes_por_llamada=args.lote)
+
+    print(f"\nAceleración por imagen: {original / nuevo:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
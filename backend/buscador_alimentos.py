@@ -0,0 +1,135 @@
+import re
+import unicodedata
+from collections import deque
+
+# Nombres con los que la gente menciona cada clase del modelo (español e inglés)
+SINONIMOS = {
+    "Apple 10": ["manzana", "apple"],
+    "Banana 1": ["banana", "banano", "platano", "guineo"],
+    "Orange 1": ["naranja", "orange"],
+    "Tomato 1": ["tomate", "jitomate", "tomato"],
+    "Carrot 1": ["zanahoria", "carrot"],
+    "Cucumber 1": ["pepino", "cucumber"],
+    "Onion 2": ["cebolla", "onion"],
+    "Peach 1": ["durazno", "melocoton", "peach"],
+    "Pear 1": ["pera", "pear"],
+    "Cherry 1": ["cereza", "cherry"],
+    "Grape Blue 1": ["uva", "uva azul", "grape", "blue grape"],
+    "Pepper Green 1": ["pimiento", "pimiento verde", "pimenton", "aji", "pepper", "green pepper"],
+    "Potato Red 1": ["papa", "patata", "papa roja", "potato", "red potato"],
+    "Avocado 1": ["aguacate", "palta", "avocado"],
+    "Mango 1": ["mango"],
+    "Strawberry 1": ["fresa", "frutilla", "strawberry"],
+    "Lemon 1": ["limon", "lemon"],
+    "Watermelon 1": ["sandia", "patilla", "watermelon"],
+    "Corn 1": ["maiz", "elote", "choclo", "mazorca", "corn"],
+    "Eggplant 1": ["berenjena", "eggplant"],
+}
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con todo lo que no sea letra o número convertido en espacio"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+
+def plurales(palabra):
+    """Plurales posibles de una palabra; el primero es el español"""
+    if palabra.endswith("z"):
+        return [palabra[:-1] + "ces"]
+    if palabra.endswith("y") and len(palabra) > 1 and palabra[-2] not in "aeiou":
+        return [palabra[:-1] + "ies"]
+    if palabra.endswith("o"):
+        # "tomatos" (es) y "tomatoes" (en)
+        return [palabra + "s", palabra + "es"]
+    if palabra[-1] in "aeiou":
+        return [palabra + "s"]
+    # "limones" (es) y "lemons" (en)
+    return [palabra + "es", palabra + "s"]
+
+
+def variantes(nombre):
+    """Formas singular y plural de un nombre ya normalizado"""
+    palabras = nombre.split()
+    formas = {nombre}
+    for forma in plurales(palabras[-1]):
+        # En inglés solo se pluraliza la última palabra ("green peppers")
+        formas.add(" ".join(palabras[:-1] + [forma]))
+    # En español se pluralizan todas ("pimientos verdes")
+    formas.add(" ".join(plurales(p)[0] for p in palabras))
+    return formas
+
+
+class BuscadorAlimentos:
+    """Autómata Aho-Corasick sobre nombres normalizados: una sola pasada por el mensaje"""
+
+    def __init__(self, sinonimos=SINONIMOS):
+        self.canonicos = list(sinonimos)
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]  # por estado: [(longitud_patron, clase)]
+
+        for clase, nombres in sinonimos.items():
+            base = re.sub(r"\s+\d+$", "", clase)  # "Grape Blue 1" -> "Grape Blue"
+            patrones = set()
+            for nombre in [clase, base] + nombres:
+                patrones |= variantes(normalizar(nombre))
+            for patron in patrones:
+                self._agregar(patron, clase)
+        self._construir_fallos()
+
+    def _agregar(self, patron, clase):
+        estado = 0
+        for caracter in patron:
+            siguiente = self._transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones[estado][caracter] = siguiente
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salidas.append([])
+            estado = siguiente
+        self._salidas[estado].append((len(patron), clase))
+
+    def _construir_fallos(self):
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._salidas[siguiente] = self._salidas[siguiente] + self._salidas[self._fallo[siguiente]]
+
+    def buscar(self, texto):
+        """Clases mencionadas en el texto, en orden de aparición y sin repetir"""
+        texto = normalizar(texto)
+        encontradas = []
+        estado = 0
+        for posicion, caracter in enumerate(texto):
+            while estado and caracter not in self._transiciones[estado]:
+                estado = self._fallo[estado]
+            estado = self._transiciones[estado].get(caracter, 0)
+            for longitud, clase in self._salidas[estado]:
+                inicio = posicion - longitud + 1
+                # Solo palabras completas: "pera" no debe coincidir dentro de "esperanza"
+                antes_ok = inicio == 0 or texto[inicio - 1] == " "
+                despues_ok = posicion + 1 == len(texto) or texto[posicion + 1] == " "
+                if antes_ok and despues_ok and clase not in encontradas:
+                    encontradas.append(clase)
+        return encontradas
+
+    def resolver(self, nombre):
+        """Clase canónica para un nombre suelto (p. ej. la clase detectada en una imagen)"""
+        if nombre in self.canonicos:
+            return nombre
+        encontradas = self.buscar(nombre)
+        return encontradas[0] if encontradas else None
+
+
+# Índice compartido, construido una sola vez al importar el módulo
+buscador = BuscadorAlimentos()
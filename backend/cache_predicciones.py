@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachePredicciones:
+    """Cache LRU con TTL de resultados de /predict, indexada por hash de los bytes subidos
+
+    La memoria se consulta en el hilo del event loop. El SQLite opcional nunca: las lecturas
+    se hacen con `consultar` en un executor y las escrituras las agrupa un hilo propio en
+    un commit cada `intervalo_escritura` segundos.
+    """
+
+    def __init__(self, max_entradas=10000, ttl=3600, ruta_sqlite=None, intervalo_escritura=0.2):
+        # Cada entrada es un dict pequeño (clase + probabilidad), así que limitar
+        # el número de entradas acota la memoria (~10000 entradas ≈ pocos MB)
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.intervalo_escritura = intervalo_escritura
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict()  # clave -> (expira, resultado)
+        self._lock = threading.Lock()
+
+        # Persistencia opcional en SQLite para sobrevivir a reinicios
+        self._db = None
+        if ruta_sqlite:
+            self._db = sqlite3.connect(ruta_sqlite, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predicciones "
+                "(clave TEXT PRIMARY KEY, resultado TEXT, expira REAL)"
+            )
+            self._purgar_disco()
+            self._lock_db = threading.Lock()
+            self._pendientes = []  # [(clave, expira, resultado)] aún no escritos
+            self._escritas_desde_purga = 0
+            self._aviso = threading.Event()
+            self._cerrando = False
+            self._escritor = threading.Thread(target=self._bucle_escritura, name="cache-sqlite", daemon=True)
+            self._escritor.start()
+
+    @staticmethod
+    def clave(image_bytes, version_modelo):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(version_modelo.encode())
+        h.update(image_bytes)
+        return h.hexdigest()
+
+    async def consultar(self, clave, ejecutar=asyncio.to_thread):
+        """Resultado guardado o None; si no está en memoria, lo busca en SQLite con `ejecutar`"""
+        resultado = self._buscar_memoria(clave)
+        if resultado is None and self._db is not None:
+            resultado = await ejecutar(self._buscar_disco, clave)
+        if resultado is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return resultado
+
+    def _buscar_memoria(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, resultado = entrada
+            if expira > time.time():
+                self._datos.move_to_end(clave)
+                return resultado
+            del self._datos[clave]
+            return None
+
+    def _buscar_disco(self, clave):
+        with self._lock_db:
+            fila = self._db.execute(
+                "SELECT resultado, expira FROM predicciones WHERE clave = ?", (clave,)
+            ).fetchone()
+        if fila is None or fila[1] <= time.time():
+            return None
+        resultado = json.loads(fila[0])
+        with self._lock:
+            self._guardar_memoria(clave, fila[1], resultado)
+        return resultado
+
+    def guardar(self, clave, resultado):
+        """Guarda en memoria; la escritura en SQLite queda pendiente para el hilo escritor"""
+        expira = time.time() + self.ttl
+        with self._lock:
+            self._guardar_memoria(clave, expira, resultado)
+            if self._db is not None:
+                self._pendientes.append((clave, expira, resultado))
+        if self._db is not None:
+            self._aviso.set()
+
+    def _guardar_memoria(self, clave, expira, resultado):
+        self._datos[clave] = (expira, resultado)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    def _bucle_escritura(self):
+        while True:
+            self._aviso.wait()
+            if not self._cerrando:
+                # Las escrituras que lleguen mientras tanto van en el mismo commit
+                time.sleep(self.intervalo_escritura)
+            self._aviso.clear()
+            self._volcar()
+            if self._cerrando:
+                return
+
+    def _volcar(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, []
+        if not pendientes:
+            return
+        filas = [(clave, json.dumps(resultado), expira) for clave, expira, resultado in pendientes]
+        with self._lock_db:
+            self._db.executemany("INSERT OR REPLACE INTO predicciones VALUES (?, ?, ?)", filas)
+            self._db.commit()
+            self._escritas_desde_purga += len(filas)
+            if self._escritas_desde_purga >= 1000:
+                self._purgar_disco()
+                self._escritas_desde_purga = 0
+
+    def _purgar_disco(self):
+        self._db.execute("DELETE FROM predicciones WHERE expira <= ?", (time.time(),))
+        self._db.commit()
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra el SQLite"""
+        if self._db is None:
+            return
+        self._cerrando = True
+        self._aviso.set()
+        self._escritor.join()
+        self._db.close()
+        self._db = None
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entradas": len(self._datos),
+            "max_entradas": self.max_entradas,
+            "ttl": self.ttl,
+            "persistente": self._db is not None,
+            "pendientes_disco": len(self._pendientes) if self._db is not None else 0,
+        }
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import random
+import httpx
+
+try:
+    import tiktoken
+    _codificador = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken es opcional
+    _codificador = None
+
+
+class ErrorLLM(Exception):
+    pass
+
+
+class PresupuestoExcedido(ErrorLLM):
+    """El prompt no cabe en el presupuesto de tokens de la petición"""
+
+    def __init__(self, tokens, limite):
+        super().__init__(f"Prompt de {tokens} tokens supera el presupuesto de {limite}")
+        self.tokens = tokens
+        self.limite = limite
+
+
+def contar_tokens(texto):
+    """Tokens del texto con tiktoken si está instalado; si no, ~4 caracteres por token"""
+    if not texto:
+        return 0
+    if _codificador is not None:
+        return len(_codificador.encode(texto))
+    return max(1, len(texto) // 4)
+
+
+def tokens_mensajes(mensajes):
+    # Cada mensaje de chat añade unos pocos tokens de formato (rol, separadores)
+    return sum(contar_tokens(m["content"]) + 4 for m in mensajes) + 2
+
+
+class ClienteLLM:
+    """Cliente asíncrono de una API de chat compatible con OpenAI (/v1/chat/completions)
+
+    - Un único httpx.AsyncClient (keep-alive) y un semáforo de concurrencia
+    - Peticiones idénticas simultáneas comparten una sola llamada al LLM
+    - Presupuesto de tokens por petición (prompt y respuesta)
+    - Reintentos con backoff exponencial con jitter ante 429/5xx y errores de red
+    """
+
+    def __init__(self, base_url, api_key="", modelo="gpt-3.5-turbo", max_concurrencia=8,
+                 timeout=10.0, reintentos=2, backoff_base=0.25, max_tokens_prompt=800,
+                 max_tokens_respuesta=300, temperatura=0.7, transport=None):
+        self.modelo = modelo
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.max_tokens_prompt = max_tokens_prompt
+        self.max_tokens_respuesta = max_tokens_respuesta
+        self.temperatura = temperatura
+        self._semaforo = asyncio.Semaphore(max_concurrencia)
+        self._en_vuelo = {}  # clave -> tarea con la llamada compartida
+        cabeceras = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=cabeceras,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_concurrencia, max_keepalive_connections=max_concurrencia),
+            transport=transport,
+        )
+        self.peticiones = 0
+        self.llamadas = 0
+        self.coalescidas = 0
+        self.tokens_prompt = 0
+        self.tokens_respuesta = 0
+
+    async def cerrar(self):
+        await self._http.aclose()
+
+    @staticmethod
+    def _reintentable(error):
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    async def _llamar(self, cuerpo):
+        async with self._semaforo:
+            for intento in range(self.reintentos + 1):
+                try:
+                    respuesta = await self._http.post("/v1/chat/completions", json=cuerpo)
+                    respuesta.raise_for_status()
+                    datos = respuesta.json()
+                    break
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    if intento == self.reintentos or not self._reintentable(e):
+                        raise ErrorLLM(str(e)) from e
+                    # "Full jitter": espera aleatoria entre 0 y base * 2^intento
+                    await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** intento)))
+
+        self.llamadas += 1
+        uso = datos.get("usage", {})
+        self.tokens_prompt += uso.get("prompt_tokens", 0)
+        self.tokens_respuesta += uso.get("completion_tokens", 0)
+        return datos["choices"][0]["message"]["content"], uso
+
+    def _terminar(self, clave, tarea):
+        self._en_vuelo.pop(clave, None)
+        # Marca la excepción como leída aunque todos los clientes hayan abandonado la espera
+        if not tarea.cancelled():
+            tarea.exception()
+
+    async def completar(self, mensajes, max_tokens=None):
+        """Devuelve (texto, usage) para una lista de mensajes de chat
+
+        Lanza PresupuestoExcedido si el prompt supera max_tokens_prompt.
+        """
+        self.peticiones += 1
+        tokens = tokens_mensajes(mensajes)
+        if tokens > self.max_tokens_prompt:
+            raise PresupuestoExcedido(tokens, self.max_tokens_prompt)
+
+        cuerpo = {
+            "model": self.modelo,
+            "messages": mensajes,
+            "max_tokens": min(max_tokens or self.max_tokens_respuesta, self.max_tokens_respuesta),
+            "temperature": self.temperatura,
+        }
+        clave = hashlib.blake2b(json.dumps(cuerpo, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.create_task(self._llamar(cuerpo))
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+        else:
+            self.coalescidas += 1
+
+        # shield: si un cliente abandona (p. ej. por SLO) la llamada sigue para los demás
+        return await asyncio.shield(tarea)
+
+    def estadisticas(self):
+        return {
+            "modelo": self.modelo,
+            "peticiones": self.peticiones,
+            "llamadas": self.llamadas,
+            "coalescidas": self.coalescidas,
+            "en_vuelo": len(self._en_vuelo),
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_respuesta": self.tokens_respuesta,
+            "max_tokens_prompt": self.max_tokens_prompt,
+            "max_tokens_respuesta": self.max_tokens_respuesta,
+        }
@@ -0,0 +1,53 @@
+"""Servidor falso compatible con OpenAI (/v1/chat/completions) para probar sin red ni API key
+
+La latencia es proporcional a los tokens de entrada y de salida, así se nota el efecto de
+enviar solo las filas relevantes de la base nutricional y de coalescer peticiones.
+
+Uso como servidor:
+    uvicorn llm_local:app --port 5201
+"""
+import asyncio
+import os
+import time
+from fastapi import FastAPI, Request
+
+MS_POR_TOKEN_ENTRADA = float(os.getenv("FAKE_MS_POR_TOKEN_ENTRADA", "0.2"))
+MS_POR_TOKEN_SALIDA = float(os.getenv("FAKE_MS_POR_TOKEN_SALIDA", "2.0"))
+TOKENS_RESPUESTA = int(os.getenv("FAKE_TOKENS_RESPUESTA", "120"))
+
+app = FastAPI()
+estado = {"llamadas": 0, "tokens_prompt": 0}
+
+
+def contar_tokens(texto):
+    return max(1, len(texto) // 4) if texto else 0
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    cuerpo = await request.json()
+    mensajes = cuerpo.get("messages", [])
+    prompt = sum(contar_tokens(m.get("content", "")) + 4 for m in mensajes) + 2
+    salida = min(TOKENS_RESPUESTA, cuerpo.get("max_tokens") or TOKENS_RESPUESTA)
+    estado["llamadas"] += 1
+    estado["tokens_prompt"] += prompt
+
+    await asyncio.sleep((prompt * MS_POR_TOKEN_ENTRADA + salida * MS_POR_TOKEN_SALIDA) / 1000)
+    pregunta = mensajes[-1]["content"].strip().splitlines()[-1] if mensajes else ""
+    return {
+        "id": f"chatcmpl-local-{estado['llamadas']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": cuerpo.get("model", "llm-local"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"🥗 Respuesta simulada a: {pregunta[:80]}"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": prompt, "completion_tokens": salida, "total_tokens": prompt + salida},
+    }
+
+
+@app.get("/estadisticas")
+async def estadisticas():
+    return estado
@@ -1,14 +1,355 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
-import tensorflow as tf
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+import time
+import logging
 import numpy as np
-import cv2
-import io
-from PIL import Image
 import uvicorn
+import os
+import json
+import asyncio
+import hmac
+import random
+import sys
+import functools
+from typing import List, Optional
+from pool_inferencia import PoolSaturado
+from batcher import BatcherDetenido
+from cache_predicciones import CachePredicciones
+from runtimes import RuntimeCascada
+from registro_modelos import RegistroModelos, VersionModelo, ArtefactoInvalido
+from servicio_modelo import ServicioModelo
+from buscador_alimentos import buscador
+from subidas import (PoolBuffers, SubidaDemasiadoGrande, SinBuffersLibres, ArchivoRechazado, ExtraccionLote,
+                     detectar_tipo_imagen, detectar_tipo_archivo)
+from asistente_ia import asistente_nutricional_ia, cerrar_cliente as cerrar_cliente_llm
 
-app = FastAPI()
+# Base nutricional compartida (comun/nutricion.csv), indexada por id de clase
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "comun"))
+from nutricion import tabla as nutricion
+from metricas import registro, medir_http, BUCKETS_LOTE, TIPO_CONTENIDO
+
+# Referencia para medir tiempos de arranque (los imports pesados se hacen en segundo plano)
+T_INICIO = time.perf_counter()
+logger = logging.getLogger("uvicorn.error")
+
+# Versión que atiende el tráfico y, opcionalmente, una candidata en sombra o en A/B
+activa = None
+candidata = None
+modo_candidata = None  # "sombra" o "ab"
+fraccion_candidata = 0.0
+# Estado de la última versión cargada en segundo plano por /modelos/*
+carga = {"estado": None}
+# Tareas en segundo plano (cargas, comparaciones en sombra): referencia para que no se pierdan
+tareas_fondo = set()
+# cargando -> listo | sin_modelo | error
+estado_modelo = "cargando"
+tiempos_arranque = {}
+
+# Artefacto a servir (.h5, .tflite u .onnx) y runtime con el que se ejecuta
+MODEL_PATH = os.getenv("MODEL_PATH", "best_model_20_clases.h5")
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME") or None  # keras, tflite u onnx; por defecto según la extensión
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "0")) or None
+# Resolución de entrada del modelo; un alumno de destilacion.py puede usar 128 o 160
+MODEL_IMG_SIZE = int(os.getenv("MODEL_IMG_SIZE", "224"))
+
+# Registro de versiones (registro_modelos.py); sin él se sirve MODEL_PATH + classes.txt
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY") or None
+registro_versiones = RegistroModelos(MODEL_REGISTRY) if MODEL_REGISTRY else None
+# Si se define, POST/DELETE en /modelos/* exigen la cabecera X-Admin-Token
+MODELS_ADMIN_TOKEN = os.getenv("MODELS_ADMIN_TOKEN") or None
+
+# Probabilidad (calibrada) mínima para dar una clase; por debajo la respuesta es "incierto"
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.5"))
+# Alternativas que devuelven /predict y /predict/batch
+PREDICT_TOP_K = int(os.getenv("PREDICT_TOP_K", "3"))
+
+# Cascada opcional: un modelo pequeño responde los casos claros y escala a MODEL_PATH
+# las imágenes cuya probabilidad máxima no llega a CASCADE_THRESHOLD
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH") or None
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.8"))
+CASCADA = (CASCADE_MODEL_PATH, CASCADE_THRESHOLD) if CASCADE_MODEL_PATH else None
+
+# Configuración del micro-batching de /predict
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "5"))
+
+# Configuración del pool de inferencia
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")  # "thread" o "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_CPUS = [int(c) for c in os.getenv("INFERENCE_CPUS", "").split(",") if c.strip()]
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+
+# Tamaño de los trozos en los que /predict/batch pasa las imágenes al modelo
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "32"))
+
+# Cache de predicciones por contenido (PREDICT_CACHE_SIZE=0 la desactiva)
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "10000"))
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", "3600"))
+PREDICT_CACHE_DB = os.getenv("PREDICT_CACHE_DB") or None
+cache = CachePredicciones(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL, PREDICT_CACHE_DB) if PREDICT_CACHE_SIZE > 0 else None
+
+# Límites de subida: memoria máxima en vuelo = MAX_UPLOAD_MB * UPLOAD_BUFFERS
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+MAX_BATCH_UPLOAD_BYTES = int(float(os.getenv("MAX_BATCH_UPLOAD_MB", "200")) * 1024 * 1024)
+# Límites de lo que descomprime /predict/batch (cada imagen, además, hasta MAX_UPLOAD_MB)
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "1000"))
+BATCH_MAX_EXTRACTED_BYTES = int(float(os.getenv("BATCH_MAX_EXTRACTED_MB", "500")) * 1024 * 1024)
+UPLOAD_BUFFERS = int(os.getenv("UPLOAD_BUFFERS", "16"))
+# Espera máxima por un buffer libre antes de responder 503
+UPLOAD_BUFFER_WAIT = float(os.getenv("UPLOAD_BUFFER_WAIT_MS", "1000")) / 1000
+buffers_subida = PoolBuffers(MAX_UPLOAD_BYTES, UPLOAD_BUFFERS)
+
+# Server-Timing en todas las respuestas; si no, solo cuando el cliente envía X-Trace: 1
+SERVER_TIMING = os.getenv("SERVER_TIMING") == "1"
+
+# Métricas de /metrics (comun/metricas.py)
+duracion_etapas = registro.histograma(
+    "etapa_duracion_segundos", "Tiempo por etapa de /predict y /analyze", ("etapa",))
+tamano_lotes = registro.histograma(
+    "inferencia_lote_imagenes", "Imágenes por forward pass del modelo", ("origen",), BUCKETS_LOTE)
+duracion_lotes = registro.histograma(
+    "inferencia_lote_segundos", "Duración de cada forward pass del modelo", ("origen",))
+predicciones_inciertas = registro.contador(
+    "predicciones_inciertas_total", "Respuestas por debajo de CONFIDENCE_THRESHOLD", ("endpoint",))
+duracion_versiones = registro.histograma(
+    "modelo_prediccion_segundos", "Cola + inferencia de una imagen por versión y rol", ("version", "rol"))
+comparaciones_sombra = registro.contador(
+    "sombra_comparaciones_total", "Clase de la candidata en sombra frente a la de la activa", ("resultado",))
+
+def observar_lote(origen, tamano, segundos):
+    tamano_lotes.observar(tamano, origen)
+    duracion_lotes.observar(segundos, origen)
+
+def registrar_metricas_estado():
+    """Valores que ya llevan el pool, el batcher, la cache y las subidas: se leen al hacer scrape"""
+    registro.funcion("modelo_listo", "1 si el modelo está cargado y calentado",
+                     lambda: int(estado_modelo == "listo"))
+    registro.funcion("modelo_arranque_segundos", "Segundos desde el arranque hasta cada fase de carga",
+                     lambda: {(fase.removesuffix("_s"),): t for fase, t in tiempos_arranque.items()},
+                     etiquetas=("fase",))
+    registro.funcion("modelo_version_info", "1 por cada versión servida y su rol",
+                     versiones_servidas, etiquetas=("version", "rol"))
+    registro.funcion("inferencia_pendientes", "Peticiones con hueco reservado en el pool de inferencia",
+                     lambda: activa.pool.pendientes if activa is not None else None)
+    registro.funcion("batcher_en_cola", "Imágenes esperando a formar un lote",
+                     lambda: activa.batcher.en_cola if activa is not None else None)
+    registro.funcion("cache_predicciones_consultas_total", "Consultas a la cache de predicciones",
+                     lambda: {("hit",): cache.hits, ("miss",): cache.misses} if cache is not None else None,
+                     tipo="counter", etiquetas=("resultado",))
+    registro.funcion("cache_predicciones_entradas", "Entradas en memoria de la cache de predicciones",
+                     lambda: cache.estadisticas()["entradas"] if cache is not None else None)
+    registro.funcion("subidas_buffers_en_uso", "Buffers de subida prestados",
+                     lambda: buffers_subida.en_uso)
+    registro.funcion("subidas_bytes_en_uso", "Bytes de subidas en memoria",
+                     lambda: buffers_subida.bytes_en_uso)
+    registro.funcion("subidas_rechazadas_total", "Subidas rechazadas por superar el tamaño máximo",
+                     lambda: buffers_subida.rechazadas_por_tamano, tipo="counter")
+    registro.funcion("cascada_imagenes_total", "Imágenes resueltas por cada modelo de la cascada",
+                     imagenes_cascada, tipo="counter", etiquetas=("modelo",))
+
+def versiones_servidas():
+    servidas = {}
+    if activa is not None:
+        servidas[(activa.version.version, "activa")] = 1
+    if candidata is not None:
+        servidas[(candidata.version.version, modo_candidata)] = 1
+    return servidas or None
+
+def imagenes_cascada():
+    # En modo "process" los contadores viven en los procesos del pool: no se exponen
+    modelo = activa.modelo if activa is not None else None
+    if not isinstance(modelo, RuntimeCascada):
+        return None
+    return {("rapido",): modelo.imagenes - modelo.escaladas, ("completo",): modelo.escaladas}
+
+registrar_metricas_estado()
+
+async def leer_archivo_lote(file, pool, extraccion):
+    """[(nombre, bytes)] de una imagen suelta o de un archivo .zip/.tar subido a /predict/batch"""
+    tipo = detectar_tipo_archivo(await file.read(512))
+    await file.seek(0)
+    # El archivo subido ya está en disco o en memoria (multipart): se lee sin cargarlo entero
+    if tipo is None:
+        return [(file.filename or "imagen", await pool.ejecutar(extraccion.leer, file.filename, file.file))]
+    return await pool.ejecutar(extraccion.extraer, file.file, tipo)
+
+def preprocess_seguro_en(image_bytes, destino, tamano):
+    from preprocesamiento import preprocesar_en
+    # En lote una imagen corrupta no debe tumbar a las demás
+    if detectar_tipo_imagen(image_bytes) is None:
+        return ValueError("El archivo no es una imagen")
+    try:
+        preprocesar_en(image_bytes, destino, tamano)
+    except Exception as e:
+        return e
+
+def es_incierta(prediction):
+    return float(np.max(prediction)) < CONFIDENCE_THRESHOLD
+
+def formatear_prediccion(prediction, k, clases):
+    """Clase más probable ("incierto" si no llega al umbral) y las k alternativas"""
+    top = formatear_top_k(prediction, k, clases)
+    incierto = es_incierta(prediction)
+    return {
+        "clase": "incierto" if incierto else top[0]["clase"],
+        "probabilidad": top[0]["probabilidad"],
+        "incierto": incierto,
+        "predicciones": top,
+    }
+
+def formatear_top_k(prediction, k, clases):
+    """Las k clases más probables, de mayor a menor, con su id de clase"""
+    k = min(k, len(prediction))
+    ids = np.argpartition(prediction, -k)[-k:]
+    ids = ids[np.argsort(prediction[ids])[::-1]]
+    return [
+        {
+            "id": int(i),
+            "clase": clases[i],
+            "probabilidad": round(float(prediction[i]) * 100, 2),
+        }
+        for i in ids
+    ]
+
+def marcar_tiempo(nombre):
+    tiempos_arranque[nombre] = round(time.perf_counter() - T_INICIO, 3)
+
+def version_local():
+    """Sin registro: MODEL_PATH + classes.txt como única versión (sin checksums que verificar)"""
+    return VersionModelo(os.path.basename(MODEL_PATH), MODEL_PATH, "classes.txt",
+                         MODEL_IMG_SIZE, runtime=MODEL_RUNTIME, cascada=CASCADA)
+
+def nuevo_servicio(version):
+    opciones_pool = {
+        "modo": INFERENCE_MODE,
+        "workers": INFERENCE_WORKERS,
+        "cpus": INFERENCE_CPUS,
+        "max_cola": INFERENCE_MAX_QUEUE,
+        "num_threads": MODEL_THREADS,
+    }
+    return ServicioModelo(version, opciones_pool, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS,
+                          observador=functools.partial(observar_lote, "predict"),
+                          extra_cache=(CONFIDENCE_THRESHOLD,))
+
+async def preparar_servicio(version, arranque=False):
+    """Carga y calienta una versión sin tocar la que está sirviendo"""
+    servicio = nuevo_servicio(version)
+    try:
+        await servicio.cargar()
+        if arranque:
+            marcar_tiempo("modelo_cargado_s")
+        await servicio.calentar()
+        if arranque:
+            marcar_tiempo("modelo_calentado_s")
+    except BaseException:
+        await servicio.cerrar()
+        raise
+    return servicio
+
+def en_segundo_plano(corrutina):
+    tarea = asyncio.create_task(corrutina)
+    tareas_fondo.add(tarea)
+    tarea.add_done_callback(tareas_fondo.discard)
+    return tarea
+
+def poner_activa(servicio):
+    """Cambio atómico: las peticiones nuevas usan `servicio`, las que ya tenían la
+    versión anterior terminan con ella y después se cierra"""
+    global activa
+    anterior, activa = activa, servicio
+    nutricion.alinear(servicio.classes)
+    servicio.alineada = True
+    if anterior is not None:
+        anterior.alineada = False
+        en_segundo_plano(anterior.retirar())
+
+async def iniciar_subsistema_modelo():
+    """Carga la versión activa en segundo plano, la calienta y marca el servicio como listo"""
+    global estado_modelo
+    try:
+        if registro_versiones is not None:
+            version = await asyncio.to_thread(registro_versiones.activa)
+        else:
+            version = version_local()
+        if version is None or not os.path.exists(version.ruta_modelo):
+            marcar_tiempo("modelo_cargado_s")
+            estado_modelo = "sin_modelo"
+            return
+        
+        poner_activa(await preparar_servicio(version, arranque=True))
+        estado_modelo = "listo"
+        logger.info(f"Modelo {version.version} listo: {tiempos_arranque}")
+    except Exception:
+        estado_modelo = "error"
+        logger.exception("Error cargando el modelo")
+
+async def cargar_version(version, rol, modo=None, fraccion=0.0):
+    """Carga una versión en segundo plano y, ya caliente, la pone como activa o candidata"""
+    global candidata, modo_candidata, fraccion_candidata, estado_modelo
+    inicio = time.perf_counter()
+    try:
+        if rol == "activa" and candidata is not None and candidata.version.version == version.version:
+            # Promocionar la candidata: ya está cargada y caliente
+            servicio, candidata = candidata, None
+        else:
+            servicio = await preparar_servicio(version)
+    except Exception as e:
+        carga.update(estado="error", error=str(e))
+        logger.exception(f"Error cargando la versión {version.version}")
+        return
+    
+    if rol == "activa":
+        poner_activa(servicio)
+        estado_modelo = "listo"
+        if registro_versiones is not None:
+            await asyncio.to_thread(registro_versiones.marcar_activa, version.version)
+    else:
+        anterior = candidata
+        candidata, modo_candidata, fraccion_candidata = servicio, modo, fraccion
+        if anterior is not None:
+            en_segundo_plano(anterior.retirar())
+    carga.update(estado="lista", segundos=round(time.perf_counter() - inicio, 3))
+    logger.info(f"Versión {version.version} en servicio como {modo or rol}")
+
+@asynccontextmanager
+async def lifespan(app):
+    # /chat queda disponible de inmediato; el modelo se carga sin bloquear el arranque
+    tarea_modelo = asyncio.create_task(iniciar_subsistema_modelo())
+    marcar_tiempo("app_lista_s")
+    logger.info(f"App lista en {tiempos_arranque['app_lista_s']}s, cargando modelo en segundo plano")
+    yield
+    tarea_modelo.cancel()
+    for servicio in (activa, candidata):
+        if servicio is not None:
+            await servicio.cerrar()
+    await cerrar_cliente_llm()
+    if cache is not None:
+        # Escribe en SQLite las predicciones que aún no se habían volcado
+        await asyncio.to_thread(cache.cerrar)
+
+app = FastAPI(lifespan=lifespan)
+
+# Margen para las cabeceras del multipart de una sola imagen
+LIMITES_SUBIDA = {
+    "/predict": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/analyze": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/predict/batch": MAX_BATCH_UPLOAD_BYTES,
+}
+
+@app.middleware("http")
+async def limitar_tamano_subida(request, call_next):
+    # Rechazo temprano por Content-Length, antes de parsear el multipart
+    limite = LIMITES_SUBIDA.get(request.url.path)
+    longitud = request.headers.get("content-length", "")
+    if request.method == "POST" and limite is not None and longitud.isdigit() and int(longitud) > limite:
+        return JSONResponse(status_code=413, content={"detail": "Archivo demasiado grande"})
+    return await call_next(request)
+
+# Declarado después: envuelve al límite de subida, así que también cuenta los 413
+medir_http(app, duracion_etapas, SERVER_TIMING)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,94 +359,407 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-model = None
-classes = []
-
-nutricion = {
-    "Apple 10": {"calorias": 52, "carbs": 14, "proteina": 0.3, "grasa": 0.2, "fibra": 2.4, "vitamina_c": 4.6},
-    "Banana 1": {"calorias": 89, "carbs": 23, "proteina": 1.1, "grasa": 0.3, "fibra": 2.6, "potasio": 358},
-    "Orange 1": {"calorias": 47, "carbs": 12, "proteina": 0.9, "grasa": 0.1, "fibra": 2.4, "vitamina_c": 53.2},
-    "Tomato 1": {"calorias": 18, "carbs": 3.9, "proteina": 0.9, "grasa": 0.2, "fibra": 1.2, "licopeno": "alto"},
-    "Carrot 1": {"calorias": 41, "carbs": 10, "proteina": 0.9, "grasa": 0.2, "fibra": 2.8, "vitamina_a": "muy_alto"},
-    "Cucumber 1": {"calorias": 16, "carbs": 4, "proteina": 0.7, "grasa": 0.1, "fibra": 0.5, "agua": "95%"},
-    "Onion 2": {"calorias": 40, "carbs": 9, "proteina": 1.1, "grasa": 0.1, "fibra": 1.7, "antioxidantes": "alto"},
-    "Peach 1": {"calorias": 39, "carbs": 10, "proteina": 0.9, "grasa": 0.3, "fibra": 1.5, "vitamina_a": "alto"},
-    "Pear 1": {"calorias": 57, "carbs": 15, "proteina": 0.4, "grasa": 0.1, "fibra": 3.1, "vitamina_k": "alto"},
-    "Cherry 1": {"calorias": 63, "carbs": 16, "proteina": 1.1, "grasa": 0.2, "fibra": 2.1, "antioxidantes": "muy_alto"},
-    "Grape Blue 1": {"calorias": 62, "carbs": 16, "proteina": 0.6, "grasa": 0.2, "fibra": 0.9, "resveratrol": "alto"},
-    "Pepper Green 1": {"calorias": 31, "carbs": 7, "proteina": 1, "grasa": 0.3, "fibra": 2.5, "vitamina_c": "muy_alto"},
-    "Potato Red 1": {"calorias": 77, "carbs": 17, "proteina": 2, "grasa": 0.1, "fibra": 2.2, "potasio": "alto"},
-    "Avocado 1": {"calorias": 160, "carbs": 9, "proteina": 2, "grasa": 15, "fibra": 7, "grasas_saludables": "muy_alto"},
-    "Mango 1": {"calorias": 60, "carbs": 15, "proteina": 0.8, "grasa": 0.4, "fibra": 1.6, "vitamina_a": "muy_alto"},
-    "Strawberry 1": {"calorias": 32, "carbs": 8, "proteina": 0.7, "grasa": 0.3, "fibra": 2, "vitamina_c": "muy_alto"},
-    "Lemon 1": {"calorias": 17, "carbs": 5, "proteina": 0.6, "grasa": 0.2, "fibra": 1.6, "vitamina_c": "extremo"},
-    "Watermelon 1": {"calorias": 30, "carbs": 8, "proteina": 0.6, "grasa": 0.2, "fibra": 0.4, "agua": "92%"},
-    "Corn 1": {"calorias": 86, "carbs": 19, "proteina": 3.3, "grasa": 1.4, "fibra": 2.7, "antioxidantes": "alto"},
-    "Eggplant 1": {"calorias": 25, "carbs": 6, "proteina": 1, "grasa": 0.2, "fibra": 3, "antioxidantes": "alto"}
-}
+def error_modelo_cargando():
+    return HTTPException(
+        status_code=503,
+        detail="El modelo se está cargando, intenta de nuevo",
+        headers={"Retry-After": "2"},
+    )
 
-def load_model():
-    global model, classes
-    try:
-        model = tf.keras.models.load_model('best_model_20_clases.h5')
-        with open('classes.txt', 'r') as f:
-            classes = [line.strip() for line in f.readlines()]
-    except:
-        classes = ["Apple 10", "Banana 1", "Orange 1", "Tomato 1", "Carrot 1"]
-
-def preprocess_image(image_bytes):
-    image = Image.open(io.BytesIO(image_bytes))
-    image = image.convert('RGB')
-    image_array = np.array(image)
-    image_array = cv2.resize(image_array, (224, 224))
-    image_array = image_array.astype(np.float32) / 255.0
-    image_array = np.expand_dims(image_array, axis=0)
-    return image_array
-
-@app.on_event("startup")
-async def startup_event():
-    load_model()
+@app.get("/healthz")
+async def healthz():
+    # Liveness: el proceso responde, aunque el modelo todavía no esté listo
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: modelo cargado y calentado
+    cuerpo = {
+        "estado_modelo": estado_modelo,
+        "version": activa.version.version if activa is not None else None,
+        "tiempos_arranque": tiempos_arranque,
+    }
+    if estado_modelo != "listo":
+        raise HTTPException(status_code=503, detail=cuerpo)
+    return cuerpo
 
 class ChatMessage(BaseModel):
     message: str
 
+@contextmanager
+def errores_inferencia():
+    """Traduce los errores de subida e inferencia a respuestas HTTP"""
+    try:
+        yield
+    except HTTPException:
+        raise
+    except SubidaDemasiadoGrande:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    except SinBuffersLibres:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas subidas en curso, intenta de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    except PoolSaturado as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor de inferencia saturado, intenta de nuevo",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except BatcherDetenido:
+        # La versión que eligió la petición se retiró sin llegar a procesarla
+        raise HTTPException(
+            status_code=503,
+            detail="El modelo se está cambiando, intenta de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def elegir_servicio():
+    """La versión activa, o la candidata para una fracción del tráfico en modo A/B"""
+    if candidata is not None and modo_candidata == "ab" and random.random() < fraccion_candidata:
+        return candidata, "candidata"
+    return activa, "activa"
+
+def retenido(servicio):
+    return servicio.usar() if servicio is not None else nullcontext()
+
+def programar_sombra(servicio, imagen, prediction):
+    """Repite una fracción de las predicciones de la activa con la candidata en sombra"""
+    sombra = candidata
+    if sombra is None or modo_candidata != "sombra" or random.random() >= fraccion_candidata:
+        return
+    # La sombra no debe retrasar a la activa: si se acumula trabajo, se salta la comparación
+    if sombra.tamano != servicio.tamano or sombra.batcher.en_cola >= sombra.max_batch_size:
+        return
+    sombra.retener()
+    en_segundo_plano(comparar_sombra(sombra, servicio.classes[int(np.argmax(prediction))], imagen))
+
+async def comparar_sombra(sombra, clase_activa, imagen):
+    try:
+        inicio = time.perf_counter()
+        prediction = await sombra.batcher.predecir(imagen)
+        duracion_versiones.observar(time.perf_counter() - inicio, sombra.version.version, "sombra")
+        clase = sombra.classes[int(np.argmax(prediction))]
+        comparaciones_sombra.inc("coincide" if clase == clase_activa else "difiere")
+    except Exception:
+        comparaciones_sombra.inc("error")
+    finally:
+        sombra.soltar()
+
+async def clasificar_subida(servicio, rol, file, formatear, formato, traza):
+    """Lee una imagen subida y devuelve formatear(probabilidades), pasando por la cache
+
+    `formato` separa en la cache resultados con formatos distintos de la misma imagen.
+    Los tiempos de cada etapa se anotan en `traza`. Devuelve None si no hay modelo cargado.
+    """
+    # El hueco en la cola de inferencia se reserva antes de leer la subida: con el pool
+    # saturado se responde 503 sin ocupar un buffer
+    with servicio.pool.reservar() if servicio is not None else nullcontext():
+        # La subida se lee por trozos en un buffer reutilizable, con tamaño máximo
+        inicio = time.perf_counter()
+        async with buffers_subida.recibir(file, UPLOAD_BUFFER_WAIT) as image_bytes:
+            traza.registrar("subida", time.perf_counter() - inicio)
+            # El tipo se decide por los magic bytes, no por el content_type del cliente
+            if detectar_tipo_imagen(image_bytes) is None:
+                raise HTTPException(status_code=400, detail="File must be an image")
+            
+            if servicio is None:
+                return None
+            
+            pool = servicio.pool
+            # Un acierto en la cache evita decodificar la imagen
+            if cache is not None:
+                with traza.etapa("cache"):
+                    clave = await pool.ejecutar(cache.clave, image_bytes, f"{servicio.clave_cache}:{formato}")
+                    resultado = await cache.consultar(clave, pool.ejecutar)
+                if resultado is not None:
+                    return resultado
+            
+            # Decodificación y redimensionado: después ya no se necesitan los bytes subidos
+            tiempos = {}
+            try:
+                processed_image = await pool.ejecutar(servicio.preprocesar, image_bytes, tiempos)
+            except (OSError, ValueError):
+                # Magic bytes correctos pero datos truncados o corruptos: es un error del cliente
+                # (UnidentifiedImageError y "image file is truncated" de PIL son OSError)
+                raise HTTPException(status_code=400, detail="Imagen corrupta o truncada")
+        
+        # El buffer ya volvió al pool: la espera del batcher no limita las subidas en curso
+        inicio = time.perf_counter()
+        prediction = await servicio.batcher.predecir(processed_image[0], tiempos)
+        duracion_versiones.observar(time.perf_counter() - inicio, servicio.version.version, rol)
+        for etapa, segundos in tiempos.items():
+            traza.registrar(etapa, segundos)
+    
+    if rol == "activa":
+        programar_sombra(servicio, processed_image[0], prediction)
+    with traza.etapa("postproceso"):
+        resultado = formatear(prediction)
+        if cache is not None:
+            cache.guardar(clave, resultado)
+    return resultado
+
+def limitar_k(top_k, clases):
+    return max(1, min(top_k, len(clases) or 1))
+
+def marcar_version(response, servicio):
+    # Con A/B el cliente (y los logs del proxy) ven qué versión respondió
+    if servicio is not None:
+        response.headers["X-Modelo-Version"] = servicio.version.version
+
 @app.post("/predict")
-async def predict_image(file: UploadFile = File(...)):
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="File must be an image")
+async def predict_image(request: Request, response: Response, file: UploadFile = File(...),
+                        top_k: int = Form(PREDICT_TOP_K)):
+    if estado_modelo == "cargando":
+        raise error_modelo_cargando()
+    
+    servicio, rol = elegir_servicio()
+    clases = servicio.classes if servicio is not None else []
+    k = limitar_k(top_k, clases)
+    with errores_inferencia(), retenido(servicio):
+        resultado = await clasificar_subida(servicio, rol, file, lambda p: formatear_prediccion(p, k, clases),
+                                            f"predict{k}", request.state.traza)
+    
+    if resultado is None:
+        return {"clase": "modelo_no_cargado", "probabilidad": 0.0, "incierto": True, "predicciones": []}
+    if resultado["incierto"]:
+        predicciones_inciertas.inc("predict")
+    marcar_version(response, servicio)
+    return resultado
+
+@app.post("/analyze")
+async def analyze_image(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    top_k: int = Form(3),
+    mensaje: Optional[str] = Form(None),
+):
+    """Predicción top-k + datos nutricionales de cada clase (+ respuesta del asistente) en una petición"""
+    if estado_modelo == "cargando":
+        raise error_modelo_cargando()
+    
+    servicio, rol = elegir_servicio()
+    clases = servicio.classes if servicio is not None else []
+    k = limitar_k(top_k, clases)
+    with errores_inferencia(), retenido(servicio):
+        top = await clasificar_subida(servicio, rol, file, lambda p: formatear_top_k(p, k, clases), f"top{k}",
+                                      request.state.traza)
     
+    if top is None:
+        return {"clase": "modelo_no_cargado", "probabilidad": 0.0, "incierto": True, "predicciones": [],
+                "respuesta_asistente": None}
+    
+    # Los datos nutricionales se buscan por id de clase si la tabla sigue el orden de esta
+    # versión (la activa); una candidata con otras clases los busca por nombre
+    predicciones = [{**p, "nutricion": nutricion.registro(p["id"] if servicio.alineada else p["clase"])}
+                    for p in top]
+    incierto = predicciones[0]["probabilidad"] < CONFIDENCE_THRESHOLD * 100
+    if incierto:
+        predicciones_inciertas.inc("analyze")
+    respuesta = None
+    if mensaje:
+        with request.state.traza.etapa("asistente"):
+            # Con una clasificación dudosa el asistente responde sin suponer un alimento
+            respuesta = await asistente_nutricional_ia(mensaje, None if incierto else predicciones[0]["clase"])
+    
+    marcar_version(response, servicio)
+    return {
+        "clase": "incierto" if incierto else predicciones[0]["clase"],
+        "probabilidad": predicciones[0]["probabilidad"],
+        "incierto": incierto,
+        "predicciones": predicciones,
+        "respuesta_asistente": respuesta,
+    }
+
+async def predecir_trozo(servicio, trozo):
+    resultados = [None] * len(trozo)
+    k = limitar_k(PREDICT_TOP_K, servicio.classes)
+    if cache is not None:
+        # Solo se decodifican y pasan por el modelo las imágenes que no están en cache
+        # Misma clave que /predict con el top_k por defecto: comparten resultados
+        version = f"{servicio.clave_cache}:predict{k}"
+        claves = await asyncio.gather(*[servicio.pool.ejecutar(cache.clave, datos, version) for _, datos in trozo])
+        resultados = await asyncio.gather(*[cache.consultar(clave, servicio.pool.ejecutar) for clave in claves])
+    
+    pendientes = [i for i, resultado in enumerate(resultados) if resultado is None]
+    if pendientes:
+        nuevos = await predecir_trozo_modelo(servicio, [trozo[i] for i in pendientes], k)
+        for i, nuevo in zip(pendientes, nuevos):
+            resultados[i] = nuevo
+            if cache is not None and "error" not in nuevo:
+                cache.guardar(claves[i], nuevo)
+    
+    return [{"archivo": nombre, **resultado} for (nombre, _), resultado in zip(trozo, resultados)]
+
+async def predecir_trozo_modelo(servicio, trozo, k):
+    # Decodificar en paralelo directamente sobre un tensor contiguo (N, alto, ancho, 3)
+    lote = np.empty((len(trozo),) + servicio.tamano + (3,), dtype=np.float32)
+    errores = await asyncio.gather(*[servicio.pool.ejecutar(preprocess_seguro_en, datos, lote[i], servicio.tamano)
+                                     for i, (_, datos) in enumerate(trozo)])
+    validos = [i for i, error in enumerate(errores) if error is None]
+    if len(validos) < len(trozo):
+        lote = lote[validos]
+    predicciones = []
+    if validos:
+        inicio = time.perf_counter()
+        predicciones = await servicio.pool.predecir(lote)
+        observar_lote("batch", len(lote), time.perf_counter() - inicio)
+    predicciones = iter(predicciones)
+    
+    resultados = []
+    for error in errores:
+        if error is not None:
+            resultados.append({"error": str(error)})
+        else:
+            resultados.append(formatear_prediccion(next(predicciones), k, servicio.classes))
+    return resultados
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    if estado_modelo == "cargando":
+        raise error_modelo_cargando()
+    servicio = activa
+    if servicio is None:
+        raise HTTPException(status_code=503, detail="Modelo no cargado")
+    pool = servicio.pool
+    if pool.pendientes >= pool.max_cola:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor de inferencia saturado, intenta de nuevo",
+            headers={"Retry-After": str(pool.retry_after())},
+        )
+    
+    # Retenida hasta terminar la respuesta: un cambio de versión no corta el stream
+    servicio.retener()
     try:
-        image_bytes = await file.read()
-        processed_image = preprocess_image(image_bytes)
-        
-        if model is None:
-            return {"clase": "modelo_no_cargado", "probabilidad": 0.0}
-        
-        predictions = model.predict(processed_image)
-        predicted_class = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_class])
-        
-        clase = classes[predicted_class] if predicted_class < len(classes) else "desconocido"
-        
-        return {"clase": clase, "probabilidad": round(confidence * 100, 2)}
+        imagenes = []
+        extraccion = ExtraccionLote(BATCH_MAX_IMAGES, MAX_UPLOAD_BYTES, BATCH_MAX_EXTRACTED_BYTES)
+        for file in files:
+            imagenes.extend(await leer_archivo_lote(file, pool, extraccion))
+    except BaseException as e:
+        servicio.soltar()
+        if isinstance(e, ArchivoRechazado):
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        raise
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async def generar():
+        try:
+            for inicio in range(0, len(imagenes), BATCH_CHUNK_SIZE):
+                trozo = imagenes[inicio:inicio + BATCH_CHUNK_SIZE]
+                while True:
+                    try:
+                        with pool.reservar():
+                            resultados = await predecir_trozo(servicio, trozo)
+                        break
+                    except PoolSaturado as e:
+                        # La respuesta ya empezó: esperar en vez de devolver 503
+                        await asyncio.sleep(e.retry_after)
+                for resultado in resultados:
+                    yield json.dumps(resultado, ensure_ascii=False) + "\n"
+        finally:
+            servicio.soltar()
+    
+    return StreamingResponse(generar(), media_type="application/x-ndjson",
+                             headers={"X-Modelo-Version": servicio.version.version})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if cache is None:
+        return {"activa": False}
+    version = activa.clave_cache if activa is not None else None
+    return {"activa": True, "version_modelo": version, **cache.estadisticas()}
+
+class PeticionVersion(BaseModel):
+    version: str
+    modo: str = "sombra"  # solo para /modelos/candidata: "sombra" o "ab"
+    fraccion: float = 0.1
+
+def comprobar_admin(request):
+    if MODELS_ADMIN_TOKEN and not hmac.compare_digest(request.headers.get("x-admin-token", ""),
+                                                      MODELS_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de administración incorrecto")
+
+async def buscar_version(nombre):
+    if registro_versiones is None:
+        raise HTTPException(status_code=404, detail="Sin MODEL_REGISTRY no hay versiones que cargar")
+    try:
+        return await asyncio.to_thread(registro_versiones.obtener, nombre)
+    except (KeyError, ArtefactoInvalido):
+        raise HTTPException(status_code=404, detail=f"Versión desconocida: {nombre}")
+
+def lanzar_carga(version, rol, modo=None, fraccion=0.0):
+    # Una carga cada vez: dos modelos calentándose a la vez competirían con el tráfico
+    if carga.get("estado") == "cargando":
+        raise HTTPException(status_code=409, detail=f"Ya se está cargando la versión {carga['version']}")
+    carga.clear()
+    carga.update(version=version.version, rol=modo or rol, estado="cargando", error=None)
+    en_segundo_plano(cargar_version(version, rol, modo, fraccion))
+    return carga
+
+def describir(servicio):
+    if servicio is None:
+        return None
+    return {**servicio.version.como_dict(), "clases": len(servicio.classes), "en_uso": servicio.en_uso}
+
+@app.get("/modelos")
+async def listar_modelos():
+    versiones = await asyncio.to_thread(registro_versiones.versiones) if registro_versiones is not None else []
+    return {
+        "activa": describir(activa),
+        "candidata": {**describir(candidata), "modo": modo_candidata, "fraccion": fraccion_candidata}
+                     if candidata is not None else None,
+        "carga": carga,
+        "versiones": [version.como_dict() for version in versiones],
+    }
+
+@app.post("/modelos/activar", status_code=202)
+async def activar_modelo(peticion: PeticionVersion, request: Request):
+    """Carga y calienta la versión en segundo plano y la pone en servicio sin cortar peticiones"""
+    comprobar_admin(request)
+    return lanzar_carga(await buscar_version(peticion.version), "activa")
+
+@app.post("/modelos/candidata", status_code=202)
+async def cargar_candidata(peticion: PeticionVersion, request: Request):
+    """Versión en sombra (se compara sin responder) o en A/B (responde a `fraccion` del tráfico)"""
+    comprobar_admin(request)
+    if peticion.modo not in ("sombra", "ab"):
+        raise HTTPException(status_code=400, detail="modo debe ser 'sombra' o 'ab'")
+    if not 0.0 <= peticion.fraccion <= 1.0:
+        raise HTTPException(status_code=400, detail="fraccion debe estar entre 0 y 1")
+    return lanzar_carga(await buscar_version(peticion.version), "candidata", peticion.modo, peticion.fraccion)
+
+@app.delete("/modelos/candidata")
+async def retirar_candidata(request: Request):
+    global candidata
+    comprobar_admin(request)
+    if candidata is None:
+        raise HTTPException(status_code=404, detail="No hay versión candidata")
+    anterior, candidata = candidata, None
+    en_segundo_plano(anterior.retirar())
+    return {"retirada": anterior.version.version}
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(registro.exponer(), media_type=TIPO_CONTENIDO)
+
+@app.get("/uploads/stats")
+async def uploads_stats():
+    return buffers_subida.estadisticas()
 
 @app.post("/chat")
 async def chat_nutrition(message: ChatMessage):
-    user_message = message.message.lower()
-    found_foods = []
-    
-    # Buscar alimentos mencionados en el mensaje
-    for food in nutricion.keys():
-        if food.lower() in user_message:
-            found_foods.append(food)
+    # Buscar alimentos mencionados en el mensaje (una sola pasada, con sinónimos y plurales)
+    found_foods = [food for food in buscador.buscar(message.message) if food in nutricion]
     
     if found_foods:
         response = "Información nutricional encontrada:\n\n"
         for food in found_foods:
-            info = nutricion[food]
+            info = nutricion.registro(food)
             response += f"🍎 {food}:\n"
             response += f"• Calorías: {info['calorias']} kcal\n"
             response += f"• Carbohidratos: {info['carbs']}g\n"
@@ -0,0 +1,113 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Modelo cargado dentro de cada proceso del pool (modo "process")
+_modelo_proceso = None
+
+
+class PoolSaturado(Exception):
+    """La cola de inferencia está llena; el cliente debe reintentar más tarde"""
+
+    def __init__(self, retry_after):
+        super().__init__("Cola de inferencia llena")
+        self.retry_after = retry_after
+
+
+def _fijar_cpu(cpus, contador):
+    # Cada worker se fija a un núcleo distinto de la lista (solo Linux)
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    with contador.get_lock():
+        indice = contador.value
+        contador.value += 1
+    os.sched_setaffinity(0, {cpus[indice % len(cpus)]})
+
+
+def _inicializar_proceso(ruta_modelo, runtime, num_threads, cpus, contador, cascada):
+    global _modelo_proceso
+    _fijar_cpu(cpus, contador)
+    from runtimes import cargar_modelo
+    _modelo_proceso = cargar_modelo(ruta_modelo, runtime, num_threads, cascada)
+
+
+def _predecir_en_proceso(lote):
+    return _modelo_proceso.predict_on_batch(lote)
+
+
+class PoolInferencia:
+    """Ejecuta el modelo y el preprocesamiento fuera del event loop con cola acotada"""
+
+    def __init__(self, ruta_modelo, modelo=None, modo="thread", workers=1, cpus=None, max_cola=64,
+                 runtime=None, num_threads=None, cascada=None):
+        self.modo = modo
+        self.workers = workers
+        self.max_cola = max_cola
+        self.pendientes = 0
+        # Latencia media (EMA) de cada petición, para estimar Retry-After
+        self._latencia_media = 0.1
+        self._modelo = modelo
+
+        contador = multiprocessing.Value("i", 0)
+        if modo == "process":
+            # Un modelo cargado por proceso; escala a varios núcleos sin duplicar la app
+            self._executor_modelo = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_proceso,
+                initargs=(ruta_modelo, runtime, num_threads, cpus, contador, cascada),
+            )
+        else:
+            if modelo is None:
+                raise ValueError("El modo 'thread' necesita el modelo ya cargado")
+            self._executor_modelo = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="inferencia",
+                initializer=_fijar_cpu,
+                initargs=(cpus, contador),
+            )
+        # Decodificación y redimensionado siempre en hilos (OpenCV/NumPy liberan el GIL)
+        self._executor_cpu = ThreadPoolExecutor(
+            max_workers=max(2, workers), thread_name_prefix="preproceso"
+        )
+
+    def retry_after(self):
+        segundos = self.pendientes * self._latencia_media / max(1, self.workers)
+        return max(1, math.ceil(segundos))
+
+    @contextmanager
+    def reservar(self):
+        """Reserva un hueco en la cola o lanza PoolSaturado (back-pressure)"""
+        if self.pendientes >= self.max_cola:
+            raise PoolSaturado(self.retry_after())
+        self.pendientes += 1
+        inicio = asyncio.get_running_loop().time()
+        try:
+            yield
+        finally:
+            self.pendientes -= 1
+            duracion = asyncio.get_running_loop().time() - inicio
+            self._latencia_media = 0.9 * self._latencia_media + 0.1 * duracion
+
+    async def ejecutar(self, fn, *args):
+        """Ejecuta una función CPU-bound (p. ej. el preprocesado) en el pool de hilos"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor_cpu, fn, *args)
+
+    async def predecir(self, lote):
+        loop = asyncio.get_running_loop()
+        if self.modo == "process":
+            return await loop.run_in_executor(self._executor_modelo, _predecir_en_proceso, lote)
+        return await loop.run_in_executor(self._executor_modelo, self._modelo.predict_on_batch, lote)
+
+    async def calentar(self, lote):
+        """Una pasada por worker para que cada copia del modelo trace su grafo; devuelve una salida"""
+        salidas = await asyncio.gather(*[self.predecir(lote) for _ in range(self.workers)])
+        return salidas[0]
+
+    def cerrar(self):
+        self._executor_modelo.shutdown(wait=False, cancel_futures=True)
+        self._executor_cpu.shutdown(wait=False, cancel_futures=True)
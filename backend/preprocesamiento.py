@@ -0,0 +1,99 @@
+import io
+import threading
+import time
+import numpy as np
+import cv2
+from PIL import Image
+
+TAMANO = (224, 224)
+ESCALA = np.float32(1.0 / 255.0)
+
+# Buffer uint8 reutilizable por hilo para el resultado del resize
+_local = threading.local()
+
+
+def _buffer_redimensionado(tamano):
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or buffer.shape[:2] != (tamano[1], tamano[0]):
+        buffer = np.empty((tamano[1], tamano[0], 3), dtype=np.uint8)
+        _local.buffer = buffer
+    return buffer
+
+
+class LectorMemoria(io.RawIOBase):
+    """Archivo de solo lectura sobre un memoryview, para decodificar sin copiar la subida"""
+
+    def __init__(self, vista):
+        self._vista = memoryview(vista).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        n = max(0, min(len(destino), len(self._vista) - self._pos))
+        destino[:n] = self._vista[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._vista)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def decodificar_reducida(image_bytes, tamano=TAMANO):
+    """Decodifica la imagen pidiendo al decodificador JPEG una escala reducida"""
+    # BytesIO comparte el buffer de un bytes; un memoryview se lee sin copiarlo entero
+    fuente = io.BytesIO(image_bytes) if isinstance(image_bytes, bytes) else LectorMemoria(image_bytes)
+    image = Image.open(fuente)
+    # En JPEG, draft() escala en el dominio DCT (1/2, 1/4, 1/8) sin bajar de `tamano`,
+    # así una foto de 12 MP se decodifica a ~1/8 de su resolución
+    image.draft("RGB", tamano)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def preprocesar_en(image_bytes, destino, tamano=TAMANO, tiempos=None):
+    """Decodifica, redimensiona y normaliza escribiendo en `destino` (alto, ancho, 3) float32
+
+    Si se pasa el dict `tiempos`, se anotan en él los segundos de "decodificacion" y de
+    "redimensionado" (que incluye la normalización).
+    """
+    inicio = time.perf_counter()
+    origen = np.asarray(decodificar_reducida(image_bytes, tamano))
+    decodificada = time.perf_counter()
+    reducida = cv2.resize(origen, tamano, dst=_buffer_redimensionado(tamano),
+                          interpolation=cv2.INTER_AREA)
+    # Conversión a float y normalización en una sola pasada, sin arrays intermedios
+    np.multiply(reducida, ESCALA, out=destino)
+    if tiempos is not None:
+        tiempos["decodificacion"] = decodificada - inicio
+        tiempos["redimensionado"] = time.perf_counter() - decodificada
+    return destino
+
+
+def preprocesar_lote(lista_bytes, salida=None, tamano=TAMANO):
+    """Llena in situ un tensor contiguo (N, alto, ancho, 3) float32 con las imágenes"""
+    if salida is None:
+        salida = np.empty((len(lista_bytes), tamano[1], tamano[0], 3), dtype=np.float32)
+    for i, image_bytes in enumerate(lista_bytes):
+        preprocesar_en(image_bytes, salida[i], tamano)
+    return salida
+
+
+def imagen_calentamiento(tamano=TAMANO):
+    """JPEG pequeño para calentar la decodificación y el modelo al arrancar"""
+    buffer = io.BytesIO()
+    Image.new("RGB", tamano, (128, 128, 128)).save(buffer, format="JPEG")
+    return buffer.getvalue()
@@ -0,0 +1,233 @@
+"""Registro de versiones del modelo: artefacto + clases + preprocesamiento + checksum
+
+Cada versión es una carpeta de MODEL_REGISTRY con su manifest.json:
+
+    modelos/
+        20250601-120000-3fa9c1d2/
+            manifest.json               version, archivos, img_size, runtime, sha256
+            modelo.tflite
+            modelo.calibracion.json     opcional (evaluacion.py --calibrar)
+            classes.txt
+        ACTIVA                          versión que se sirve al arrancar
+
+Publicar copia los archivos a una carpeta temporal y la renombra al final, así que una
+versión a medio copiar nunca aparece en el registro. El backend comprueba los checksums
+antes de cargarla.
+
+Uso:
+    python registro_modelos.py publicar best_model_20_clases.h5 --classes classes.txt [--activar]
+    python registro_modelos.py publicar modelo.h5 --rapido modelo_alpha0.35.tflite --umbral-cascada 0.8
+    python registro_modelos.py listar
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from runtimes import ruta_calibracion, leer_temperatura, cargar_runtime, comprobar_cascada
+
+MANIFEST = "manifest.json"
+ACTIVA = "ACTIVA"
+
+
+class ArtefactoInvalido(Exception):
+    """Falta un archivo de la versión o no corresponde a lo que dice su manifest"""
+
+
+def checksum_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def escribir_atomico(ruta, texto):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+class VersionModelo:
+    """Metadatos de una versión (no carga el modelo)"""
+
+    def __init__(self, version, ruta_modelo, ruta_classes, img_size=224, runtime=None,
+                 sha256=None, cascada=None, creada=None):
+        self.version = version
+        self.ruta_modelo = ruta_modelo
+        self.ruta_classes = ruta_classes
+        self.img_size = img_size
+        self.runtime = runtime
+        # {ruta: sha256} de los modelos; vacío para un artefacto suelto fuera del registro
+        self.sha256 = sha256 or {}
+        # (ruta del modelo rápido, umbral) o None
+        self.cascada = cascada
+        self.creada = creada
+
+    @classmethod
+    def desde_directorio(cls, directorio):
+        try:
+            with open(os.path.join(directorio, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ArtefactoInvalido(f"{directorio}: manifest ilegible ({e})")
+        ruta = lambda nombre: os.path.join(directorio, nombre)
+        cascada = manifest.get("cascada")
+        return cls(
+            manifest["version"],
+            ruta(manifest["modelo"]),
+            ruta(manifest["classes"]),
+            manifest.get("img_size", 224),
+            manifest.get("runtime"),
+            {ruta(nombre): sha for nombre, sha in manifest.get("sha256", {}).items()},
+            (ruta(cascada["modelo"]), cascada["umbral"]) if cascada else None,
+            manifest.get("creada"),
+        )
+
+    @property
+    def rutas_modelos(self):
+        return [self.ruta_modelo] + ([self.cascada[0]] if self.cascada else [])
+
+    def verificar(self):
+        """Comprueba archivos y checksums y devuelve la lista de clases"""
+        for ruta in self.rutas_modelos + [self.ruta_classes]:
+            if not os.path.exists(ruta):
+                raise ArtefactoInvalido(f"Versión {self.version}: no existe {ruta}")
+        for ruta, esperado in self.sha256.items():
+            if checksum_archivo(ruta) != esperado:
+                raise ArtefactoInvalido(f"Versión {self.version}: el checksum de {ruta} no coincide")
+        with open(self.ruta_classes, encoding="utf-8") as f:
+            clases = [line.strip() for line in f if line.strip()]
+        if not clases:
+            raise ArtefactoInvalido(f"Versión {self.version}: {self.ruta_classes} está vacío")
+        return clases
+
+    def clave_cache(self, *extra):
+        """Cambia si cambian los artefactos, su calibración o lo que se pase en `extra`"""
+        partes = [self.sha256.get(ruta) or checksum_archivo(ruta) for ruta in self.rutas_modelos]
+        partes += [leer_temperatura(ruta) for ruta in self.rutas_modelos]
+        partes += [self.img_size, self.cascada[1] if self.cascada else None, *extra]
+        return hashlib.sha256(repr(partes).encode()).hexdigest()[:16]
+
+    def como_dict(self):
+        return {
+            "version": self.version,
+            "modelo": os.path.basename(self.ruta_modelo),
+            "img_size": self.img_size,
+            "runtime": self.runtime,
+            "cascada": os.path.basename(self.cascada[0]) if self.cascada else None,
+            "creada": self.creada,
+        }
+
+
+class RegistroModelos:
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def versiones(self):
+        """Versiones publicadas, de la más antigua a la más reciente"""
+        if not os.path.isdir(self.directorio):
+            return []
+        versiones = []
+        for entrada in os.scandir(self.directorio):
+            if entrada.is_dir() and not entrada.name.startswith(".") and \
+                    os.path.exists(os.path.join(entrada.path, MANIFEST)):
+                versiones.append(VersionModelo.desde_directorio(entrada.path))
+        return sorted(versiones, key=lambda v: (v.creada or "", v.version))
+
+    def obtener(self, version):
+        directorio = os.path.join(self.directorio, os.path.basename(version))
+        if not os.path.exists(os.path.join(directorio, MANIFEST)):
+            raise KeyError(version)
+        return VersionModelo.desde_directorio(directorio)
+
+    def activa(self):
+        """La versión marcada en ACTIVA o, si no hay marca, la más reciente"""
+        try:
+            with open(os.path.join(self.directorio, ACTIVA), encoding="utf-8") as f:
+                return self.obtener(f.read().strip())
+        except (OSError, KeyError):
+            versiones = self.versiones()
+            return versiones[-1] if versiones else None
+
+    def marcar_activa(self, version):
+        escribir_atomico(os.path.join(self.directorio, ACTIVA), version + "\n")
+
+    def publicar(self, ruta_modelo, ruta_classes, version=None, img_size=224, runtime=None,
+                 rapido=None, umbral_cascada=0.8):
+        sha256 = {}
+        for ruta in [ruta_modelo] + ([rapido] if rapido else []):
+            sha256[os.path.basename(ruta)] = checksum_archivo(ruta)
+        if rapido and os.path.basename(rapido) == os.path.basename(ruta_modelo):
+            raise ValueError("El modelo rápido y el completo tienen el mismo nombre de archivo")
+        if rapido:
+            # Misma comprobación que al cargar la cascada en el backend, antes de publicar nada
+            comprobar_cascada(cargar_runtime(rapido), cargar_runtime(ruta_modelo, runtime))
+        version = version or time.strftime("%Y%m%d-%H%M%S-") + sha256[os.path.basename(ruta_modelo)][:8]
+        destino = os.path.join(self.directorio, version)
+        if os.path.exists(destino):
+            raise ValueError(f"La versión {version} ya existe")
+
+        temporal = os.path.join(self.directorio, f".{version}.tmp")
+        shutil.rmtree(temporal, ignore_errors=True)
+        os.makedirs(temporal)
+        for ruta in [ruta_modelo] + ([rapido] if rapido else []):
+            shutil.copy2(ruta, temporal)
+            if os.path.exists(ruta_calibracion(ruta)):
+                shutil.copy2(ruta_calibracion(ruta), temporal)
+        shutil.copy2(ruta_classes, os.path.join(temporal, "classes.txt"))
+        manifest = {
+            "version": version,
+            "modelo": os.path.basename(ruta_modelo),
+            "classes": "classes.txt",
+            "img_size": img_size,
+            "runtime": runtime,
+            "sha256": sha256,
+            "cascada": {"modelo": os.path.basename(rapido), "umbral": umbral_cascada} if rapido else None,
+            "creada": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(os.path.join(temporal, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.rename(temporal, destino)
+        return VersionModelo.desde_directorio(destino)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registro", default=os.getenv("MODEL_REGISTRY", "modelos"))
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    publicar = comandos.add_parser("publicar", help="Copia un artefacto al registro como versión nueva")
+    publicar.add_argument("modelo", help="Artefacto .h5, .tflite u .onnx")
+    publicar.add_argument("--classes", default="classes.txt")
+    publicar.add_argument("--version", help="Nombre de la versión (por defecto fecha + checksum)")
+    publicar.add_argument("--img-size", type=int, default=224)
+    publicar.add_argument("--runtime", choices=["keras", "tflite", "onnx"])
+    publicar.add_argument("--rapido", help="Modelo rápido de la cascada (opcional)")
+    publicar.add_argument("--umbral-cascada", type=float, default=0.8)
+    publicar.add_argument("--activar", action="store_true",
+                          help="Marcarla como activa (se sirve en el próximo arranque)")
+
+    comandos.add_parser("listar", help="Versiones publicadas")
+    args = parser.parse_args()
+
+    registro = RegistroModelos(args.registro)
+    if args.comando == "publicar":
+        os.makedirs(args.registro, exist_ok=True)
+        version = registro.publicar(args.modelo, args.classes, args.version, args.img_size,
+                                    args.runtime, args.rapido, args.umbral_cascada)
+        if args.activar:
+            registro.marcar_activa(version.version)
+        print(f"Publicada {version.version} en {args.registro}")
+    else:
+        activa = registro.activa()
+        for version in registro.versiones():
+            marca = "*" if activa is not None and version.version == activa.version else " "
+            print(f"{marca} {version.version}  {os.path.basename(version.ruta_modelo)}  "
+                  f"img {version.img_size}  {version.creada or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import json
+import threading
+import numpy as np
+
+# Todos los runtimes exponen predict_on_batch(lote) -> (N, num_clases), igual que
+# un modelo Keras, para que el pool de inferencia y el batcher no dependan del formato.
+# `forma_entrada` (alto, ancho) y `num_salidas` describen el artefacto; una dimensión
+# dinámica (ONNX exportado sin tamaño fijo) queda como None.
+
+
+def _dimension(valor):
+    return int(valor) if isinstance(valor, (int, np.integer)) and valor > 0 else None
+
+
+class RuntimeKeras:
+    def __init__(self, ruta):
+        import tensorflow as tf
+        self.modelo = tf.keras.models.load_model(ruta)
+        self.forma_entrada = tuple(_dimension(d) for d in self.modelo.input_shape[1:3])
+        self.num_salidas = _dimension(self.modelo.output_shape[-1])
+
+    def predict_on_batch(self, lote):
+        return np.asarray(self.modelo.predict_on_batch(lote))
+
+
+class RuntimeTFLite:
+    def __init__(self, ruta, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=ruta, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        entrada = self.interpreter.get_input_details()[0]
+        salida = self.interpreter.get_output_details()[0]
+        self._entrada = entrada['index']
+        self._salida = salida['index']
+        self.forma_entrada = tuple(_dimension(d) for d in entrada['shape'][1:3])
+        self.num_salidas = _dimension(salida['shape'][-1])
+        self._forma = None
+        # El intérprete no es thread-safe: usar un runtime por worker o serializar
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, lote):
+        with self._lock:
+            if lote.shape != self._forma:
+                self.interpreter.resize_tensor_input(self._entrada, lote.shape)
+                self.interpreter.allocate_tensors()
+                self._forma = lote.shape
+            self.interpreter.set_tensor(self._entrada, lote.astype(np.float32, copy=False))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._salida).copy()
+
+
+class RuntimeONNX:
+    def __init__(self, ruta, num_threads=None):
+        import onnxruntime as ort
+        opciones = ort.SessionOptions()
+        if num_threads:
+            opciones.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(ruta, opciones, providers=['CPUExecutionProvider'])
+        entrada = self.session.get_inputs()[0]
+        self._entrada = entrada.name
+        self.forma_entrada = tuple(_dimension(d) for d in entrada.shape[1:3])
+        self.num_salidas = _dimension(self.session.get_outputs()[0].shape[-1])
+
+    def predict_on_batch(self, lote):
+        return self.session.run(None, {self._entrada: lote.astype(np.float32, copy=False)})[0]
+
+
+RUNTIMES = {
+    "keras": RuntimeKeras,
+    "tflite": RuntimeTFLite,
+    "onnx": RuntimeONNX,
+}
+
+
+def runtime_por_extension(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.tflite':
+        return "tflite"
+    if extension == '.onnx':
+        return "onnx"
+    return "keras"
+
+
+def cargar_runtime(ruta, runtime=None, num_threads=None):
+    """Carga un artefacto (.h5, .tflite, .onnx) con el runtime indicado o el de su extensión"""
+    runtime = runtime or runtime_por_extension(ruta)
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Runtime desconocido: {runtime} (opciones: {', '.join(RUNTIMES)})")
+    if runtime == "keras":
+        return RuntimeKeras(ruta)
+    return RUNTIMES[runtime](ruta, num_threads=num_threads)
+
+
+def ruta_calibracion(ruta_modelo):
+    """Calibración que escribe evaluacion.py --calibrar junto al artefacto"""
+    return os.path.splitext(ruta_modelo)[0] + ".calibracion.json"
+
+
+def leer_temperatura(ruta_modelo):
+    ruta = ruta_calibracion(ruta_modelo)
+    if not os.path.exists(ruta):
+        return 1.0
+    with open(ruta, encoding="utf-8") as f:
+        return float(json.load(f).get("temperatura", 1.0))
+
+
+def calibrar(probabilidades, temperatura):
+    """Temperature scaling sobre la salida softmax: softmax(log(p) / T)"""
+    logits = np.log(np.clip(probabilidades, 1e-12, 1.0)) / temperatura
+    logits -= logits.max(axis=-1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=-1, keepdims=True)
+    return logits.astype(np.float32, copy=False)
+
+
+class RuntimeCalibrado:
+    """Devuelve probabilidades calibradas para que los umbrales de confianza signifiquen algo"""
+
+    def __init__(self, runtime, temperatura):
+        self.runtime = runtime
+        self.temperatura = temperatura
+        self.forma_entrada = getattr(runtime, "forma_entrada", None)
+        self.num_salidas = getattr(runtime, "num_salidas", None)
+
+    def predict_on_batch(self, lote):
+        return calibrar(np.asarray(self.runtime.predict_on_batch(lote)), self.temperatura)
+
+
+def _distintas(a, b):
+    # Solo cuentan las dimensiones conocidas en los dos artefactos
+    return a is not None and b is not None and \
+        any(x is not None and y is not None and x != y for x, y in zip(a, b))
+
+
+def comprobar_cascada(rapido, completo):
+    """ValueError si los dos modelos de una cascada no pueden recibir el mismo lote
+
+    Los dos reciben el mismo tensor: con otra resolución el modelo rápido fallaría (Keras)
+    o se redimensionaría en silencio a la del completo (TFLite), y con otro número de
+    salidas sus probabilidades no serían de las mismas clases.
+    """
+    entrada_rapido = getattr(rapido, "forma_entrada", None)
+    entrada_completo = getattr(completo, "forma_entrada", None)
+    if _distintas(entrada_rapido, entrada_completo):
+        raise ValueError(f"Cascada incompatible: el modelo rápido espera imágenes de {entrada_rapido} "
+                         f"y el completo de {entrada_completo}")
+    salidas_rapido = getattr(rapido, "num_salidas", None)
+    salidas_completo = getattr(completo, "num_salidas", None)
+    if _distintas((salidas_rapido,), (salidas_completo,)):
+        raise ValueError(f"Cascada incompatible: el modelo rápido tiene {salidas_rapido} salidas "
+                         f"y el completo {salidas_completo}")
+
+
+class RuntimeCascada:
+    """Modelo rápido para todo el lote; solo las imágenes dudosas pasan por el completo
+
+    Una imagen se escala si la probabilidad máxima (calibrada) del modelo rápido queda por
+    debajo de `umbral`. Los dos modelos deben tener la misma resolución de entrada y las
+    mismas clases en el mismo orden (ver `comprobar_cascada`).
+    """
+
+    def __init__(self, rapido, completo, umbral):
+        comprobar_cascada(rapido, completo)
+        self.rapido = rapido
+        self.completo = completo
+        self.umbral = umbral
+        self.imagenes = 0
+        self.escaladas = 0
+        self.forma_entrada = getattr(completo, "forma_entrada", None)
+        self.num_salidas = getattr(completo, "num_salidas", None)
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, lote):
+        probabilidades = np.array(self.rapido.predict_on_batch(lote), dtype=np.float32)
+        dudosas = np.flatnonzero(probabilidades.max(axis=1) < self.umbral)
+        if len(dudosas):
+            completas = np.asarray(self.completo.predict_on_batch(lote[dudosas]))
+            if completas.shape[1] != probabilidades.shape[1]:
+                raise ValueError(f"El modelo rápido tiene {probabilidades.shape[1]} salidas "
+                                 f"y el completo {completas.shape[1]}")
+            probabilidades[dudosas] = completas
+        with self._lock:
+            self.imagenes += len(lote)
+            self.escaladas += len(dudosas)
+        return probabilidades
+
+
+def cargar_calibrado(ruta, runtime=None, num_threads=None):
+    modelo = cargar_runtime(ruta, runtime, num_threads)
+    temperatura = leer_temperatura(ruta)
+    return modelo if temperatura == 1.0 else RuntimeCalibrado(modelo, temperatura)
+
+
+def cargar_modelo(ruta, runtime=None, num_threads=None, cascada=None):
+    """Artefacto a servir con su calibración y, si se indica cascada=(ruta_rapido, umbral),
+    precedido del modelo rápido (que se carga con el runtime de su extensión)"""
+    modelo = cargar_calibrado(ruta, runtime, num_threads)
+    if cascada is None:
+        return modelo
+    ruta_rapido, umbral = cascada
+    return RuntimeCascada(cargar_calibrado(ruta_rapido, num_threads=num_threads), modelo, umbral)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+import numpy as np
+from batcher import MicroBatcher
+from pool_inferencia import PoolInferencia
+from registro_modelos import ArtefactoInvalido
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class ServicioModelo:
+    """Una versión del modelo cargada y calentada, con su propio pool y batcher
+
+    Cada petición retiene el servicio que eligió (`usar`) hasta terminar. Al sustituirlo por
+    otra versión, `retirar` espera a que no quede ninguna en curso antes de cerrar el pool,
+    así que el cambio no corta peticiones.
+    """
+
+    def __init__(self, version, opciones_pool, max_batch_size=16, max_batch_wait_ms=5.0,
+                 observador=None, extra_cache=()):
+        self.version = version
+        self.opciones_pool = opciones_pool
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.observador = observador
+        self.extra_cache = extra_cache
+        self.classes = []
+        self.modelo = None
+        self.pool = None
+        self.batcher = None
+        self.clave_cache = None
+        self.en_uso = 0
+        # Las filas de la base nutricional siguen el orden de sus clases (id == índice)
+        self.alineada = False
+
+    @property
+    def tamano(self):
+        return (self.version.img_size, self.version.img_size)
+
+    async def cargar(self):
+        self.classes = await asyncio.to_thread(self.version.verificar)
+        self.clave_cache = await asyncio.to_thread(self.version.clave_cache, *self.extra_cache)
+        if self.opciones_pool.get("modo") != "process":
+            # En modo "process" cada proceso del pool carga su propia copia
+            from runtimes import cargar_modelo
+            self.modelo = await asyncio.to_thread(
+                cargar_modelo, self.version.ruta_modelo, self.version.runtime,
+                self.opciones_pool.get("num_threads"), self.version.cascada)
+        self.pool = PoolInferencia(self.version.ruta_modelo, modelo=self.modelo, runtime=self.version.runtime,
+                                   cascada=self.version.cascada, **self.opciones_pool)
+
+    async def calentar(self):
+        """Decodificación + un lote por worker y por tamaño de lote antes de recibir tráfico"""
+        from preprocesamiento import imagen_calentamiento
+        imagen = await self.pool.ejecutar(self.preprocesar, imagen_calentamiento(self.tamano))
+        for tamano in sorted({1, self.max_batch_size}):
+            salida = await self.pool.calentar(np.repeat(imagen, tamano, axis=0))
+        # Un classes.txt que no corresponde al modelo daría etiquetas equivocadas sin avisar
+        if salida.shape[-1] != len(self.classes):
+            raise ArtefactoInvalido(f"Versión {self.version.version}: el modelo tiene {salida.shape[-1]} "
+                                    f"salidas y {len(self.classes)} clases")
+        self.batcher = MicroBatcher(self.pool.predecir, self.max_batch_size, self.max_batch_wait_ms,
+                                    self.pool.workers, observador=self.observador)
+        self.batcher.iniciar()
+
+    def preprocesar(self, image_bytes, tiempos=None):
+        from preprocesamiento import preprocesar_en
+        image_array = np.empty((1,) + self.tamano + (3,), dtype=np.float32)
+        preprocesar_en(image_bytes, image_array[0], self.tamano, tiempos)
+        return image_array
+
+    def retener(self):
+        self.en_uso += 1
+
+    def soltar(self):
+        self.en_uso -= 1
+
+    @contextmanager
+    def usar(self):
+        self.retener()
+        try:
+            yield self
+        finally:
+            self.soltar()
+
+    async def cerrar(self):
+        if self.batcher is not None:
+            await self.batcher.detener()
+        if self.pool is not None:
+            self.pool.cerrar()
+
+    async def retirar(self, espera_maxima=60.0):
+        """Cierra el servicio cuando terminan las peticiones que lo estaban usando"""
+        limite = time.monotonic() + espera_maxima
+        while self.en_uso > 0 and time.monotonic() < limite:
+            await asyncio.sleep(0.05)
+        if self.en_uso > 0:
+            logger.warning(f"Versión {self.version.version} cerrada con {self.en_uso} peticiones en curso")
+        await self.cerrar()
+        logger.info(f"Versión {self.version.version} retirada")
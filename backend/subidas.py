@@ -0,0 +1,226 @@
+import asyncio
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager, asynccontextmanager
+
+TAMANO_TROZO = 64 * 1024
+
+# Firmas (magic bytes) de los formatos de imagen aceptados
+FIRMAS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+class SubidaDemasiadoGrande(Exception):
+    pass
+
+
+class SinBuffersLibres(Exception):
+    pass
+
+
+class ArchivoRechazado(Exception):
+    """Archivo de /predict/batch corrupto o que supera los límites de extracción"""
+
+    def __init__(self, mensaje, status_code=413):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+def detectar_tipo_imagen(cabecera):
+    """Devuelve el tipo MIME según los primeros bytes, o None si no es una imagen conocida"""
+    cabecera = bytes(cabecera[:16])
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    for firma, tipo in FIRMAS:
+        if cabecera.startswith(firma):
+            return tipo
+    return None
+
+
+def detectar_tipo_archivo(cabecera):
+    """"zip", "tar" (también comprimido con gzip) o None según los primeros 512 bytes"""
+    cabecera = bytes(cabecera[:512])
+    if cabecera[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+        return "zip"
+    if cabecera[:2] == b"\x1f\x8b" or cabecera[257:262] == b"ustar":
+        return "tar"
+    return None
+
+
+class ExtraccionLote:
+    """Lee las imágenes de una petición a /predict/batch dentro de sus límites
+
+    Una por petición: cuenta imágenes y bytes descomprimidos entre todos sus archivos.
+    """
+
+    def __init__(self, max_imagenes, max_bytes_imagen, max_bytes_total):
+        self.max_imagenes = max_imagenes
+        self.max_bytes_imagen = max_bytes_imagen
+        self.max_bytes_total = max_bytes_total
+        self.imagenes = 0
+        self.bytes = 0
+
+    def _comprobar(self, nombre, tamano):
+        if tamano > self.max_bytes_imagen:
+            raise ArchivoRechazado(f"{nombre}: supera {self.max_bytes_imagen} bytes")
+        if self.bytes + tamano > self.max_bytes_total:
+            raise ArchivoRechazado(f"Las imágenes del lote superan {self.max_bytes_total} bytes descomprimidas")
+
+    def leer(self, nombre, fuente, declarado=0):
+        """Bytes de una imagen leída de `fuente`; `declarado` es el tamaño según su cabecera
+
+        El tamaño se comprueba antes de leer (con el declarado) y al leer, porque la cabecera
+        de un archivo puede mentir. De lo que no tiene firma de imagen solo se devuelve la
+        cabecera: se rechaza después sin decodificarlo ni leer el resto.
+        """
+        self.imagenes += 1
+        if self.imagenes > self.max_imagenes:
+            raise ArchivoRechazado(f"Más de {self.max_imagenes} imágenes en la petición")
+        self._comprobar(nombre, declarado)
+        cabecera = fuente.read(16)
+        if detectar_tipo_imagen(cabecera) is None:
+            return cabecera
+        limite = min(self.max_bytes_imagen, self.max_bytes_total - self.bytes)
+        datos = cabecera + fuente.read(limite + 1 - len(cabecera))
+        self._comprobar(nombre, len(datos))
+        self.bytes += len(datos)
+        return datos
+
+    def extraer(self, fuente, tipo):
+        """[(nombre, bytes)] de los archivos de un .zip o .tar(.gz) abierto sobre `fuente`"""
+        imagenes = []
+        try:
+            if tipo == "zip":
+                with zipfile.ZipFile(fuente) as archivo:
+                    for info in archivo.infolist():
+                        if not info.is_dir():
+                            with archivo.open(info) as miembro:
+                                imagenes.append((info.filename, self.leer(info.filename, miembro, info.file_size)))
+            else:
+                with tarfile.open(fileobj=fuente, mode="r:*") as archivo:
+                    for info in archivo:
+                        if info.isfile():
+                            miembro = archivo.extractfile(info)
+                            imagenes.append((info.name, self.leer(info.name, miembro, info.size)))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error, OSError) as e:
+            raise ArchivoRechazado(f"Archivo {tipo} corrupto: {e}", status_code=400)
+        return imagenes
+
+
+class PoolBuffers:
+    """Buffers reutilizables de tamaño fijo para las subidas en curso"""
+
+    def __init__(self, tamano_max, max_buffers):
+        # Memoria máxima de subidas en vuelo: tamano_max * max_buffers
+        self.tamano_max = tamano_max
+        self.max_buffers = max_buffers
+        self._libres = []
+        self._creados = 0
+        self._lock = threading.Lock()
+        self.en_uso = 0
+        self.bytes_en_uso = 0
+        self.pico_bytes_en_uso = 0
+        self.rechazadas_por_tamano = 0
+
+    def _tomar(self):
+        with self._lock:
+            if self._libres:
+                buffer = self._libres.pop()
+            elif self._creados < self.max_buffers:
+                # Los buffers se crean bajo demanda y se reutilizan después
+                buffer = bytearray(self.tamano_max)
+                self._creados += 1
+            else:
+                raise SinBuffersLibres()
+            self.en_uso += 1
+        return buffer
+
+    def _devolver(self, buffer):
+        with self._lock:
+            self._libres.append(buffer)
+            self.en_uso -= 1
+
+    @contextmanager
+    def prestar(self):
+        buffer = self._tomar()
+        try:
+            yield buffer
+        finally:
+            self._devolver(buffer)
+
+    async def _esperar_buffer(self, espera):
+        """Toma un buffer, esperando hasta `espera` segundos a que se libere alguno"""
+        limite = time.monotonic() + espera
+        while True:
+            try:
+                return self._tomar()
+            except SinBuffersLibres:
+                if time.monotonic() >= limite:
+                    raise
+            await asyncio.sleep(0.002)
+
+    @asynccontextmanager
+    async def recibir(self, file, espera=0.0):
+        """Presta un buffer, lee la subida en él y entrega un memoryview con el contenido
+
+        El buffer vuelve al pool al salir del bloque: quien lo usa debe terminar con los
+        bytes (hash, decodificación) dentro y no esperar a la inferencia con él prestado.
+        """
+        buffer = await self._esperar_buffer(espera)
+        try:
+            vista = await leer_subida(file, buffer, self)
+            try:
+                yield vista
+            finally:
+                self.registrar_uso(-len(vista))
+        finally:
+            self._devolver(buffer)
+
+    def registrar_uso(self, delta):
+        with self._lock:
+            self.bytes_en_uso += delta
+            self.pico_bytes_en_uso = max(self.pico_bytes_en_uso, self.bytes_en_uso)
+
+    def estadisticas(self):
+        return {
+            "tamano_max_subida": self.tamano_max,
+            "buffers_creados": self._creados,
+            "buffers_max": self.max_buffers,
+            "buffers_en_uso": self.en_uso,
+            "bytes_en_uso": self.bytes_en_uso,
+            "pico_bytes_en_uso": self.pico_bytes_en_uso,
+            "memoria_reservada": self._creados * self.tamano_max,
+            "rechazadas_por_tamano": self.rechazadas_por_tamano,
+        }
+
+
+async def leer_subida(file, buffer, pool_buffers):
+    """Lee la subida por trozos dentro de `buffer` y devuelve un memoryview sin copiar
+
+    Lanza SubidaDemasiadoGrande en cuanto se supera el tamaño máximo, sin leer el resto.
+    """
+    vista = memoryview(buffer)
+    leidos = 0
+    try:
+        while True:
+            trozo = await file.read(TAMANO_TROZO)
+            if not trozo:
+                break
+            if leidos + len(trozo) > pool_buffers.tamano_max:
+                pool_buffers.rechazadas_por_tamano += 1
+                raise SubidaDemasiadoGrande()
+            vista[leidos:leidos + len(trozo)] = trozo
+            pool_buffers.registrar_uso(len(trozo))
+            leidos += len(trozo)
+    except BaseException:
+        pool_buffers.registrar_uso(-leidos)
+        raise
+    return vista[:leidos]
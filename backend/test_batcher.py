@@ -0,0 +1,84 @@
+import asyncio
+import numpy as np
+import pytest
+from batcher import BatcherDetenido, MicroBatcher
+
+
+def imagen(valor):
+    return np.full((4, 4, 3), valor, dtype=np.float32)
+
+
+async def sumar(lote):
+    await asyncio.sleep(0)
+    return lote.reshape(len(lote), -1).sum(axis=1, keepdims=True)
+
+
+def test_agrupa_peticiones_concurrentes():
+    tamanos = []
+
+    async def main():
+        batcher = MicroBatcher(sumar, max_batch_size=8, max_wait_ms=20,
+                               observador=lambda n, segundos: tamanos.append(n))
+        batcher.iniciar()
+        try:
+            return await asyncio.gather(*[batcher.predecir(imagen(i)) for i in range(5)])
+        finally:
+            await batcher.detener()
+
+    resultados = asyncio.run(main())
+    assert [float(r[0]) for r in resultados] == [i * 48.0 for i in range(5)]
+    assert tamanos == [5]
+
+
+def test_detener_termina_el_lote_en_curso_y_falla_los_que_esperaban():
+    async def main():
+        empezado = asyncio.Event()
+        seguir = asyncio.Event()
+
+        async def lento(lote):
+            empezado.set()
+            await seguir.wait()
+            return await sumar(lote)
+
+        batcher = MicroBatcher(lento, max_batch_size=1, max_wait_ms=0)
+        batcher.iniciar()
+        en_curso = asyncio.create_task(batcher.predecir(imagen(1)))
+        await empezado.wait()
+        # Con el único lote en vuelo ocupado, estas se quedan en la cola
+        en_cola = [asyncio.create_task(batcher.predecir(imagen(2))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        deteniendo = asyncio.create_task(batcher.detener())
+        await asyncio.sleep(0.01)
+        seguir.set()
+        await asyncio.wait_for(deteniendo, 1)
+
+        assert float((await en_curso)[0]) == 48.0
+        for tarea in en_cola:
+            with pytest.raises(BatcherDetenido):
+                await asyncio.wait_for(tarea, 1)
+        with pytest.raises(BatcherDetenido):
+            await batcher.predecir(imagen(3))
+
+    asyncio.run(main())
+
+
+def test_detener_falla_el_lote_a_medio_recolectar():
+    async def main():
+        batcher = MicroBatcher(sumar, max_batch_size=8, max_wait_ms=10_000)
+        batcher.iniciar()
+        # El bucle ya la sacó de la cola y espera a que se llene el lote
+        tarea = asyncio.create_task(batcher.predecir(imagen(1)))
+        await asyncio.sleep(0.01)
+        assert batcher.en_cola == 0
+
+        await asyncio.wait_for(batcher.detener(), 1)
+        with pytest.raises(BatcherDetenido):
+            await asyncio.wait_for(tarea, 1)
+
+    asyncio.run(main())
+
+
+def test_predecir_sin_iniciar():
+    with pytest.raises(BatcherDetenido):
+        asyncio.run(MicroBatcher(sumar).predecir(imagen(0)))
@@ -0,0 +1,67 @@
+import pytest
+from buscador_alimentos import BuscadorAlimentos, normalizar, plurales
+
+
+@pytest.fixture(scope="module")
+def buscador():
+    return BuscadorAlimentos()
+
+
+def test_normalizar_quita_tildes_y_signos():
+    assert normalizar("¿Cuántas calorías tiene un LIMÓN?") == "cuantas calorias tiene un limon"
+
+
+@pytest.mark.parametrize("palabra, esperados", [
+    ("lemon", {"lemones", "lemons"}),
+    ("tomato", {"tomatos", "tomatoes"}),
+    ("cherry", {"cherries"}),
+    ("maiz", {"maices"}),
+    ("pera", {"peras"}),
+])
+def test_plurales(palabra, esperados):
+    assert set(plurales(palabra)) == esperados
+
+
+@pytest.mark.parametrize("texto, clase", [
+    ("lemons", "Lemon 1"),
+    ("onions", "Onion 2"),
+    ("pears", "Pear 1"),
+    ("carrots", "Carrot 1"),
+    ("peppers", "Pepper Green 1"),
+    ("green peppers", "Pepper Green 1"),
+    ("eggplants", "Eggplant 1"),
+    ("watermelons", "Watermelon 1"),
+    ("tomatoes", "Tomato 1"),
+    ("cherries", "Cherry 1"),
+    ("strawberries", "Strawberry 1"),
+])
+def test_plurales_en_ingles(buscador, texto, clase):
+    assert buscador.buscar(f"How many calories in {texto}?") == [clase]
+
+
+@pytest.mark.parametrize("texto, clase", [
+    ("limones", "Lemon 1"),
+    ("cebollas", "Onion 2"),
+    ("pimientos verdes", "Pepper Green 1"),
+    ("maíces", "Corn 1"),
+    ("papas rojas", "Potato Red 1"),
+    ("melocotones", "Peach 1"),
+])
+def test_plurales_en_espanol(buscador, texto, clase):
+    assert buscador.buscar(f"¿Qué vitaminas tienen los {texto}?") == [clase]
+
+
+def test_varias_clases_en_orden_sin_repetir(buscador):
+    texto = "Manzana, banana y otra manzana"
+    assert buscador.buscar(texto) == ["Apple 10", "Banana 1"]
+
+
+def test_solo_palabras_completas(buscador):
+    assert buscador.buscar("Tengo esperanza") == []
+    assert buscador.buscar("pearson") == []
+
+
+def test_resolver(buscador):
+    assert buscador.resolver("Apple 10") == "Apple 10"
+    assert buscador.resolver("Grape Blue") == "Grape Blue 1"
+    assert buscador.resolver("Kiwi") is None
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+import cache_predicciones
+from cache_predicciones import CachePredicciones
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache_predicciones.time, "time", reloj)
+    return reloj
+
+
+def consultar(cache, clave):
+    return asyncio.run(cache.consultar(clave))
+
+
+def test_clave_depende_de_la_version():
+    assert CachePredicciones.clave(b"imagen", "v1") == CachePredicciones.clave(b"imagen", "v1")
+    assert CachePredicciones.clave(b"imagen", "v1") != CachePredicciones.clave(b"imagen", "v2")
+    assert CachePredicciones.clave(b"imagen", "v1") != CachePredicciones.clave(b"otra", "v1")
+
+
+def test_lru_expulsa_la_menos_usada():
+    cache = CachePredicciones(max_entradas=2)
+    cache.guardar("a", {"clase": "A"})
+    cache.guardar("b", {"clase": "B"})
+    # Consultar "a" la pasa al final: la siguiente inserción expulsa "b"
+    assert consultar(cache, "a") == {"clase": "A"}
+    cache.guardar("c", {"clase": "C"})
+
+    assert consultar(cache, "b") is None
+    assert consultar(cache, "a") == {"clase": "A"}
+    assert consultar(cache, "c") == {"clase": "C"}
+    assert cache.estadisticas()["entradas"] == 2
+
+
+def test_ttl(reloj):
+    cache = CachePredicciones(ttl=60)
+    cache.guardar("a", {"clase": "A"})
+
+    reloj.ahora += 59
+    assert consultar(cache, "a") == {"clase": "A"}
+    reloj.ahora += 2
+    assert consultar(cache, "a") is None
+    # La entrada caducada se borra al encontrarla
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_estadisticas_de_aciertos():
+    cache = CachePredicciones()
+    cache.guardar("a", {"clase": "A"})
+    consultar(cache, "a")
+    consultar(cache, "a")
+    consultar(cache, "b")
+
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["hits"], estadisticas["misses"]) == (2, 1)
+    assert estadisticas["hit_rate"] == round(2 / 3, 4)
+    assert not estadisticas["persistente"]
+
+
+def test_sqlite_sobrevive_a_un_reinicio(tmp_path):
+    ruta = str(tmp_path / "cache.db")
+    cache = CachePredicciones(ruta_sqlite=ruta, intervalo_escritura=0)
+    cache.guardar("a", {"clase": "A", "probabilidad": 0.9})
+    cache.cerrar()
+
+    reabierta = CachePredicciones(ruta_sqlite=ruta)
+    try:
+        assert consultar(reabierta, "a") == {"clase": "A", "probabilidad": 0.9}
+        # El acierto en disco sube la entrada a memoria
+        assert reabierta.estadisticas()["entradas"] == 1
+    finally:
+        reabierta.cerrar()
+
+
+def test_sqlite_agrupa_escrituras_en_el_hilo(tmp_path):
+    cache = CachePredicciones(ruta_sqlite=str(tmp_path / "cache.db"), intervalo_escritura=0.05)
+    try:
+        for i in range(10):
+            cache.guardar(str(i), {"clase": str(i)})
+        limite = time.monotonic() + 5
+        while cache.estadisticas()["pendientes_disco"] and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert cache.estadisticas()["pendientes_disco"] == 0
+        assert cache._db.execute("SELECT COUNT(*) FROM predicciones").fetchone()[0] == 10
+    finally:
+        cache.cerrar()
+
+
+def test_sqlite_no_devuelve_filas_caducadas(tmp_path, reloj):
+    ruta = str(tmp_path / "cache.db")
+    cache = CachePredicciones(ttl=60, ruta_sqlite=ruta, intervalo_escritura=0)
+    cache.guardar("a", {"clase": "A"})
+    cache.cerrar()
+
+    reloj.ahora += 61
+    reabierta = CachePredicciones(ttl=60, ruta_sqlite=ruta)
+    try:
+        assert consultar(reabierta, "a") is None
+    finally:
+        reabierta.cerrar()
@@ -0,0 +1,39 @@
+import os
+from types import SimpleNamespace
+import pytest
+import registro_modelos
+from registro_modelos import RegistroModelos
+
+
+@pytest.fixture
+def artefactos(tmp_path, monkeypatch):
+    formas = {"completo.h5": (224, 224), "rapido.tflite": (224, 224), "alumno_128.tflite": (128, 128)}
+    for nombre in formas:
+        (tmp_path / nombre).write_bytes(nombre.encode())
+    (tmp_path / "classes.txt").write_text("Apple 10\nBanana 1\nKiwi 1\n", encoding="utf-8")
+    # Los artefactos son falsos: solo se carga su forma
+    monkeypatch.setattr(registro_modelos, "cargar_runtime",
+                        lambda ruta, runtime=None: SimpleNamespace(forma_entrada=formas[os.path.basename(ruta)],
+                                                                    num_salidas=3))
+    return tmp_path
+
+
+def test_publicar_cascada(artefactos):
+    registro = RegistroModelos(str(artefactos / "modelos"))
+    os.makedirs(registro.directorio)
+    version = registro.publicar(str(artefactos / "completo.h5"), str(artefactos / "classes.txt"),
+                                rapido=str(artefactos / "rapido.tflite"))
+
+    assert os.path.basename(version.cascada[0]) == "rapido.tflite"
+    assert version.verificar() == ["Apple 10", "Banana 1", "Kiwi 1"]
+
+
+def test_publicar_rechaza_cascada_con_otra_resolucion(artefactos):
+    registro = RegistroModelos(str(artefactos / "modelos"))
+    os.makedirs(registro.directorio)
+    with pytest.raises(ValueError, match="Cascada incompatible"):
+        registro.publicar(str(artefactos / "completo.h5"), str(artefactos / "classes.txt"),
+                          rapido=str(artefactos / "alumno_128.tflite"))
+    # No queda ninguna versión a medias
+    assert registro.versiones() == []
+    assert os.listdir(registro.directorio) == []
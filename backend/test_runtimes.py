@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import runtimes
+from runtimes import RuntimeCascada, comprobar_cascada
+
+
+class RuntimeFijo:
+    """Runtime falso que devuelve siempre la misma probabilidad máxima"""
+
+    def __init__(self, forma_entrada=(224, 224), num_salidas=3, confianza=0.9):
+        self.forma_entrada = forma_entrada
+        self.num_salidas = num_salidas
+        self.confianza = confianza
+        self.lotes = []
+
+    def predict_on_batch(self, lote):
+        self.lotes.append(len(lote))
+        salida = np.full((len(lote), self.num_salidas), (1 - self.confianza) / (self.num_salidas - 1))
+        salida[:, 0] = self.confianza
+        return salida
+
+
+def test_cascada_compatible():
+    comprobar_cascada(RuntimeFijo(), RuntimeFijo())
+    # Una dimensión dinámica (ONNX sin tamaño fijo) no se puede comparar
+    comprobar_cascada(RuntimeFijo((None, None)), RuntimeFijo((128, 128)))
+    comprobar_cascada(RuntimeFijo(num_salidas=None), RuntimeFijo())
+
+
+def test_cascada_rechaza_otra_resolucion():
+    with pytest.raises(ValueError, match="imágenes"):
+        RuntimeCascada(RuntimeFijo((128, 128)), RuntimeFijo((224, 224)), 0.8)
+
+
+def test_cascada_rechaza_otro_numero_de_clases():
+    with pytest.raises(ValueError, match="salidas"):
+        RuntimeCascada(RuntimeFijo(num_salidas=5), RuntimeFijo(num_salidas=3), 0.8)
+
+
+def test_cargar_modelo_rechaza_una_cascada_incompatible(monkeypatch):
+    modelos = {"completo.h5": RuntimeFijo((224, 224)), "rapido.tflite": RuntimeFijo((128, 128))}
+    monkeypatch.setattr(runtimes, "cargar_calibrado", lambda ruta, runtime=None, num_threads=None: modelos[ruta])
+    with pytest.raises(ValueError, match="Cascada incompatible"):
+        runtimes.cargar_modelo("completo.h5", cascada=("rapido.tflite", 0.8))
+
+
+def test_cascada_solo_escala_las_dudosas():
+    rapido = RuntimeFijo(confianza=0.6)
+    completo = RuntimeFijo(confianza=0.95)
+    cascada = RuntimeCascada(rapido, completo, 0.8)
+
+    probabilidades = cascada.predict_on_batch(np.zeros((4, 224, 224, 3), dtype=np.float32))
+
+    assert probabilidades[:, 0] == pytest.approx([0.95] * 4)
+    assert (cascada.imagenes, cascada.escaladas) == (4, 4)
+    cascada.umbral = 0.5
+    cascada.predict_on_batch(np.zeros((2, 224, 224, 3), dtype=np.float32))
+    assert completo.lotes == [4]
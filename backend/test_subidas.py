@@ -0,0 +1,151 @@
+import io
+import struct
+import tarfile
+import zipfile
+import pytest
+from subidas import ArchivoRechazado, ExtraccionLote, detectar_tipo_archivo
+
+KB = 1024
+
+
+def jpeg(tamano):
+    """Bytes con firma JPEG: la extracción solo mira la firma, no decodifica"""
+    return b"\xff\xd8\xff\xe0" + b"\x00" * (tamano - 4)
+
+
+def crear_zip(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, datos in miembros:
+            archivo.writestr(nombre, datos)
+    return buffer.getvalue()
+
+
+def crear_tar_gz(miembros):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archivo:
+        for nombre, datos in miembros:
+            info = tarfile.TarInfo(nombre)
+            info.size = len(datos)
+            archivo.addfile(info, io.BytesIO(datos))
+    return buffer.getvalue()
+
+
+def mentir_tamano_zip(datos, declarado):
+    """Reescribe el tamaño descomprimido de la cabecera local y del directorio central"""
+    datos = bytearray(datos)
+    local = datos.find(b"PK\x03\x04")
+    central = datos.find(b"PK\x01\x02")
+    struct.pack_into("<I", datos, local + 22, declarado)
+    struct.pack_into("<I", datos, central + 24, declarado)
+    return bytes(datos)
+
+
+class Fuente(io.BytesIO):
+    """Archivo en memoria que anota cuántos bytes se le han leído"""
+
+    leidos = 0
+
+    def read(self, n=-1):
+        datos = super().read(n)
+        self.leidos += len(datos)
+        return datos
+
+
+def extraccion(max_imagenes=10, max_bytes_imagen=64 * KB, max_bytes_total=256 * KB):
+    return ExtraccionLote(max_imagenes, max_bytes_imagen, max_bytes_total)
+
+
+def test_detectar_tipo_archivo():
+    assert detectar_tipo_archivo(crear_zip([("a.jpg", jpeg(100))])) == "zip"
+    assert detectar_tipo_archivo(crear_tar_gz([("a.jpg", jpeg(100))])) == "tar"
+    assert detectar_tipo_archivo(jpeg(600)) is None
+
+
+@pytest.mark.parametrize("crear, tipo", [(crear_zip, "zip"), (crear_tar_gz, "tar")])
+def test_extrae_las_imagenes(crear, tipo):
+    lote = extraccion()
+    datos = crear([("a.jpg", jpeg(10 * KB)), ("b/c.jpg", jpeg(20 * KB))])
+
+    imagenes = lote.extraer(io.BytesIO(datos), tipo)
+
+    assert [(nombre, len(contenido)) for nombre, contenido in imagenes] == [("a.jpg", 10 * KB),
+                                                                          ("b/c.jpg", 20 * KB)]
+    assert (lote.imagenes, lote.bytes) == (2, 30 * KB)
+
+
+def test_miembro_que_no_es_imagen_devuelve_solo_la_cabecera():
+    lote = extraccion()
+    texto = b"no soy una imagen " * 2000
+    imagenes = lote.extraer(io.BytesIO(crear_zip([("leeme.txt", texto), ("a.jpg", jpeg(KB))])), "zip")
+
+    # Solo la cabecera, que después se rechaza como imagen; no cuenta para el total
+    assert imagenes[0] == ("leeme.txt", texto[:16])
+    assert lote.bytes == KB
+
+
+def test_tamano_declarado_se_rechaza_antes_de_leer():
+    lote = extraccion()
+    fuente = Fuente(jpeg(128 * KB))
+    with pytest.raises(ArchivoRechazado) as error:
+        lote.leer("bomba.jpg", fuente, declarado=128 * KB)
+    assert error.value.status_code == 413
+    assert fuente.leidos == 0
+
+
+def test_cabecera_que_miente_sobre_el_tamano():
+    # Declara 1 KB pero trae 128 KB: se corta al pasar del límite, sin leer el resto
+    lote = extraccion()
+    fuente = Fuente(jpeg(128 * KB))
+    with pytest.raises(ArchivoRechazado) as error:
+        lote.leer("bomba.jpg", fuente, declarado=KB)
+    assert error.value.status_code == 413
+    assert fuente.leidos == 64 * KB + 1
+
+
+def test_zip_que_miente_sobre_el_tamano():
+    # 10 MB de ceros comprimidos en unos KB, declarados como 1 KB: zipfile no descomprime
+    # más de lo declarado y la CRC no coincide, así que se rechaza como corrupto
+    datos = mentir_tamano_zip(crear_zip([("bomba.jpg", jpeg(10 * 1024 * KB))]), KB)
+    lote = extraccion()
+    with pytest.raises(ArchivoRechazado) as error:
+        lote.extraer(io.BytesIO(datos), "zip")
+    assert error.value.status_code == 400
+    assert lote.bytes == 0
+
+
+def test_bomba_zip_por_tamano_declarado():
+    datos = crear_zip([("bomba.jpg", jpeg(10 * 1024 * KB))])
+    assert len(datos) < 64 * KB
+    with pytest.raises(ArchivoRechazado) as error:
+        extraccion().extraer(io.BytesIO(datos), "zip")
+    assert error.value.status_code == 413
+
+
+def test_demasiados_miembros():
+    datos = crear_tar_gz([(f"{i}.jpg", jpeg(100)) for i in range(11)])
+    with pytest.raises(ArchivoRechazado, match="Más de 10"):
+        extraccion(max_imagenes=10).extraer(io.BytesIO(datos), "tar")
+
+
+def test_limite_total_entre_miembros():
+    # Cada una cabe en el límite por imagen, pero juntas no
+    datos = crear_zip([(f"{i}.jpg", jpeg(60 * KB)) for i in range(5)])
+    with pytest.raises(ArchivoRechazado) as error:
+        extraccion().extraer(io.BytesIO(datos), "zip")
+    assert error.value.status_code == 413
+
+
+def test_limites_compartidos_entre_archivos_de_la_peticion():
+    lote = extraccion(max_imagenes=3)
+    lote.extraer(io.BytesIO(crear_zip([("a.jpg", jpeg(100)), ("b.jpg", jpeg(100))])), "zip")
+    lote.leer("c.jpg", io.BytesIO(jpeg(100)))
+    with pytest.raises(ArchivoRechazado):
+        lote.leer("d.jpg", io.BytesIO(jpeg(100)))
+
+
+def test_archivo_corrupto():
+    datos = crear_zip([("a.jpg", jpeg(KB))])
+    with pytest.raises(ArchivoRechazado) as error:
+        extraccion().extraer(io.BytesIO(datos[:len(datos) // 2]), "zip")
+    assert error.value.status_code == 400
@@ -0,0 +1,332 @@
+"""Prueba de carga reproducible del backend y del asistente Gemini
+
+Lanza los servicios con uvicorn (el asistente contra el Gemini falso `gemini_local.py`) y,
+para cada escenario y nivel de concurrencia, mantiene N clientes enviando peticiones
+durante un tiempo fijo. Mide latencia p50/p95/p99, throughput, errores y la memoria RSS
+de cada servidor a lo largo de la prueba, y lo guarda todo en un JSON que compara
+comparar.py entre commits.
+
+Escenarios:
+    predict  POST /predict del backend con imágenes sintéticas (y/o reales de --imagenes)
+    chat     POST /chat del backend (respuestas de la base nutricional)
+    gemini   POST /chat del asistente Gemini contra gemini_local.py
+
+Uso:
+    python bench_carga.py [--escenarios predict chat gemini] [--concurrencias 1 8 32]
+                          [--duracion 10] [--tamanos 640x480 4032x3024] [--imagenes fotos/]
+                          [--salida resultados_carga.json]
+"""
+import argparse
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from resultados import RAIZ, resumen_latencias, guardar
+
+try:
+    import psutil  # opcional: incluye la memoria de los procesos hijos (INFERENCE_MODE=process)
+except ImportError:
+    psutil = None
+
+SERVICIOS = {
+    "backend": {"directorio": "backend", "modulo": "main", "puerto": 8100, "salud": "/healthz"},
+    "gemini_local": {"directorio": "asistente-gemini", "modulo": "gemini_local", "puerto": 8102,
+                     "salud": "/estadisticas"},
+    "gemini": {"directorio": "asistente-gemini", "modulo": "app", "puerto": 8101, "salud": "/cache/stats"},
+}
+
+ESCENARIOS = {
+    "predict": ("backend", "/predict"),
+    "chat": ("backend", "/chat"),
+    "gemini": ("gemini", "/chat"),
+}
+
+PREGUNTAS = [
+    "¿Cuántas calorías tiene la manzana?",
+    "Información de la banana y la naranja",
+    "¿Qué vitaminas tiene el aguacate?",
+    "¿Es buena la zanahoria para la vista?",
+    "Dame ideas de snacks con fresa y mango",
+    "¿Cuánta fibra tiene la pera?",
+]
+
+
+# --- Procesos ---
+
+def lanzar(nombre, entorno=None):
+    servicio = SERVICIOS[nombre]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{servicio['modulo']}:app",
+         "--port", str(servicio["puerto"]), "--log-level", "warning"],
+        cwd=os.path.join(RAIZ, servicio["directorio"]),
+        env={**os.environ, **(entorno or {})},
+    )
+
+
+async def esperar(url, timeout=120):
+    limite = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.perf_counter() < limite:
+            try:
+                await http.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout} s")
+
+
+async def esperar_modelo(base_url, timeout):
+    """Espera a /readyz; devuelve el estado del modelo (listo, sin_modelo, error o cargando)"""
+    limite = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while True:
+            respuesta = await http.get("/readyz")
+            if respuesta.status_code == 200:
+                return "listo"
+            estado = respuesta.json().get("detail", {}).get("estado_modelo", "cargando")
+            if estado != "cargando" or time.perf_counter() >= limite:
+                return estado
+            await asyncio.sleep(0.5)
+
+
+def rss_mb(pid):
+    """Memoria residente del proceso (y sus hijos si psutil está instalado), en MB"""
+    if psutil is not None:
+        try:
+            proceso = psutil.Process(pid)
+            total = proceso.memory_info().rss
+            for hijo in proceso.children(recursive=True):
+                total += hijo.memory_info().rss
+            return round(total / 1e6, 1)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return round(int(linea.split()[1]) * 1024 / 1e6, 1)
+    except OSError:
+        return None
+
+
+class MuestreoRSS:
+    """Muestrea en segundo plano la RSS de los servidores lanzados: [[segundos, MB], ...]"""
+
+    def __init__(self, pids, intervalo=0.5):
+        self.pids = pids
+        self.intervalo = intervalo
+        self.series = {nombre: [] for nombre in pids}
+        self._tarea = None
+        self._inicio = None
+
+    async def _bucle(self):
+        while True:
+            t = round(time.perf_counter() - self._inicio, 2)
+            for nombre, pid in self.pids.items():
+                valor = rss_mb(pid)
+                if valor is not None:
+                    self.series[nombre].append([t, valor])
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        self._tarea.cancel()
+        try:
+            await self._tarea
+        except asyncio.CancelledError:
+            pass
+
+    def resumen(self, nombre):
+        serie = self.series.get(nombre) or []
+        if not serie:
+            return None
+        valores = [mb for _, mb in serie]
+        return {"inicio_mb": valores[0], "pico_mb": max(valores), "fin_mb": valores[-1], "serie": serie}
+
+
+# --- Cargas ---
+
+def jpeg_sintetico(ancho, alto, semilla, calidad=90):
+    """Foto sintética con gradiente y ruido: cada semilla da bytes distintos (sin aciertos de cache)"""
+    rng = np.random.default_rng(semilla)
+    # El ruido se genera a 1/4 de resolución y se escala: igual de caro de decodificar, mucho más rápido de crear
+    reducido = (max(1, alto // 4), max(1, ancho // 4))
+    gradiente = np.linspace(0, 255, reducido[1], dtype=np.float32)[None, :, None]
+    imagen = np.clip(gradiente + rng.normal(0, 40, reducido + (3,)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(imagen).resize((ancho, alto), Image.BILINEAR).save(buffer, format="JPEG", quality=calidad)
+    return buffer.getvalue()
+
+
+def cargar_imagenes(args):
+    """Mezcla de imágenes: `--distintas` sintéticas por tamaño más las reales de --imagenes"""
+    imagenes = []
+    for tamano in args.tamanos:
+        ancho, alto = (int(v) for v in tamano.lower().split("x"))
+        imagenes += [(f"sintetica_{tamano}_{i}.jpg", jpeg_sintetico(ancho, alto, i)) for i in range(args.distintas)]
+    if args.imagenes:
+        for nombre in sorted(os.listdir(args.imagenes)):
+            if nombre.lower().endswith((".jpg", ".jpeg", ".png")):
+                with open(os.path.join(args.imagenes, nombre), "rb") as f:
+                    imagenes.append((nombre, f.read()))
+    if not imagenes:
+        raise SystemExit("No hay imágenes para el escenario predict")
+    return imagenes
+
+
+def creador_peticiones(escenario, imagenes):
+    """Función (http, i) -> corrutina de la petición i del escenario"""
+    ruta = ESCENARIOS[escenario][1]
+    if escenario == "predict":
+        def peticion(http, i):
+            nombre, datos = imagenes[i % len(imagenes)]
+            return http.post(ruta, files={"file": (nombre, datos, "image/jpeg")})
+    elif escenario == "chat":
+        def peticion(http, i):
+            return http.post(ruta, json={"message": PREGUNTAS[i % len(PREGUNTAS)]})
+    else:
+        def peticion(http, i):
+            # Preguntas distintas: con cache activa solo se repiten las del mismo índice
+            return http.post(ruta, json={"mensaje": f"{PREGUNTAS[i % len(PREGUNTAS)]} ({i % 50})"})
+    return peticion
+
+
+async def ejecutar_nivel(base_url, peticion, concurrencia, duracion, calentamiento):
+    """Bucle cerrado: `concurrencia` clientes envían peticiones hasta agotar `duracion` segundos"""
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limites) as http:
+        for i in range(calentamiento):
+            await peticion(http, i)
+
+        latencias = []
+        codigos = {}
+        contador = iter(range(10 ** 12))
+        limite = time.perf_counter() + duracion
+
+        async def cliente():
+            while time.perf_counter() < limite:
+                i = next(contador)
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await peticion(http, i)
+                    codigo = str(respuesta.status_code)
+                except httpx.HTTPError as e:
+                    codigo = type(e).__name__
+                latencias.append(time.perf_counter() - inicio)
+                codigos[codigo] = codigos.get(codigo, 0) + 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*[cliente() for _ in range(concurrencia)])
+        transcurrido = time.perf_counter() - inicio
+
+    errores = sum(n for codigo, n in codigos.items() if not codigo.startswith("2"))
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "codigos": codigos,
+        "duracion_s": round(transcurrido, 3),
+        "rps": round(len(latencias) / transcurrido, 2),
+        **resumen_latencias(latencias),
+    }
+
+
+async def principal(args, procesos):
+    urls = {"backend": args.backend_url, "gemini": args.gemini_url}
+    for nombre, proceso in procesos.items():
+        if nombre in SERVICIOS:
+            servicio = SERVICIOS[nombre]
+            await esperar(f"http://127.0.0.1:{servicio['puerto']}{servicio['salud']}")
+
+    estado_modelo = None
+    if "predict" in args.escenarios:
+        estado_modelo = await esperar_modelo(urls["backend"], args.espera_modelo)
+        if estado_modelo != "listo":
+            print(f"Aviso: el modelo del backend está '{estado_modelo}'; /predict no ejecutará inferencia",
+                  file=sys.stderr)
+
+    imagenes = cargar_imagenes(args) if "predict" in args.escenarios else []
+    muestreo = MuestreoRSS({nombre: p.pid for nombre, p in procesos.items()}, args.intervalo_rss)
+    muestreo.iniciar()
+
+    resultados = []
+    print(f"{'escenario':<8} {'conc':>4} {'pet':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+    for escenario in args.escenarios:
+        servicio, ruta = ESCENARIOS[escenario]
+        peticion = creador_peticiones(escenario, imagenes)
+        for concurrencia in args.concurrencias:
+            desde = len(muestreo.series.get(servicio, []))
+            fila = await ejecutar_nivel(urls[servicio], peticion, concurrencia, args.duracion, args.calentamiento)
+            serie = muestreo.series.get(servicio, [])[desde:]
+            fila = {"escenario": escenario, "servicio": servicio, "ruta": ruta,
+                    "concurrencia": concurrencia, **fila,
+                    "rss_pico_mb": max((mb for _, mb in serie), default=None)}
+            resultados.append(fila)
+            print(f"{escenario:<8} {concurrencia:>4} {fila['peticiones']:>6} {fila['errores']:>4} "
+                  f"{fila['rps']:>8.1f} {fila['p50_ms']:>8.2f} {fila['p95_ms']:>8.2f} {fila['p99_ms']:>8.2f} "
+                  f"{fila['rss_pico_mb'] if fila['rss_pico_mb'] is not None else '-':>7}")
+
+    await muestreo.detener()
+    memoria = {nombre: muestreo.resumen(nombre) for nombre in procesos}
+    return resultados, memoria, estado_modelo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos por escenario y concurrencia")
+    parser.add_argument("--calentamiento", type=int, default=5, help="Peticiones previas no medidas")
+    parser.add_argument("--tamanos", nargs="*", default=["640x480", "4032x3024"],
+                        help="Tamaños de las imágenes sintéticas (ANCHOxALTO)")
+    parser.add_argument("--distintas", type=int, default=16,
+                        help="Imágenes sintéticas distintas por tamaño (se repiten: aciertos de cache)")
+    parser.add_argument("--imagenes", help="Carpeta con fotos reales que se añaden a la mezcla")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Desactivar las caches de predicciones y de respuestas de Gemini")
+    parser.add_argument("--backend-url", help="Usar un backend ya en marcha en lugar de lanzarlo")
+    parser.add_argument("--gemini-url", help="Usar un asistente Gemini ya en marcha en lugar de lanzarlo")
+    parser.add_argument("--espera-modelo", type=float, default=180, help="Segundos máximos de carga del modelo")
+    parser.add_argument("--intervalo-rss", type=float, default=0.5)
+    parser.add_argument("--salida", default="resultados_carga.json")
+    args = parser.parse_args()
+
+    necesarios = {ESCENARIOS[e][0] for e in args.escenarios}
+    procesos = {}
+    try:
+        if "backend" in necesarios and not args.backend_url:
+            procesos["backend"] = lanzar("backend", {"PREDICT_CACHE_SIZE": "0"} if args.sin_cache else None)
+            args.backend_url = f"http://127.0.0.1:{SERVICIOS['backend']['puerto']}"
+        if "gemini" in necesarios and not args.gemini_url:
+            procesos["gemini_local"] = lanzar("gemini_local")
+            procesos["gemini"] = lanzar("gemini", {
+                "GEMINI_BASE_URL": f"http://127.0.0.1:{SERVICIOS['gemini_local']['puerto']}",
+                "GEMINI_MAX_CONCURRENCIA": str(max(args.concurrencias)),
+                **({"CHAT_CACHE_SIZE": "0"} if args.sin_cache else {}),
+            })
+            args.gemini_url = f"http://127.0.0.1:{SERVICIOS['gemini']['puerto']}"
+
+        resultados, memoria, estado_modelo = asyncio.run(principal(args, procesos))
+    finally:
+        for proceso in procesos.values():
+            proceso.terminate()
+            proceso.wait()
+
+    configuracion = {k: v for k, v in vars(args).items() if k != "salida"}
+    configuracion["estado_modelo"] = estado_modelo
+    configuracion["model_path"] = os.getenv("MODEL_PATH")
+    guardar(args.salida, "carga", configuracion, {"escenarios": resultados, "memoria": memoria})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Micro-benchmarks en proceso de las funciones calientes del backend
+
+Mide, sin servidor ni red, el preprocesado de /predict (foto pequeña y de 12 MP), el endpoint
+chat_nutrition llamado directamente y crear_prompt_nutricional del asistente LLM. Guarda
+p50/p95/p99 y operaciones por segundo en un JSON comparable con comparar.py.
+
+Uso:
+    python bench_micro.py [--iteraciones 200] [--salida resultados_micro.json]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from resultados import RAIZ, resumen_latencias, guardar
+from bench_carga import jpeg_sintetico, PREGUNTAS
+
+DIRECTORIO_INICIAL = os.getcwd()
+# Los módulos del backend usan imports planos y rutas relativas a backend/
+sys.path.insert(0, os.path.join(RAIZ, "backend"))
+os.chdir(os.path.join(RAIZ, "backend"))
+
+import main  # noqa: E402
+import asistente_ia  # noqa: E402
+from preprocesamiento import preprocesar_en  # noqa: E402
+
+
+def medir(nombre, funcion, iteraciones, calentamiento=5):
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado(nombre, tiempos)
+
+
+async def medir_async(nombre, corrutina, iteraciones, calentamiento=5):
+    for _ in range(calentamiento):
+        await corrutina()
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        await corrutina()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado(nombre, tiempos)
+
+
+def resultado(nombre, tiempos):
+    fila = {"nombre": nombre, "iteraciones": len(tiempos), **resumen_latencias(tiempos),
+            "ops_s": round(len(tiempos) / sum(tiempos), 1)}
+    print(f"{nombre:<40} p50 {fila['p50_ms']:9.3f} ms  p99 {fila['p99_ms']:9.3f} ms  {fila['ops_s']:>10.1f} ops/s")
+    return fila
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=200)
+    parser.add_argument("--salida", default=os.path.join(DIRECTORIO_INICIAL, "resultados_micro.json"))
+    args = parser.parse_args()
+    n = args.iteraciones
+
+    pequena = jpeg_sintetico(640, 480, 0)
+    grande = jpeg_sintetico(4032, 3024, 0)
+    mensajes = [main.ChatMessage(message=p) for p in PREGUNTAS]
+    # Mismo camino que ServicioModelo.preprocesar, a la resolución que sirve el backend
+    tamano = (main.MODEL_IMG_SIZE, main.MODEL_IMG_SIZE)
+    destino = np.empty(tamano + (3,), dtype=np.float32)
+
+    resultados = [
+        medir("preprocesar_en 640x480", lambda: preprocesar_en(pequena, destino, tamano), n),
+        # Una foto de 12 MP tarda decenas de ms: menos iteraciones
+        medir("preprocesar_en 4032x3024", lambda: preprocesar_en(grande, destino, tamano), max(10, n // 10)),
+        medir(f"crear_prompt_nutricional x{len(PREGUNTAS)}",
+              lambda: [asistente_ia.crear_prompt_nutricional(p) for p in PREGUNTAS], n),
+        medir("crear_prompt_nutricional (alimento)",
+              lambda: asistente_ia.crear_prompt_nutricional(PREGUNTAS[0], "Apple 10"), n),
+    ]
+
+    async def chats():
+        return await medir_async(f"chat_nutrition x{len(mensajes)}",
+                                 lambda: asyncio.gather(*[main.chat_nutrition(m) for m in mensajes]), n)
+    resultados.append(asyncio.run(chats()))
+
+    guardar(args.salida, "micro", {"iteraciones": n, "preguntas_por_iteracion": len(PREGUNTAS)}, resultados)
+
+
+if __name__ == "__main__":
+    main_bench()
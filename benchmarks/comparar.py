@@ -0,0 +1,73 @@
+"""Compara dos archivos de resultados (bench_carga.py o bench_micro.py) de commits distintos
+
+Muestra, por escenario, la variación de p50/p95/p99 y del throughput, y marca como
+regresión lo que empeora más que --umbral por ciento. Sale con código 1 si hay alguna,
+para poder usarlo en CI.
+
+Uso:
+    python comparar.py base.json nuevo.json [--umbral 10]
+"""
+import argparse
+import json
+import sys
+
+# Métricas comparadas y si un valor mayor es mejor
+METRICAS = (("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("rps", True), ("ops_s", True))
+
+
+def filas(datos):
+    """{clave de la fila: fila} para resultados de carga o de micro-benchmarks"""
+    if datos["tipo"] == "carga":
+        return {f"{f['escenario']} c={f['concurrencia']}": f for f in datos["resultados"]["escenarios"]}
+    return {f["nombre"]: f for f in datos["resultados"]}
+
+
+def comparar(base, nuevo, umbral):
+    if base["tipo"] != nuevo["tipo"]:
+        raise SystemExit(f"No se pueden comparar resultados de tipo {base['tipo']} y {nuevo['tipo']}")
+    filas_base, filas_nuevo = filas(base), filas(nuevo)
+    regresiones = []
+
+    print(f"Base:  {base.get('commit')} ({base['fecha']})")
+    print(f"Nuevo: {nuevo.get('commit')} ({nuevo['fecha']})\n")
+    print(f"| {'Caso':<40} | {'Métrica':<7} | {'Base':>10} | {'Nuevo':>10} | {'Cambio':>8} |")
+    print(f"|{'-' * 42}|{'-' * 9}|{'-' * 12}|{'-' * 12}|{'-' * 10}|")
+    for clave in filas_base:
+        if clave not in filas_nuevo:
+            continue
+        for metrica, mayor_es_mejor in METRICAS:
+            antes, despues = filas_base[clave].get(metrica), filas_nuevo[clave].get(metrica)
+            if not antes or despues is None:
+                continue
+            cambio = (despues - antes) / antes * 100
+            empeora = -cambio if mayor_es_mejor else cambio
+            marca = " ⚠" if empeora > umbral else ""
+            if marca:
+                regresiones.append((clave, metrica, cambio))
+            print(f"| {clave:<40} | {metrica:<7} | {antes:>10.2f} | {despues:>10.2f} | {cambio:>+7.1f}%{marca} |")
+
+    solo = sorted(set(filas_base) ^ set(filas_nuevo))
+    if solo:
+        print(f"\nCasos presentes solo en uno de los archivos: {', '.join(solo)}")
+    if regresiones:
+        print(f"\n{len(regresiones)} regresiones de más del {umbral:g}%:")
+        for clave, metrica, cambio in regresiones:
+            print(f"  - {clave} {metrica}: {cambio:+.1f}%")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("nuevo")
+    parser.add_argument("--umbral", type=float, default=10, help="Porcentaje de empeoramiento tolerado")
+    args = parser.parse_args()
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+    sys.exit(1 if comparar(base, nuevo, args.umbral) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Formato común de los resultados de los benchmarks (JSON) y estadísticas de latencia"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def resumen_latencias(segundos):
+    """p50/p95/p99/máx/media en milisegundos"""
+    ms = sorted(s * 1000 for s in segundos)
+    if not ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "media_ms": None}
+    return {
+        "p50_ms": round(percentil(ms, 50), 3),
+        "p95_ms": round(percentil(ms, 95), 3),
+        "p99_ms": round(percentil(ms, 99), 3),
+        "max_ms": round(ms[-1], 3),
+        "media_ms": round(sum(ms) / len(ms), 3),
+    }
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True, timeout=5)
+        commit = salida.stdout.strip()
+        sucio = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+        return commit + ("-sucio" if sucio else "") if commit else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def entorno():
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def guardar(ruta, tipo, configuracion, resultados):
+    """Escribe el archivo de resultados que compara comparar.py"""
+    datos = {
+        "tipo": tipo,
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "entorno": entorno(),
+        "configuracion": configuracion,
+        "resultados": resultados,
+    }
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {ruta}", file=sys.stderr)
+    return datos
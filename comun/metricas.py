@@ -0,0 +1,223 @@
+"""Métricas en el formato de texto de Prometheus, sin dependencias externas
+
+Contadores e histogramas con etiquetas que se registran en el `registro` del proceso y se
+exponen en /metrics. Una observación es una búsqueda binaria del bucket y unos incrementos
+bajo un lock, así que pueden quedarse activadas en producción. Los valores que ya llevan
+otros objetos (cola del pool, aciertos de la cache, buffers de subida...) no se duplican:
+se leen solo cuando Prometheus hace scrape, con funciones registradas en `registro.funcion`.
+
+Con varios workers de uvicorn cada proceso tiene su propio registro; Prometheus los
+distingue por la instancia y se agregan en la consulta.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Segundos: de 0.5 ms (decodificar una miniatura) a 10 s (una llamada lenta al LLM)
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128)
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *etiquetas, valor=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + valor
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            valores = list(self._valores.items())
+        for etiquetas, valor in sorted(valores):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # etiquetas -> [cuentas por bucket (+Inf al final), suma]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, *etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *etiquetas)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(etiquetas, list(cuentas), suma) for etiquetas, (cuentas, suma) in self._series.items()]
+        for etiquetas, cuentas, suma in sorted(series):
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+                acumulado += cuenta
+                le = 'le="' + _numero(float(limite)) + '"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}")
+        return lineas
+
+
+class Funcion:
+    """Métrica cuyo valor se calcula al hacer scrape
+
+    `funcion` devuelve un número o, si hay etiquetas, un dict {tupla de etiquetas: número}.
+    Si devuelve None (p. ej. el modelo aún no está cargado) la métrica se omite.
+    """
+
+    def __init__(self, nombre, ayuda, funcion, tipo="gauge", etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.tipo = tipo
+        self.etiquetas = tuple(etiquetas)
+
+    def exponer(self):
+        valor = self.funcion()
+        if valor is None:
+            return []
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        valores = valor.items() if isinstance(valor, dict) else [((), valor)]
+        for etiquetas, v in valores:
+            if v is not None:
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(v)}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+
+    def _registrar(self, metrica):
+        # Registrar dos veces el mismo nombre devuelve la métrica existente (recargas de módulos)
+        return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def funcion(self, nombre, ayuda, funcion, tipo="gauge", etiquetas=()):
+        metrica = Funcion(nombre, ayuda, funcion, tipo, etiquetas)
+        self._metricas[nombre] = metrica
+        return metrica
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas.values():
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+class Traza:
+    """Tiempos por etapa de una petición
+
+    Cada etapa se observa en el histograma al registrarla y se acumula para la cabecera
+    Server-Timing, que el cliente pide con `X-Trace: 1`.
+    """
+
+    def __init__(self, histograma):
+        self.histograma = histograma
+        self.etapas = {}
+
+    def registrar(self, etapa, segundos):
+        self.histograma.observar(segundos, etapa)
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, time.perf_counter() - inicio)
+
+    def server_timing(self, total=None):
+        partes = [f"{etapa};dur={segundos * 1000:.2f}" for etapa, segundos in self.etapas.items()]
+        if total is not None:
+            partes.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(partes)
+
+
+registro = Registro()
+
+
+def medir_http(app, histograma_etapas=None, server_timing=False):
+    """Middleware que cuenta las peticiones y mide su duración por ruta
+
+    Con `histograma_etapas` cada petición lleva una Traza en `request.state.traza` y, si el
+    cliente envía `X-Trace: 1` (o `server_timing` es True), la respuesta incluye la cabecera
+    Server-Timing con el desglose por etapa. La duración es hasta enviar las cabeceras: en
+    las respuestas en streaming no incluye el cuerpo.
+    """
+    peticiones = registro.contador(
+        "http_peticiones_total", "Peticiones HTTP por ruta, método y código", ("ruta", "metodo", "codigo"))
+    duracion = registro.histograma(
+        "http_duracion_segundos", "Tiempo hasta las cabeceras de la respuesta", ("ruta",))
+    rutas = set()
+
+    @app.middleware("http")
+    async def medir_peticion(request, call_next):
+        inicio = time.perf_counter()
+        traza = None
+        if histograma_etapas is not None:
+            traza = request.state.traza = Traza(histograma_etapas)
+        respuesta = await call_next(request)
+        transcurrido = time.perf_counter() - inicio
+
+        if not rutas:
+            rutas.update(getattr(ruta, "path", None) for ruta in app.routes)
+        # Solo rutas conocidas como etiqueta: una URL inventada no crea series nuevas
+        ruta = request.url.path if request.url.path in rutas else "otra"
+        peticiones.inc(ruta, request.method, str(respuesta.status_code))
+        duracion.observar(transcurrido, ruta)
+
+        if traza is not None and (server_timing or request.headers.get("x-trace") == "1"):
+            respuesta.headers["Server-Timing"] = traza.server_timing(transcurrido)
+            respuesta.headers["Timing-Allow-Origin"] = "*"
+        return respuesta
+
+    return medir_peticion
@@ -0,0 +1,212 @@
+"""Base nutricional compartida por el backend y el asistente Gemini
+
+Los datos viven en un archivo (CSV, JSON o Parquet) y se cargan en columnas NumPy, una por
+nutriente, con el id de cada fila igual al índice de la clase en classes.txt. Las consultas
+(top-k, alimentos por debajo de un umbral, escalado por porción) son vectorizadas y el
+archivo se recarga solo cuando cambia.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger("uvicorn.error")
+
+RUTA_NUTRICION = os.getenv("NUTRICION_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "nutricion.csv")
+# Segundos entre comprobaciones de la fecha de modificación del archivo
+INTERVALO_RECARGA = float(os.getenv("NUTRICION_RECARGA_S", "2"))
+
+# Columnas de texto; el resto se interpretan como nutrientes numéricos por 100 g
+COLUMNAS_TEXTO = ("clase", "nombre_es", "destacado", "nivel")
+
+
+def leer_registros(ruta):
+    """Filas del archivo como lista de dicts"""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        with open(ruta, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    if extension == ".json":
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    if extension == ".parquet":
+        import pyarrow.parquet as pq  # opcional, solo para catálogos en Parquet
+        return pq.read_table(ruta).to_pylist()
+    raise ValueError(f"Formato de base nutricional no soportado: {ruta}")
+
+
+def _numero(valor):
+    """52.0 -> 52, 4.6 -> 4.6, '95%' -> '95%' (así los registros se ven como antes)"""
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return valor
+    return int(numero) if numero.is_integer() else numero
+
+
+def _a_float(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _Columnas:
+    """Instantánea inmutable de la tabla: se reemplaza entera al recargar"""
+
+    def __init__(self, registros, orden=None):
+        por_clase = {str(r["clase"]).strip(): r for r in registros}
+        clases = list(orden) if orden else list(por_clase)
+        # Alimentos del archivo que no son clases del modelo van detrás de ellas
+        clases += [c for c in por_clase if c not in set(clases)]
+
+        self.nombres = clases
+        self.indice = {nombre: i for i, nombre in enumerate(clases)}
+        self.presente = np.array([c in por_clase for c in clases], dtype=bool)
+        filas = [por_clase.get(c, {}) for c in clases]
+
+        self.nutrientes = [k for k in (registros[0] if registros else {}) if k not in COLUMNAS_TEXTO]
+        self.columnas = {
+            nutriente: np.array([_a_float(f.get(nutriente)) for f in filas], dtype=np.float64)
+            for nutriente in self.nutrientes
+        }
+        self.nombres_es = np.array([f.get("nombre_es") or c for f, c in zip(filas, clases)], dtype=object)
+        self.destacado = np.array([f.get("destacado") or "" for f in filas], dtype=object)
+        self.nivel = np.array([f.get("nivel") or "" for f in filas], dtype=object)
+
+
+class TablaNutricional:
+    """Tabla columnar de nutrientes indexada por id de clase, con recarga en caliente"""
+
+    def __init__(self, ruta=RUTA_NUTRICION, intervalo_recarga=INTERVALO_RECARGA):
+        self.ruta = ruta
+        self.intervalo_recarga = intervalo_recarga
+        self._version = 0
+        self._orden = None
+        self._mtime = None
+        self._proxima_revision = 0.0
+        self._lock = threading.Lock()
+        self._datos = _Columnas([])
+        self.recargar()
+
+    def recargar(self):
+        """Vuelve a leer el archivo; si falla se conservan los datos anteriores"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.ruta)
+                self._datos = _Columnas(leer_registros(self.ruta), self._orden)
+                self._mtime = mtime
+                self._version += 1
+            except Exception as e:
+                logger.warning(f"No se pudo cargar la base nutricional {self.ruta}: {e}")
+            self._proxima_revision = time.monotonic() + self.intervalo_recarga
+
+    def alinear(self, clases):
+        """Ordena las filas según las clases del modelo, de modo que id == índice de clase"""
+        self._orden = list(clases)
+        self.recargar()
+
+    def _vigente(self):
+        if time.monotonic() >= self._proxima_revision:
+            try:
+                cambiado = os.path.getmtime(self.ruta) != self._mtime
+            except OSError:
+                cambiado = False
+            if cambiado:
+                self.recargar()
+            else:
+                self._proxima_revision = time.monotonic() + self.intervalo_recarga
+        return self._datos
+
+    @property
+    def version(self):
+        """Aumenta cada vez que se recarga el archivo"""
+        self._vigente()
+        return self._version
+
+    # --- Acceso por alimento ---
+
+    def __len__(self):
+        return int(self._vigente().presente.sum())
+
+    def __contains__(self, nombre):
+        datos = self._vigente()
+        i = datos.indice.get(nombre)
+        return i is not None and bool(datos.presente[i])
+
+    @property
+    def nombres(self):
+        datos = self._vigente()
+        return [n for n, p in zip(datos.nombres, datos.presente) if p]
+
+    @property
+    def nutrientes(self):
+        return list(self._vigente().nutrientes)
+
+    def id(self, nombre):
+        return self._vigente().indice.get(nombre)
+
+    def _fila(self, datos, alimento):
+        i = alimento if isinstance(alimento, (int, np.integer)) else datos.indice.get(alimento)
+        if i is None or not 0 <= i < len(datos.nombres) or not datos.presente[i]:
+            return None
+        return int(i)
+
+    def registro(self, alimento):
+        """Nutrientes por 100 g de un alimento (por nombre de clase o id), o None"""
+        datos = self._vigente()
+        i = self._fila(datos, alimento)
+        if i is None:
+            return None
+        info = {n: _numero(datos.columnas[n][i]) for n in datos.nutrientes if not np.isnan(datos.columnas[n][i])}
+        if datos.destacado[i]:
+            info[datos.destacado[i]] = _numero(datos.nivel[i])
+        return info
+
+    def nombre_es(self, alimento):
+        datos = self._vigente()
+        i = self._fila(datos, alimento)
+        return datos.nombres_es[i] if i is not None else None
+
+    def como_dict(self):
+        return {nombre: self.registro(nombre) for nombre in self.nombres}
+
+    # --- Consultas vectorizadas ---
+
+    def top_k(self, nutriente, k=5, ascendente=False):
+        """Los k alimentos con más (o menos) de un nutriente, ordenados"""
+        datos = self._vigente()
+        valores = datos.columnas[nutriente]
+        ids = np.flatnonzero(~np.isnan(valores))
+        clave = valores[ids] if ascendente else -valores[ids]
+        if k < len(ids):
+            posiciones = np.argpartition(clave, k - 1)[:k] if k > 0 else np.array([], dtype=int)
+        else:
+            posiciones = np.arange(len(ids))
+        posiciones = posiciones[np.argsort(clave[posiciones], kind="stable")]
+        return [datos.nombres[i] for i in ids[posiciones]]
+
+    def bajo(self, nutriente, maximo):
+        """Alimentos con el nutriente <= maximo, de menor a mayor"""
+        datos = self._vigente()
+        valores = datos.columnas[nutriente]
+        ids = np.flatnonzero(valores <= maximo)
+        return [datos.nombres[i] for i in ids[np.argsort(valores[ids], kind="stable")]]
+
+    def escalar(self, alimento, gramos):
+        """Nutrientes numéricos para una porción de `gramos` gramos"""
+        datos = self._vigente()
+        i = self._fila(datos, alimento)
+        if i is None:
+            return None
+        factor = gramos / 100.0
+        return {
+            n: round(float(datos.columnas[n][i] * factor), 2)
+            for n in datos.nutrientes if not np.isnan(datos.columnas[n][i])
+        }
+
+
+tabla = TablaNutricional()
@@ -0,0 +1,58 @@
+from metricas import Registro
+
+
+def lineas_de(metrica, sufijo):
+    return [l for l in metrica.exponer() if l.startswith(metrica.nombre + sufijo)]
+
+
+def test_histograma_buckets_acumulados():
+    registro = Registro()
+    histograma = registro.histograma("latencia", "Latencia", buckets=(0.1, 1.0, 0.5))
+
+    for valor in (0.05, 0.1, 0.3, 0.7, 2.0):
+        histograma.observar(valor)
+
+    # Los límites se ordenan, cada bucket incluye su límite (le = menor o igual) y es acumulado
+    assert lineas_de(histograma, "_bucket") == [
+        'latencia_bucket{le="0.1"} 2',
+        'latencia_bucket{le="0.5"} 3',
+        'latencia_bucket{le="1.0"} 4',
+        'latencia_bucket{le="+Inf"} 5',
+    ]
+    assert lineas_de(histograma, "_count") == ["latencia_count 5"]
+    assert lineas_de(histograma, "_sum") == [f"latencia_sum {0.05 + 0.1 + 0.3 + 0.7 + 2.0!r}"]
+
+
+def test_histograma_una_serie_por_etiqueta():
+    registro = Registro()
+    histograma = registro.histograma("etapas", "Etapas", ("etapa",), buckets=(1,))
+    histograma.observar(0.5, "decodificacion")
+    histograma.observar(3, "inferencia")
+
+    assert lineas_de(histograma, "_count") == [
+        'etapas_count{etapa="decodificacion"} 1',
+        'etapas_count{etapa="inferencia"} 1',
+    ]
+    assert 'etapas_bucket{etapa="inferencia",le="1.0"} 0' in histograma.exponer()
+
+
+def test_contador_escapa_etiquetas():
+    registro = Registro()
+    contador = registro.contador("errores_total", "Errores", ("detalle",))
+    contador.inc('dice "no"')
+    contador.inc('dice "no"', valor=2)
+    assert lineas_de(contador, "{") == ['errores_total{detalle="dice \\"no\\""} 3']
+
+
+def test_funcion_none_se_omite():
+    registro = Registro()
+    valor = [None]
+    registro.funcion("entradas", "Entradas", lambda: valor[0])
+    assert registro.exponer() == "\n"
+    valor[0] = 7
+    assert "entradas 7" in registro.exponer()
+
+
+def test_registrar_dos_veces_devuelve_la_misma_metrica():
+    registro = Registro()
+    assert registro.contador("peticiones_total", "a") is registro.contador("peticiones_total", "b")
@@ -0,0 +1,93 @@
+import os
+import pytest
+from nutricion import TablaNutricional
+
+CABECERA = "clase,nombre_es,calorias,proteina,destacado,nivel\n"
+
+
+def escribir(ruta, filas, mtime=None):
+    ruta.write_text(CABECERA + "".join(filas), encoding="utf-8")
+    if mtime is not None:
+        # La recarga se decide por la fecha de modificación: se fija para no depender del reloj
+        os.utime(ruta, (mtime, mtime))
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    ruta = tmp_path / "nutricion.csv"
+    escribir(ruta, [
+        "Apple 10,Manzana,52,0.3,vitamina_c,4.6\n",
+        "Banana 1,Plátano,89,1.1,potasio,358\n",
+        "Kiwi 1,Kiwi,61,,,\n",
+    ], mtime=1000)
+    return ruta
+
+
+def test_registro_por_nombre(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=60)
+    assert tabla.registro("Apple 10") == {"calorias": 52, "proteina": 0.3, "vitamina_c": 4.6}
+    # Las celdas vacías no aparecen en el registro
+    assert tabla.registro("Kiwi 1") == {"calorias": 61}
+    assert tabla.nombre_es("Banana 1") == "Plátano"
+    assert tabla.registro("Mango 1") is None
+
+
+def test_alinear_con_las_clases_del_modelo(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=60)
+    tabla.alinear(["Banana 1", "Mango 1", "Apple 10"])
+
+    assert tabla.id("Banana 1") == 0
+    assert tabla.id("Apple 10") == 2
+    assert tabla.registro(0) == tabla.registro("Banana 1")
+    assert tabla.registro(2)["calorias"] == 52
+    # Una clase del modelo sin datos ocupa su id pero no cuenta como alimento
+    assert tabla.registro(1) is None
+    assert "Mango 1" not in tabla
+    # Los alimentos del archivo que no son clases van detrás de ellas
+    assert tabla.id("Kiwi 1") == 3
+    assert tabla.nombres == ["Banana 1", "Apple 10", "Kiwi 1"]
+    assert len(tabla) == 3
+
+
+def test_recarga_en_caliente_conserva_la_alineacion(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=0)
+    tabla.alinear(["Banana 1", "Apple 10"])
+    version = tabla.version
+
+    escribir(ruta, [
+        "Apple 10,Manzana,60,0.3,vitamina_c,4.6\n",
+        "Banana 1,Plátano,89,1.1,potasio,358\n",
+    ], mtime=2000)
+
+    assert tabla.registro(1)["calorias"] == 60
+    assert tabla.id("Banana 1") == 0
+    assert tabla.version == version + 1
+    assert "Kiwi 1" not in tabla
+
+
+def test_sin_cambios_no_recarga(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=0)
+    version = tabla.version
+    tabla.registro("Apple 10")
+    assert tabla.version == version
+
+
+def test_recarga_fallida_conserva_los_datos(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=0)
+    version = tabla.version
+    ruta.unlink()
+
+    tabla.recargar()
+
+    assert tabla.registro("Apple 10")["calorias"] == 52
+    assert tabla.version == version
+
+
+def test_consultas_vectorizadas(ruta):
+    tabla = TablaNutricional(str(ruta), intervalo_recarga=60)
+    assert tabla.top_k("calorias", 2) == ["Banana 1", "Kiwi 1"]
+    assert tabla.top_k("calorias", 1, ascendente=True) == ["Apple 10"]
+    # Los valores que faltan no entran en el ranking
+    assert tabla.top_k("proteina", 5) == ["Banana 1", "Apple 10"]
+    assert tabla.bajo("calorias", 61) == ["Apple 10", "Kiwi 1"]
+    assert tabla.escalar("Banana 1", 150) == {"calorias": 133.5, "proteina": 1.65}
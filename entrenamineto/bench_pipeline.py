@@ -0,0 +1,66 @@
+"""Compara imágenes/segundo de ImageDataGenerator y tf.data sobre un dataset con formato Fruits-360
+
+Solo mide la entrada de datos (sin modelo): la primera época de tf.data incluye llenar la
+cache; las siguientes leen las imágenes ya decodificadas.
+
+Uso:
+    python bench_pipeline.py --dataset dataset [--epocas 3] [--lotes 100] [--cache ram]
+                             [--shards-dir dataset_shards]
+"""
+import argparse
+import time
+
+from clasificador_alimentos import (create_data_generators_20_clases, create_data_pipeline_tfdata,
+                                    create_data_pipeline_shards)
+
+
+def medir_generador(generador, lotes):
+    inicio = time.perf_counter()
+    imagenes = 0
+    for _ in range(lotes):
+        x, _ = next(generador)
+        imagenes += len(x)
+    return imagenes / (time.perf_counter() - inicio)
+
+
+def medir_dataset(dataset, lotes):
+    inicio = time.perf_counter()
+    imagenes = 0
+    for x, _ in dataset.take(lotes):
+        imagenes += int(x.shape[0])
+    return imagenes / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default='dataset')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epocas', type=int, default=3)
+    parser.add_argument('--lotes', type=int, default=0,
+                        help='Lotes por época (0 = la época completa; con menos la cache de tf.data no se completa)')
+    parser.add_argument('--cache', default='ram', help="'ram', ruta de archivo local o 'no'")
+    parser.add_argument('--shards-dir', help='Medir también los shards de preparar_dataset.py')
+    args = parser.parse_args()
+    cache = None if args.cache == 'no' else args.cache
+
+    train_gen, _, _ = create_data_generators_20_clases(args.dataset, batch_size=args.batch_size)
+    train_ds, _, _, info = create_data_pipeline_tfdata(args.dataset, batch_size=args.batch_size, cache=cache)
+    lotes = args.lotes or -(-info['train_samples'] // args.batch_size)
+
+    shards_ds = None
+    if args.shards_dir:
+        shards_ds = create_data_pipeline_shards(args.shards_dir, batch_size=args.batch_size)[0]
+
+    print(f"\n{lotes} lotes de {args.batch_size} imágenes por época\n")
+    columnas = ["ImageDataGenerator (img/s)", "tf.data (img/s)"] + (["shards (img/s)"] if shards_ds else [])
+    print("| Época | " + " | ".join(columnas) + " |")
+    print("|-------|" + "|".join("-" * (len(c) + 2) for c in columnas) + "|")
+    for epoca in range(1, args.epocas + 1):
+        resultados = [medir_generador(train_gen, lotes), medir_dataset(train_ds, lotes)]
+        if shards_ds is not None:
+            resultados.append(medir_dataset(shards_ds, lotes))
+        print(f"| {epoca} | " + " | ".join(f"{r:.1f} ({r / resultados[0]:.1f}x)" for r in resultados) + " |")
+
+
+if __name__ == '__main__':
+    main()
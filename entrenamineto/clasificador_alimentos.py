@@ -6,36 +6,21 @@ from tensorflow.keras.preprocessing.image import ImageDataGenerator
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import re
+import sys
+import json
+import time
+import argparse
+import functools
+from preparar_dataset import seleccionar_clases, listar_imagenes, dividir_validacion, leer_manifest, cargar_split
+
+AUTOTUNE = tf.data.AUTOTUNE
 
 def create_data_generators_20_clases(dataset_path, batch_size=32, img_size=(224, 224)):
     train_path = os.path.join(dataset_path, 'Training')
     test_path = os.path.join(dataset_path, 'Test')
     
-    # 20 clases principales que queremos reconocer
-    clases_principales = [
-        'Apple', 'Banana', 'Orange', 'Tomato', 'Carrot', 
-        'Cucumber', 'Onion', 'Peach', 'Pear', 'Cherry',
-        'Grape', 'Pepper', 'Potato', 'Avocado', 'Mango',
-        'Strawberry', 'Lemon', 'Watermelon', 'Corn', 'Eggplant'
-    ]
-    
-    # Encontrar carpetas que coincidan con nuestras clases principales
-    all_classes = os.listdir(train_path)
-    selected_classes = []
-    
-    for clase_principal in clases_principales:
-        for folder_name in all_classes:
-            if clase_principal.lower() in folder_name.lower():
-                if folder_name not in selected_classes:
-                    selected_classes.append(folder_name)
-                    break
-    
-    # Limitar a 20 clases máximo
-    selected_classes = selected_classes[:20]
-    
-    print(f"Clases seleccionadas ({len(selected_classes)}):")
-    for i, clase in enumerate(selected_classes):
-        print(f"  {i+1}. {clase}")
+    selected_classes = seleccionar_clases(train_path)
     
     # Data augmentation para training (SIN cargar todo en memoria)
     train_datagen = ImageDataGenerator(
@@ -80,33 +65,370 @@ def create_data_generators_20_clases(dataset_path, batch_size=32, img_size=(224,
     
     return train_generator, val_generator, test_generator
 
-def create_model(num_classes):
-    base_model = MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights='imagenet')
+def crear_capas_aumento():
+    # Equivalente vectorizado (por lote) del augmentation de ImageDataGenerator
+    return keras.Sequential([
+        layers.RandomRotation(20 / 360, fill_mode='nearest'),
+        layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+        layers.RandomFlip('horizontal'),
+        layers.RandomZoom(0.2, fill_mode='nearest'),
+    ], name='aumento')
+
+def crear_dataset(rutas, etiquetas, num_classes, batch_size, img_size, cache=None,
+                  entrenamiento=False, aumento=None, seed=42):
+    """tf.data: decodificación en paralelo, cache de imágenes ya redimensionadas (uint8) y prefetch
+
+    cache=None no cachea, cache='ram' cachea en memoria y cualquier otro valor es la ruta
+    de un archivo de cache en disco local.
+    """
+    if entrenamiento:
+        # Mezcla inicial de la lista de archivos (que viene ordenada por clase)
+        orden = np.random.default_rng(seed).permutation(len(rutas))
+        rutas = [rutas[i] for i in orden]
+        etiquetas = [etiquetas[i] for i in orden]
+    
+    def cargar(ruta, etiqueta):
+        imagen = tf.io.decode_image(tf.io.read_file(ruta), channels=3, expand_animations=False)
+        imagen = tf.image.resize(imagen, img_size)
+        return tf.cast(tf.round(imagen), tf.uint8), etiqueta
+    
+    ds = tf.data.Dataset.from_tensor_slices((rutas, etiquetas))
+    ds = ds.map(cargar, num_parallel_calls=AUTOTUNE, deterministic=not entrenamiento)
+    if cache == 'ram':
+        ds = ds.cache()
+    elif cache:
+        ds = ds.cache(cache)
+    
+    if entrenamiento:
+        ds = ds.shuffle(min(len(rutas), 2000), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size, num_parallel_calls=AUTOTUNE)
+    return preparar_lotes(ds, num_classes, aumento)
+
+def preparar_lotes(ds, num_classes, aumento=None):
+    """Lotes uint8 -> float 0-1 (con augmentation opcional) y etiquetas one-hot, con prefetch"""
+    def preparar(imagenes, etiquetas_lote):
+        imagenes = tf.cast(imagenes, tf.float32)
+        if aumento is not None:
+            imagenes = aumento(imagenes, training=True)
+        return imagenes / 255.0, tf.one_hot(tf.cast(etiquetas_lote, tf.int32), num_classes)
+    
+    return ds.map(preparar, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+def crear_dataset_shards(directorio, split, num_classes, batch_size, entrenamiento=False, aumento=None):
+    """Lotes leídos de los shards de preparar_dataset.py (memmap), sin decodificar JPEG"""
+    xs, ys = cargar_split(directorio, split)
+    forma = tuple(leer_manifest(directorio)['img_size']) + (3,)
+    
+    def lotes():
+        # En entrenamiento se mezclan el orden de los shards y las imágenes dentro de cada uno
+        orden = np.random.permutation(len(xs)) if entrenamiento else range(len(xs))
+        for i in orden:
+            x, y = xs[i], ys[i]
+            indices = np.random.permutation(len(x)) if entrenamiento else np.arange(len(x))
+            for inicio in range(0, len(indices), batch_size):
+                # Índices ordenados: lecturas secuenciales dentro del memmap
+                lote = np.sort(indices[inicio:inicio + batch_size])
+                yield x[lote], y[lote]
+    
+    ds = tf.data.Dataset.from_generator(lotes, output_signature=(
+        tf.TensorSpec((None,) + forma, tf.uint8),
+        tf.TensorSpec((None,), tf.int16),
+    ))
+    return preparar_lotes(ds, num_classes, aumento)
+
+def create_data_pipeline_shards(directorio, batch_size=32):
+    """Como create_data_pipeline_tfdata, pero leyendo los shards ya preprocesados"""
+    manifest = leer_manifest(directorio)
+    class_names = manifest['class_names']
+    num_classes = len(class_names)
+    splits = manifest['splits']
+    
+    train_ds = crear_dataset_shards(directorio, 'train', num_classes, batch_size,
+                                    entrenamiento=True, aumento=crear_capas_aumento())
+    val_ds = crear_dataset_shards(directorio, 'val', num_classes, batch_size)
+    test_ds = crear_dataset_shards(directorio, 'test', num_classes, batch_size)
+    
+    info = {
+        'class_names': class_names,
+        'train_samples': splits['train']['num_imagenes'],
+        'val_samples': splits['val']['num_imagenes'],
+        'test_samples': splits['test']['num_imagenes'],
+    }
+    return train_ds, val_ds, test_ds, info
+
+def create_data_pipeline_tfdata(dataset_path, batch_size=32, img_size=(224, 224), cache='ram',
+                                validation_split=0.2, seed=42):
+    """Alternativa a create_data_generators_20_clases con tf.data
+
+    Devuelve (train_ds, val_ds, test_ds, info) con info = {'class_names', 'train_samples',
+    'val_samples', 'test_samples'}.
+    """
+    train_path = os.path.join(dataset_path, 'Training')
+    test_path = os.path.join(dataset_path, 'Test')
+    class_names = seleccionar_clases(train_path)
+    num_classes = len(class_names)
+    
+    rutas, etiquetas = listar_imagenes(train_path, class_names)
+    (train_rutas, train_etiquetas), (val_rutas, val_etiquetas) = dividir_validacion(rutas, etiquetas, validation_split)
+    test_rutas, test_etiquetas = listar_imagenes(test_path, class_names)
+    
+    def cache_de(split):
+        # Un archivo de cache distinto por split
+        return cache if cache in (None, 'ram') else f"{cache}_{split}"
+    
+    train_ds = crear_dataset(train_rutas, train_etiquetas, num_classes, batch_size, img_size,
+                             cache=cache_de('train'), entrenamiento=True, aumento=crear_capas_aumento(), seed=seed)
+    val_ds = crear_dataset(val_rutas, val_etiquetas, num_classes, batch_size, img_size, cache=cache_de('val'))
+    test_ds = crear_dataset(test_rutas, test_etiquetas, num_classes, batch_size, img_size, cache=cache_de('test'))
+    
+    info = {
+        'class_names': class_names,
+        'train_samples': len(train_rutas),
+        'val_samples': len(val_rutas),
+        'test_samples': len(test_rutas),
+    }
+    return train_ds, val_ds, test_ds, info
+
+def cpu_soporta_bf16():
+    """True si la CPU tiene instrucciones bfloat16 (AVX512-BF16 o AMX)"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def configurar_cpu(intra_op=0, inter_op=0, mixed_precision=False):
+    """Hilos de TensorFlow y precisión mixta; debe llamarse antes de crear el modelo
+
+    Devuelve True si se activó la precisión mixta bfloat16.
+    """
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    
+    if not mixed_precision:
+        return False
+    if not cpu_soporta_bf16():
+        print("La CPU no soporta bfloat16 (avx512_bf16/amx); se entrena en float32")
+        return False
+    keras.mixed_precision.set_global_policy('mixed_bfloat16')
+    print("Precisión mixta activada: mixed_bfloat16")
+    return True
+
+def crear_optimizador(learning_rate):
+    return keras.optimizers.Adam(learning_rate=learning_rate)
+
+def compilar(model, learning_rate, acumulacion=1, **kwargs):
+    """compile con Adam; con acumulacion > 1 se aplica el gradiente medio de varios lotes"""
+    model.compile(optimizer=crear_optimizador(learning_rate), **kwargs)
+    activar_acumulacion(model, acumulacion)
+    return model
+
+def activar_acumulacion(model, acumulacion):
+    """Sustituye el train_step del modelo ya compilado por uno con acumulación de gradientes
+
+    Adam de Keras 2.13 no tiene gradient_accumulation_steps: los gradientes se suman en
+    variables propias y el optimizador se aplica una vez cada `acumulacion` lotes. Las
+    variables viven fuera del modelo, así que el .h5 guardado no cambia. Hay que llamarla
+    tras cada compile, porque al descongelar bloques cambian las variables entrenables.
+    """
+    if acumulacion <= 1:
+        model.__dict__.pop('train_step', None)
+        return model
+
+    variables = model.trainable_variables
+    # El optimizador se construye aquí: dentro del tf.cond no puede crear sus variables
+    model.optimizer.build(variables)
+    acumulados = [tf.Variable(tf.zeros_like(v), trainable=False) for v in variables]
+    paso = tf.Variable(0, trainable=False, dtype=tf.int64)
+
+    def aplicar():
+        model.optimizer.apply_gradients(zip([a.read_value() for a in acumulados], variables))
+        for a in acumulados:
+            a.assign(tf.zeros_like(a))
+        return tf.constant(True)
+
+    def train_step(data):
+        x, y, peso = keras.utils.unpack_x_y_sample_weight(data)
+        with tf.GradientTape() as tape:
+            y_pred = model(x, training=True)
+            loss = model.compute_loss(x, y, y_pred, peso)
+        for a, g in zip(acumulados, tape.gradient(loss, variables)):
+            if g is not None:
+                a.assign_add(tf.convert_to_tensor(g) / acumulacion)
+        paso.assign_add(1)
+        tf.cond(paso % acumulacion == 0, aplicar, lambda: tf.constant(False))
+        return model.compute_metrics(x, y, y_pred, peso)
+
+    model.train_step = train_step
+    return model
+
+def create_model(num_classes, learning_rate=0.001, acumulacion=1, alpha=1.0, img_size=224):
+    # alpha < 1 reduce el ancho de todas las capas y img_size < 224 la resolución de entrada:
+    # el modelo rápido de la cascada o el alumno de destilacion.py
+    base_model = MobileNetV2(input_shape=(img_size, img_size, 3), alpha=alpha, include_top=False,
+                             weights='imagenet')
     base_model.trainable = False
 
     model = keras.Sequential([
         base_model,
         layers.GlobalAveragePooling2D(),
         layers.Dropout(0.2),
-        layers.Dense(256, activation='relu'),
+        layers.Dense(256, activation='relu', name='densa_oculta'),
         layers.Dropout(0.2),
-        layers.Dense(num_classes, activation='softmax')
+        # Softmax en float32 aunque el resto use precisión mixta
+        layers.Dense(num_classes, activation='softmax', name='salida', dtype='float32')
     ])
 
-    model.compile(
+    compilar(model, learning_rate, acumulacion, loss='categorical_crossentropy', metrics=['accuracy'])
+    
+    return model
+
+def descongelar_bloques(model, num_bloques, learning_rate=1e-5, acumulacion=1):
+    """Fase 2: hace entrenables los últimos num_bloques bloques de MobileNetV2 y recompila
+
+    Las BatchNormalization siguen congeladas para no romper sus estadísticas con lotes pequeños.
+    """
+    base_model = model.layers[0]
+    base_model.trainable = True
+    primer_bloque = 17 - num_bloques  # MobileNetV2 tiene los bloques 1..16 tras expanded_conv
+    for layer in base_model.layers:
+        bloque = re.match(r'block_(\d+)_', layer.name)
+        if bloque:
+            entrenable = int(bloque.group(1)) >= primer_bloque
+        else:
+            # Conv_1 / out_relu van después del último bloque
+            entrenable = layer.name.startswith(('Conv_1', 'out_relu'))
+        layer.trainable = entrenable and not isinstance(layer, layers.BatchNormalization)
+    
+    compilar(model, learning_rate, acumulacion, loss='categorical_crossentropy', metrics=['accuracy'])
+    entrenables = sum(int(np.prod(w.shape)) for w in model.trainable_weights)
+    print(f"Fine-tuning: últimos {num_bloques} bloques, {entrenables:,} parámetros entrenables, lr={learning_rate}")
+    return model
+
+def a_float32_modelo(entrenado, num_classes, alpha=1.0):
+    """Copia los pesos de un modelo con precisión mixta en uno float32 con la misma arquitectura"""
+    keras.mixed_precision.set_global_policy('float32')
+    model = create_model(num_classes, alpha=alpha, img_size=entrenado.input_shape[1])
+    model.set_weights(entrenado.get_weights())
+    return model
+
+def a_float32(ruta_modelo, num_classes, alpha=1.0):
+    """Reescribe un .h5 entrenado con precisión mixta como modelo float32 para el backend"""
+    model = a_float32_modelo(tf.keras.models.load_model(ruta_modelo), num_classes, alpha)
+    model.save(ruta_modelo)
+    return model
+
+DIM_EMBEDDING = 1280  # salida de MobileNetV2 tras GlobalAveragePooling2D
+
+def crear_extractor(img_size=(224, 224)):
+    """Base MobileNetV2 congelada + pooling: imagen -> vector de 1280"""
+    base_model = MobileNetV2(input_shape=img_size + (3,), include_top=False, weights='imagenet')
+    base_model.trainable = False
+    return keras.Sequential([base_model, layers.GlobalAveragePooling2D()])
+
+def crear_cabeza(num_classes):
+    """Las mismas capas entrenables que create_model, sobre embeddings ya calculados"""
+    cabeza = keras.Sequential([
+        keras.Input(shape=(DIM_EMBEDDING,)),
+        layers.Dropout(0.2),
+        layers.Dense(256, activation='relu', name='densa_oculta'),
+        layers.Dropout(0.2),
+        layers.Dense(num_classes, activation='softmax', name='salida', dtype='float32')
+    ])
+    cabeza.compile(
         optimizer=keras.optimizers.Adam(learning_rate=0.001),
         loss='categorical_crossentropy',
         metrics=['accuracy']
     )
-    
+    return cabeza
+
+def ensamblar_modelo(cabeza, num_classes):
+    """Modelo completo (imagen -> clase) con los pesos de la cabeza entrenada, listo para el backend"""
+    model = create_model(num_classes)
+    for nombre in ('densa_oculta', 'salida'):
+        model.get_layer(nombre).set_weights(cabeza.get_layer(nombre).get_weights())
     return model
 
-def train_model_optimizado(model, train_gen, val_gen, epochs=10):
-    callbacks = [
+def precomputar_embeddings(extractor, rutas, etiquetas, prefijo, num_classes, batch_size=64,
+                           img_size=(224, 224), variantes_aumento=0):
+    """Pasa cada imagen una vez por la base y guarda los embeddings en {prefijo}_x.npy (memmap)
+
+    Con variantes_aumento > 0 se añaden, detrás de las originales, esa cantidad de
+    copias aumentadas de cada imagen. Las etiquetas van a {prefijo}_y.npy.
+    """
+    n = len(rutas)
+    total = n * (1 + variantes_aumento)
+    x = np.lib.format.open_memmap(prefijo + '_x.npy', mode='w+', dtype=np.float16, shape=(total, DIM_EMBEDDING))
+    np.save(prefijo + '_y.npy', np.tile(np.asarray(etiquetas, dtype=np.int16), 1 + variantes_aumento))
+    
+    for variante in range(1 + variantes_aumento):
+        aumento = crear_capas_aumento() if variante > 0 else None
+        ds = crear_dataset(rutas, etiquetas, num_classes, batch_size, img_size, aumento=aumento)
+        posicion = variante * n
+        for imagenes, _ in ds:
+            embeddings = extractor(imagenes, training=False).numpy()
+            x[posicion:posicion + len(embeddings)] = embeddings
+            posicion += len(embeddings)
+    x.flush()
+    del x
+
+class LotesEmbeddings(keras.utils.Sequence):
+    """Lotes leídos del memmap sin cargar el archivo completo en memoria"""
+    
+    def __init__(self, x, y, num_classes, batch_size=256, mezclar=True):
+        super().__init__()
+        self.x = x
+        self.y = y
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.mezclar = mezclar
+        self.indices = np.arange(len(x))
+        self.on_epoch_end()
+    
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+    
+    def __getitem__(self, i):
+        # Índices ordenados: lecturas secuenciales dentro del memmap
+        indices = np.sort(self.indices[i * self.batch_size:(i + 1) * self.batch_size])
+        etiquetas = np.eye(self.num_classes, dtype=np.float32)[self.y[indices]]
+        return np.asarray(self.x[indices], dtype=np.float32), etiquetas
+    
+    def on_epoch_end(self):
+        if self.mezclar:
+            np.random.shuffle(self.indices)
+
+class TiempoPorEpoca(keras.callbacks.Callback):
+    """Guarda la duración (segundos de reloj) de cada época"""
+    
+    def __init__(self):
+        super().__init__()
+        self.tiempos = []
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self._inicio = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        self.tiempos.append(time.perf_counter() - self._inicio)
+        print(f" - época {epoch + 1}: {self.tiempos[-1]:.1f}s")
+
+def crear_callbacks(checkpoint='best_model_20_clases.h5'):
+    # Se crean una vez y se comparten entre fases: el checkpoint conserva el mejor val_loss global
+    return [
         keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True),
         keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=3, min_lr=1e-7),
-        keras.callbacks.ModelCheckpoint('best_model_20_clases.h5', save_best_only=True)
+        keras.callbacks.ModelCheckpoint(checkpoint, save_best_only=True)
     ]
+
+def nombre_artefacto(base, alpha):
+    """modelo.h5 / modelo_alpha0.35.h5: un modelo reducido no sobrescribe el completo"""
+    return f"{base}.h5" if alpha == 1.0 else f"{base}_alpha{alpha:g}.h5"
+
+def train_model_optimizado(model, train_gen, val_gen, epochs=10, initial_epoch=0, callbacks=None):
+    callbacks = callbacks if callbacks is not None else crear_callbacks()
     
     print("Entrenando con generadores de datos (sin cargar todo en memoria)...")
     
@@ -114,12 +436,36 @@ def train_model_optimizado(model, train_gen, val_gen, epochs=10):
         train_gen,
         validation_data=val_gen,
         epochs=epochs,
+        initial_epoch=initial_epoch,
         callbacks=callbacks,
         verbose=1
     )
     
     return history
 
+def unir_historiales(*historiales):
+    """Un solo History con las métricas de todas las fases, para plot_training_history"""
+    unido = keras.callbacks.History()
+    unido.history = {}
+    for historial in historiales:
+        for clave, valores in historial.history.items():
+            unido.history.setdefault(clave, []).extend(valores)
+    return unido
+
+def reporte_entrenamiento(filas, salida='reporte_entrenamiento.md'):
+    """Añade una fila por fase al reporte: tiempo medio por época y accuracy final"""
+    nuevo = not os.path.exists(salida)
+    with open(salida, 'a') as f:
+        if nuevo:
+            f.write("# Tiempo por época y accuracy por configuración\n\n")
+            f.write("| Configuración | Fase | Épocas | s/época | Val accuracy | Test accuracy |\n")
+            f.write("|---------------|------|--------|---------|--------------|---------------|\n")
+        for fila in filas:
+            f.write(f"| {fila['configuracion']} | {fila['fase']} | {fila['epocas']} | "
+                    f"{fila['s_por_epoca']:.1f} | {fila['val_accuracy'] * 100:.2f}% | "
+                    f"{fila['test_accuracy'] * 100:.2f}% |\n")
+    print(f"Reporte actualizado: {salida}")
+
 def plot_training_history(history):
     plt.figure(figsize=(12, 4))
 
@@ -159,13 +505,268 @@ def save_model_and_classes(model, class_names, model_path='modelo.h5', classes_p
     print(f"Modelo guardado en: {model_path}")
     print(f"Clases guardadas en: {classes_path}")
 
-def predecir_imagen(ruta_imagen, model_path='modelo.h5', classes_path='classes.txt'):
-    import cv2
+def crear_generador_calibracion(dataset_path, class_names, img_size=(224, 224)):
+    # Muestras del Training sin augmentation, mismo preprocesado que el backend (0-1)
+    datagen = ImageDataGenerator(rescale=1./255)
+    return datagen.flow_from_directory(
+        os.path.join(dataset_path, 'Training'),
+        target_size=img_size,
+        batch_size=1,
+        class_mode=None,
+        shuffle=True,
+        seed=42,
+        classes=class_names
+    )
+
+def exportar_tflite(model, ruta='modelo.tflite', int8=False, calib_gen=None, num_muestras=200):
+    """Exporta a TFLite; con int8=True aplica cuantización post-entrenamiento calibrada"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    
+    if int8:
+        if calib_gen is None:
+            raise ValueError("La cuantización INT8 necesita un generador de calibración")
+        
+        def representative_dataset():
+            for _ in range(num_muestras):
+                yield [next(calib_gen).astype(np.float32)]
+        
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Entrada y salida se mantienen en float32 para no cambiar el preprocesado del backend
+    
+    with open(ruta, 'wb') as f:
+        f.write(converter.convert())
+    
+    print(f"Modelo TFLite{' INT8' if int8 else ''} guardado en: {ruta}")
+    return ruta
+
+def exportar_onnx(model, ruta='modelo.onnx'):
+    try:
+        import tf2onnx
+    except ImportError:
+        print("tf2onnx no está instalado (pip install tf2onnx); se omite la exportación ONNX")
+        return None
+    
+    alto, ancho = model.input_shape[1:3]
+    spec = (tf.TensorSpec((None, alto, ancho, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=ruta)
+    print(f"Modelo ONNX guardado en: {ruta}")
+    return ruta
+
+def crear_predictor(ruta):
+    """Devuelve una función lote -> probabilidades para un artefacto .h5, .tflite u .onnx"""
+    if ruta.endswith('.tflite'):
+        interpreter = tf.lite.Interpreter(model_path=ruta)
+        entrada = interpreter.get_input_details()[0]
+        salida = interpreter.get_output_details()[0]
+        
+        def predecir(lote):
+            if tuple(entrada['shape']) != lote.shape:
+                interpreter.resize_tensor_input(entrada['index'], lote.shape)
+                interpreter.allocate_tensors()
+                entrada['shape'] = np.array(lote.shape)
+            interpreter.set_tensor(entrada['index'], lote.astype(np.float32))
+            interpreter.invoke()
+            return interpreter.get_tensor(salida['index'])
+        
+        interpreter.allocate_tensors()
+        predecir.img_size = int(entrada['shape'][1])
+        return predecir
+    
+    if ruta.endswith('.onnx'):
+        import onnxruntime as ort
+        session = ort.InferenceSession(ruta, providers=['CPUExecutionProvider'])
+        nombre_entrada = session.get_inputs()[0].name
+        predecir = lambda lote: session.run(None, {nombre_entrada: lote.astype(np.float32)})[0]
+        alto = session.get_inputs()[0].shape[1]
+        predecir.img_size = alto if isinstance(alto, int) else None
+        return predecir
+    
+    modelo = tf.keras.models.load_model(ruta)
+    predecir = lambda lote: modelo.predict_on_batch(lote)
+    # Resolución de entrada del artefacto: los alumnos destilados usan menos de 224
+    predecir.img_size = modelo.input_shape[1]
+    return predecir
+
+def iterar_lotes(datos):
+    """(imagenes, etiquetas) en NumPy desde un generador de Keras o un tf.data.Dataset"""
+    if isinstance(datos, tf.data.Dataset):
+        yield from datos.as_numpy_iterator()
+    else:
+        datos.reset()
+        for _ in range(len(datos)):
+            yield next(datos)
+
+def reporte_runtimes(rutas, test_gen, salida='reporte_runtimes.md', repeticiones_latencia=50):
+    """Compara precisión en Test y latencia (lote de 1) de cada artefacto exportado"""
+    filas = []
+    for ruta in rutas:
+        predecir = crear_predictor(ruta)
+        
+        aciertos = 0
+        total = 0
+        inicio = time.perf_counter()
+        for imagenes, etiquetas in iterar_lotes(test_gen):
+            predicciones = predecir(imagenes)
+            aciertos += int(np.sum(np.argmax(predicciones, axis=1) == np.argmax(etiquetas, axis=1)))
+            total += len(imagenes)
+        imgs_por_segundo = total / (time.perf_counter() - inicio)
+        
+        # Latencia de una imagen suelta, como en /predict
+        imagen = imagenes[:1]
+        predecir(imagen)
+        tiempos = []
+        for _ in range(repeticiones_latencia):
+            t0 = time.perf_counter()
+            predecir(imagen)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        
+        filas.append({
+            'artefacto': os.path.basename(ruta),
+            'accuracy': aciertos / total,
+            'latencia_p50_ms': float(np.percentile(tiempos, 50)),
+            'latencia_p95_ms': float(np.percentile(tiempos, 95)),
+            'imgs_por_segundo': imgs_por_segundo,
+            'tamano_mb': os.path.getsize(ruta) / 1e6,
+        })
+    
+    lineas = [
+        "| Artefacto | Accuracy Test | Latencia p50 (ms) | Latencia p95 (ms) | Imgs/s (lote) | Tamaño (MB) |",
+        "|-----------|---------------|-------------------|-------------------|---------------|-------------|",
+    ]
+    for f in filas:
+        lineas.append(
+            f"| {f['artefacto']} | {f['accuracy']*100:.2f}% | {f['latencia_p50_ms']:.2f} | "
+            f"{f['latencia_p95_ms']:.2f} | {f['imgs_por_segundo']:.1f} | {f['tamano_mb']:.2f} |"
+        )
+    reporte = "\n".join(lineas)
+    
+    with open(salida, 'w') as f:
+        f.write("# Precisión vs. latencia por runtime\n\n" + reporte + "\n")
+    print(reporte)
+    print(f"\nReporte guardado en: {salida}")
+    return filas
+
+def exportar_main(args):
+    print(f"=== EXPORTANDO {args.exportar} ===")
+    model = tf.keras.models.load_model(args.exportar)
+    # Calibración INT8 y reporte a la resolución del artefacto (los alumnos destilados usan menos de 224)
+    img_size = tuple(model.input_shape[1:3])
+    
+    with open(args.classes, 'r') as f:
+        class_names = [line.strip() for line in f.readlines()]
+    
+    base = os.path.splitext(args.exportar)[0]
+    rutas = [args.exportar, exportar_tflite(model, base + '.tflite')]
+    
+    if args.int8:
+        calib_gen = crear_generador_calibracion(args.dataset, class_names, img_size)
+        rutas.append(exportar_tflite(model, base + '_int8.tflite', int8=True,
+                                     calib_gen=calib_gen, num_muestras=args.muestras_calibracion))
+    
+    if args.onnx:
+        ruta_onnx = exportar_onnx(model, base + '.onnx')
+        if ruta_onnx:
+            rutas.append(ruta_onnx)
+    
+    if args.reporte and args.pipeline == 'shards':
+        manifest = leer_manifest(args.shards_dir)
+        if manifest['class_names'] != class_names:
+            raise SystemExit(f"Las clases de {args.shards_dir} no coinciden con {args.classes}")
+        if tuple(manifest['img_size']) != img_size:
+            raise SystemExit(f"Los shards de {args.shards_dir} son de {tuple(manifest['img_size'])} "
+                             f"y el modelo espera {img_size}")
+        reporte_runtimes(rutas, crear_dataset_shards(args.shards_dir, 'test', len(class_names), 32))
+    elif args.reporte:
+        test_gen = ImageDataGenerator(rescale=1./255).flow_from_directory(
+            os.path.join(args.dataset, 'Test'),
+            target_size=img_size,
+            batch_size=32,
+            class_mode='categorical',
+            shuffle=False,
+            classes=class_names
+        )
+        reporte_runtimes(rutas, test_gen)
+
+def entrenar_embeddings_main(args):
+    """Entrena solo la cabeza Dense sobre embeddings de la base calculados una única vez"""
+    print("=== ENTRENAMIENTO SOBRE EMBEDDINGS PRECALCULADOS ===")
+    configurar_cpu(args.intra_op, args.inter_op)
+    train_path = os.path.join(args.dataset, 'Training')
+    class_names = seleccionar_clases(train_path)
+    num_classes = len(class_names)
+    
+    rutas, etiquetas = listar_imagenes(train_path, class_names)
+    train, val = dividir_validacion(rutas, etiquetas, 0.2)
+    splits = {
+        'train': (*train, args.variantes_aumento),
+        'val': (*val, 0),
+        'test': (*listar_imagenes(os.path.join(args.dataset, 'Test'), class_names), 0),
+    }
+    
+    # Los embeddings se reutilizan entre reentrenamientos mientras no cambien clases ni datos
+    os.makedirs(args.embeddings_dir, exist_ok=True)
+    ruta_meta = os.path.join(args.embeddings_dir, 'meta.json')
+    meta = {
+        'class_names': class_names,
+        'variantes_aumento': args.variantes_aumento,
+        'muestras': {split: len(datos[0]) for split, datos in splits.items()},
+    }
+    meta_anterior = None
+    if os.path.exists(ruta_meta):
+        with open(ruta_meta) as f:
+            meta_anterior = json.load(f)
+    
+    if args.recalcular or meta_anterior != meta:
+        extractor = crear_extractor()
+        for split, (rutas_split, etiquetas_split, variantes) in splits.items():
+            print(f"Calculando embeddings de {split} ({len(rutas_split)} imágenes, {variantes} variantes aumentadas)...")
+            inicio = time.perf_counter()
+            precomputar_embeddings(extractor, rutas_split, etiquetas_split,
+                                   os.path.join(args.embeddings_dir, split), num_classes,
+                                   variantes_aumento=variantes)
+            print(f"  {time.perf_counter() - inicio:.1f}s")
+        with open(ruta_meta, 'w') as f:
+            json.dump(meta, f, indent=2)
+    else:
+        print(f"Reutilizando embeddings de {args.embeddings_dir}")
+    
+    def cargar(split, mezclar):
+        prefijo = os.path.join(args.embeddings_dir, split)
+        x = np.load(prefijo + '_x.npy', mmap_mode='r')
+        y = np.load(prefijo + '_y.npy')
+        return LotesEmbeddings(x, y, num_classes, mezclar=mezclar)
+    
+    cabeza = crear_cabeza(num_classes)
+    callbacks = [
+        keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True),
+        keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=3, min_lr=1e-7),
+    ]
+    inicio = time.perf_counter()
+    cabeza.fit(cargar('train', True), validation_data=cargar('val', False),
+               epochs=args.epocas, callbacks=callbacks, verbose=1)
+    print(f"Entrenamiento de la cabeza: {time.perf_counter() - inicio:.1f}s")
     
-    modelo = tf.keras.models.load_model(model_path)
+    evaluate_model_optimizado(cabeza, cargar('test', False))
     
+    model = ensamblar_modelo(cabeza, num_classes)
+    model.save('best_model_20_clases.h5')
+    save_model_and_classes(model, class_names)
+
+@functools.lru_cache(maxsize=4)
+def cargar_modelo_y_clases(model_path='modelo.h5', classes_path='classes.txt'):
+    """El modelo y sus clases se cargan una vez por ruta, no en cada predicción"""
+    modelo = tf.keras.models.load_model(model_path)
     with open(classes_path, 'r') as f:
         classes = [line.strip() for line in f.readlines()]
+    return modelo, classes
+
+def predecir_imagen(ruta_imagen, model_path='modelo.h5', classes_path='classes.txt'):
+    """Clase y confianza (%) de una imagen; para carpetas enteras usar clasificar_lote.py"""
+    import cv2
+    
+    modelo, classes = cargar_modelo_y_clases(model_path, classes_path)
     
     image = cv2.imread(ruta_imagen)
     if image is None:
@@ -175,56 +776,184 @@ def predecir_imagen(ruta_imagen, model_path='modelo.h5', classes_path='classes.t
     image = image.astype(np.float32) / 255.0
     image = np.expand_dims(image, axis=0)
     
-    predictions = modelo.predict(image)
+    predictions = modelo.predict_on_batch(image)
     predicted_class = np.argmax(predictions[0])
     confidence = float(predictions[0][predicted_class])
     
     return classes[predicted_class], confidence * 100
 
-def main():
+def describir_configuracion(args, bf16):
+    partes = [args.pipeline, 'bf16' if bf16 else 'fp32']
+    if args.intra_op or args.inter_op:
+        partes.append(f"hilos {args.intra_op or '-'}/{args.inter_op or '-'}")
+    if args.onednn:
+        partes.append(f"oneDNN {args.onednn}")
+    if args.acumulacion > 1:
+        partes.append(f"acum x{args.acumulacion}")
+    if args.alpha != 1.0:
+        partes.append(f"alpha {args.alpha:g}")
+    return ", ".join(partes)
+
+def main(args):
     print("=== CLASIFICADOR 20 CLASES CON GENERADORES ===")
-    print("Usando generadores de datos para no cargar todo en memoria")
-    print("Configurando generadores de datos...")
-    
-    # Batch size optimizado para 20 clases
-    batch_size = 32
-    
-    train_gen, val_gen, test_gen = create_data_generators_20_clases('dataset', batch_size=batch_size)
-    
-    num_classes = train_gen.num_classes
-    class_names = list(train_gen.class_indices.keys())
+    bf16 = configurar_cpu(args.intra_op, args.inter_op, args.mixed_precision)
+    print("Configurando datos de entrada...")
+    
+    # Batch size optimizado para 20 clases; con acumulación el lote efectivo es batch_size * acumulacion
+    batch_size = args.batch_size
+    cache = None if args.cache == 'no' else args.cache
+    
+    if args.pipeline in ('tfdata', 'shards'):
+        if args.pipeline == 'shards':
+            print(f"Usando shards preprocesados de {args.shards_dir}")
+            train_gen, val_gen, test_gen, info = create_data_pipeline_shards(args.shards_dir, batch_size=batch_size)
+        else:
+            print(f"Usando tf.data (decodificación en paralelo, cache: {cache or 'no'}, prefetch)")
+            train_gen, val_gen, test_gen, info = create_data_pipeline_tfdata(args.dataset, batch_size=batch_size, cache=cache)
+        class_names = info['class_names']
+        num_classes = len(class_names)
+        muestras = (info['train_samples'], info['val_samples'], info['test_samples'])
+    else:
+        print("Usando generadores de datos para no cargar todo en memoria")
+        train_gen, val_gen, test_gen = create_data_generators_20_clases(args.dataset, batch_size=batch_size)
+        num_classes = train_gen.num_classes
+        class_names = list(train_gen.class_indices.keys())
+        muestras = (train_gen.samples, val_gen.samples, test_gen.samples)
     
     print(f"\nDataset configurado:")
     print(f"- Clases: {num_classes}")
-    print(f"- Imágenes de entrenamiento: {train_gen.samples}")
-    print(f"- Imágenes de validación: {val_gen.samples}")
-    print(f"- Imágenes de test: {test_gen.samples}")
-    print(f"- Batch size: {batch_size}")
+    print(f"- Imágenes de entrenamiento: {muestras[0]}")
+    print(f"- Imágenes de validación: {muestras[1]}")
+    print(f"- Imágenes de test: {muestras[2]}")
+    print(f"- Batch size: {batch_size} (efectivo: {batch_size * args.acumulacion})")
     
     print("\nCreando modelo...")
-    model = create_model(num_classes)
+    model = create_model(num_classes, acumulacion=args.acumulacion, alpha=args.alpha)
+    ruta_modelo = nombre_artefacto('modelo', args.alpha)
+    ruta_mejor = nombre_artefacto('best_model_20_clases', args.alpha)
     
     print("Iniciando entrenamiento...")
     print("(Los generadores cargan imágenes bajo demanda, no satura la memoria)")
     
-    # Entrenar con generadores
-    history = train_model_optimizado(model, train_gen, val_gen, epochs=10)
+    # Fase 1: solo la cabeza, con la base congelada
+    callbacks = crear_callbacks(ruta_mejor)
+    tiempos = TiempoPorEpoca()
+    history = train_model_optimizado(model, train_gen, val_gen, epochs=args.epocas,
+                                     callbacks=callbacks + [tiempos])
+    fases = [('cabeza', history, tiempos)]
+    
+    # Fase 2: descongelar los últimos bloques de la base con un learning rate menor
+    if args.fine_tuning_epocas > 0:
+        descongelar_bloques(model, args.bloques_fine_tuning, args.lr_fine_tuning, args.acumulacion)
+        tiempos = TiempoPorEpoca()
+        epocas_fase_1 = len(history.history['loss'])
+        history_ft = train_model_optimizado(model, train_gen, val_gen,
+                                            epochs=epocas_fase_1 + args.fine_tuning_epocas,
+                                            initial_epoch=epocas_fase_1,
+                                            callbacks=callbacks + [tiempos])
+        fases.append((f'fine-tuning {args.bloques_fine_tuning} bloques', history_ft, tiempos))
+        history = unir_historiales(history, history_ft)
     
     print("\nMostrando gráficas de entrenamiento...")
     plot_training_history(history)
     
     print("\nEvaluando modelo...")
-    evaluate_model_optimizado(model, test_gen)
+    _, test_accuracy = evaluate_model_optimizado(model, test_gen)
+    
+    configuracion = describir_configuracion(args, bf16)
+    reporte_entrenamiento([
+        {
+            'configuracion': configuracion,
+            'fase': fase,
+            'epocas': len(tiempos_fase.tiempos),
+            's_por_epoca': float(np.mean(tiempos_fase.tiempos)) if tiempos_fase.tiempos else 0.0,
+            'val_accuracy': max(historial.history.get('val_accuracy', [0.0])),
+            'test_accuracy': test_accuracy,
+        }
+        for fase, historial, tiempos_fase in fases
+    ])
     
     print("\nGuardando modelo...")
-    save_model_and_classes(model, class_names)
+    if bf16:
+        # El backend sirve en float32: se reescriben pesos y política de las capas
+        a_float32(ruta_mejor, num_classes, args.alpha)
+        model = a_float32_modelo(model, num_classes, args.alpha)
+    save_model_and_classes(model, class_names, ruta_modelo)
     
     print("¡Entrenamiento completado!")
     print("Archivos generados:")
-    print("- modelo.h5")
-    print("- best_model_20_clases.h5")
+    print(f"- {ruta_modelo}")
+    print(f"- {ruta_mejor}")
     print("- classes.txt")
-    print(f"\nEste método NO carga todo en memoria, solo procesa por lotes de {batch_size}")
+    print("- reporte_entrenamiento.md")
+    print(f"\nEvaluación detallada: python evaluacion.py --modelos {ruta_modelo} {ruta_mejor}")
+    print(f"Publicar en el backend: python ../backend/registro_modelos.py --registro ../backend/modelos "
+          f"publicar {ruta_mejor} --classes classes.txt")
+    if args.alpha != 1.0:
+        print(f"Cascada: python evaluacion.py --modelos {ruta_mejor} best_model_20_clases.h5 "
+              f"--calibrar --cascada {ruta_mejor} best_model_20_clases.h5")
+    if args.pipeline != 'tfdata' or cache != 'ram':
+        print(f"\nEste método NO carga todo en memoria, solo procesa por lotes de {batch_size}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clasificador de 20 clases de alimentos")
+    parser.add_argument('--dataset', default='dataset', help='Carpeta con Training/ y Test/')
+    parser.add_argument('--pipeline', choices=['generador', 'tfdata', 'shards'], default='generador',
+                        help='Entrada de datos: ImageDataGenerator, tf.data en paralelo o shards de preparar_dataset.py')
+    parser.add_argument('--shards-dir', default='dataset_shards',
+                        help='Carpeta generada por preparar_dataset.py (--pipeline shards y --reporte)')
+    parser.add_argument('--cache', default='ram',
+                        help="Cache de tf.data: 'ram', una ruta de archivo local o 'no'")
+    parser.add_argument('--epocas', type=int, default=10, help='Épocas de entrenamiento')
+    parser.add_argument('--batch-size', type=int, default=32, help='Imágenes por lote')
+    parser.add_argument('--fine-tuning-epocas', type=int, default=0,
+                        help='Épocas de la fase 2, con los últimos bloques de MobileNetV2 descongelados')
+    parser.add_argument('--bloques-fine-tuning', type=int, default=3,
+                        help='Bloques de MobileNetV2 (de 16) que se descongelan en la fase 2')
+    parser.add_argument('--lr-fine-tuning', type=float, default=1e-5, help='Learning rate de la fase 2')
+    parser.add_argument('--mixed-precision', action='store_true',
+                        help='Precisión mixta bfloat16 (solo si la CPU tiene AVX512-BF16 o AMX)')
+    parser.add_argument('--intra-op', type=int, default=0, help='Hilos por operación (0 = automático)')
+    parser.add_argument('--inter-op', type=int, default=0, help='Operaciones en paralelo (0 = automático)')
+    parser.add_argument('--onednn', choices=['on', 'off'],
+                        help='Fuerza TF_ENABLE_ONEDNN_OPTS (reinicia el proceso si hace falta)')
+    parser.add_argument('--alpha', type=float, choices=[0.35, 0.5, 0.75, 1.0], default=1.0,
+                        help='Ancho de MobileNetV2; < 1 entrena el modelo rápido de la cascada')
+    parser.add_argument('--acumulacion', type=int, default=1,
+                        help='Lotes cuyos gradientes se acumulan antes de actualizar')
+    parser.add_argument('--modo', choices=['completo', 'embeddings'], default='completo',
+                        help='embeddings: calcula una vez la salida de la base y entrena solo la cabeza')
+    parser.add_argument('--embeddings-dir', default='embeddings',
+                        help='Carpeta de los embeddings precalculados (.npy memmap)')
+    parser.add_argument('--variantes-aumento', type=int, default=0,
+                        help='Copias aumentadas por imagen de entrenamiento en modo embeddings')
+    parser.add_argument('--recalcular', action='store_true',
+                        help='Recalcular los embeddings aunque ya existan')
+    parser.add_argument('--exportar', metavar='MODELO_H5',
+                        help='En lugar de entrenar, exporta este modelo a TFLite (y opcionalmente ONNX)')
+    parser.add_argument('--classes', default='classes.txt', help='Lista de clases del modelo a exportar')
+    parser.add_argument('--int8', action='store_true', help='Generar además una variante TFLite INT8')
+    parser.add_argument('--muestras-calibracion', type=int, default=200,
+                        help='Imágenes del Training usadas para calibrar INT8')
+    parser.add_argument('--onnx', action='store_true', help='Exportar también a ONNX (requiere tf2onnx)')
+    parser.add_argument('--reporte', action='store_true',
+                        help='Comparar accuracy y latencia de los artefactos en el split Test')
+    return parser.parse_args()
+
+def aplicar_onednn(valor):
+    """TF_ENABLE_ONEDNN_OPTS solo se lee al importar TensorFlow: si cambia, se relanza el proceso"""
+    deseado = '1' if valor == 'on' else '0'
+    if os.environ.get('TF_ENABLE_ONEDNN_OPTS') != deseado:
+        os.environ['TF_ENABLE_ONEDNN_OPTS'] = deseado
+        os.execv(sys.executable, [sys.executable] + sys.argv)
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.onednn:
+        aplicar_onednn(args.onednn)
+    if args.exportar:
+        exportar_main(args)
+    elif args.modo == 'embeddings':
+        entrenar_embeddings_main(args)
+    else:
+        main(args)
@@ -0,0 +1,237 @@
+"""Clasifica offline grandes cantidades de imágenes con un modelo exportado
+
+El modelo (.h5, .tflite u .onnx) se carga una sola vez. Las imágenes se decodifican en un
+pool de procesos mientras el proceso principal infiere lotes grandes, y los resultados se
+escriben en CSV o JSONL a medida que salen, con progreso e imágenes por segundo. Con
+--reanudar se saltan las rutas que ya están en el archivo de salida.
+
+Uso:
+    python clasificar_lote.py --modelo modelo.h5 --entrada /fotos --salida etiquetas.csv
+    find /fotos -name '*.jpg' | python clasificar_lote.py --modelo modelo.tflite --entrada - --salida etiquetas.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+import numpy as np
+from PIL import Image
+
+EXTENSIONES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def recorrer(directorio):
+    """Rutas de imágenes bajo `directorio`, en orden y sin listar todo el árbol de antemano"""
+    pendientes = [directorio]
+    while pendientes:
+        actual = pendientes.pop()
+        with os.scandir(actual) as entradas:
+            entradas = sorted(entradas, key=lambda e: e.name)
+        subcarpetas = []
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                subcarpetas.append(entrada.path)
+            elif entrada.name.lower().endswith(EXTENSIONES):
+                yield entrada.path
+        pendientes.extend(reversed(subcarpetas))
+
+def leer_rutas(entrada):
+    if entrada == '-':
+        return (linea.strip() for linea in sys.stdin if linea.strip())
+    if os.path.isdir(entrada):
+        return recorrer(entrada)
+    with open(entrada) as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+def decodificar(tarea):
+    """(ruta, imagen uint8 o None, error) — se ejecuta en los procesos del pool"""
+    ruta, img_size = tarea
+    try:
+        with Image.open(ruta) as imagen:
+            # En JPEG, draft() decodifica a 1/2, 1/4 u 1/8 de resolución sin bajar de img_size
+            imagen.draft('RGB', img_size)
+            imagen = imagen.convert('RGB').resize(img_size, Image.BILINEAR)
+            return ruta, np.asarray(imagen, dtype=np.uint8), None
+    except Exception as e:
+        return ruta, None, f"{type(e).__name__}: {e}"
+
+def por_bloques(iterable, tamano):
+    bloque = []
+    for elemento in iterable:
+        bloque.append(elemento)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+def recortar_linea_incompleta(ruta):
+    """Quita la última línea si quedó a medias porque el proceso anterior se cortó"""
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, 'rb+') as f:
+        tamano = f.seek(0, os.SEEK_END)
+        fin = tamano
+        while fin > 0:
+            inicio = max(0, fin - 65536)
+            f.seek(inicio)
+            bloque = f.read(fin - inicio)
+            salto = bloque.rfind(b'\n')
+            if salto != -1:
+                fin = inicio + salto + 1
+                break
+            fin = inicio
+        if fin != tamano:
+            f.truncate(fin)
+
+class Escritor:
+    """Escribe los resultados en CSV o JSONL (según la extensión) y vacía el buffer por lote"""
+
+    def __init__(self, ruta, top_k, anadir):
+        self.jsonl = ruta.endswith(('.jsonl', '.json'))
+        self.top_k = top_k
+        if anadir:
+            # Se añade detrás de la última fila completa, no pegado a una a medias
+            recortar_linea_incompleta(ruta)
+        nuevo = not anadir or not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+        self.archivo = open(ruta, 'a' if anadir else 'w', newline='', encoding='utf-8')
+        if not self.jsonl:
+            self.csv = csv.writer(self.archivo)
+            if nuevo:
+                cabecera = ['ruta', 'clase', 'probabilidad']
+                for k in range(2, top_k + 1):
+                    cabecera += [f'clase_{k}', f'probabilidad_{k}']
+                self.csv.writerow(cabecera + ['error'])
+
+    def escribir(self, ruta, top=None, error=None):
+        if self.jsonl:
+            fila = {'ruta': ruta}
+            if top:
+                fila.update(clase=top[0][0], probabilidad=top[0][1])
+                if self.top_k > 1:
+                    fila['top'] = [{'clase': c, 'probabilidad': p} for c, p in top]
+            if error:
+                fila['error'] = error
+            self.archivo.write(json.dumps(fila, ensure_ascii=False) + '\n')
+        else:
+            fila = [ruta]
+            for k in range(self.top_k):
+                fila += list(top[k]) if top else ['', '']
+            self.csv.writerow(fila + [error or ''])
+
+    def vaciar(self):
+        self.archivo.flush()
+
+    def cerrar(self):
+        self.archivo.close()
+
+def rutas_hechas(ruta):
+    """Rutas ya presentes en un archivo de salida anterior"""
+    if not os.path.exists(ruta):
+        return set()
+    with open(ruta, newline='', encoding='utf-8') as f:
+        if ruta.endswith(('.jsonl', '.json')):
+            hechas = set()
+            for linea in f:
+                try:
+                    hechas.add(json.loads(linea)['ruta'])
+                except (ValueError, KeyError):
+                    pass  # última línea a medias si el proceso se cortó
+            return hechas
+        return {fila['ruta'] for fila in csv.DictReader(f) if fila.get('ruta')}
+
+def clasificar(args):
+    with open(args.classes) as f:
+        classes = [line.strip() for line in f if line.strip()]
+    # Como limitar_k del backend: no se pueden pedir más clases de las que hay
+    top_k = max(1, min(args.top_k, len(classes)))
+    salida = Escritor(args.salida, top_k, args.reanudar)
+    rutas = leer_rutas(args.entrada)
+    if args.reanudar:
+        hechas = rutas_hechas(args.salida)
+        print(f"Reanudando: {len(hechas)} imágenes ya clasificadas en {args.salida}", file=sys.stderr)
+        rutas = (r for r in rutas if r not in hechas)
+
+    # El pool se crea antes de importar TensorFlow para no hacer fork de un proceso con sus hilos
+    pool = Pool(args.procesos)
+    from clasificador_alimentos import crear_predictor
+    predecir = crear_predictor(args.modelo)
+    # Por defecto, la resolución de entrada del propio artefacto (los alumnos destilados usan menos de 224)
+    lado = args.img_size or predecir.img_size or 224
+    img_size = (lado, lado)
+
+    lote = np.empty((args.batch_size, img_size[1], img_size[0], 3), dtype=np.float32)
+    escala = np.float32(1.0 / 255.0)
+    # Lotes encargados al pool: se decodifican mientras se infiere el anterior. Con un
+    # máximo de `prefetch` lotes en vuelo la memoria no crece aunque haya millones de rutas
+    en_vuelo = deque()
+    bloques = por_bloques(((r, img_size) for r in rutas), args.batch_size)
+    chunksize = max(1, args.batch_size // (4 * (args.procesos or os.cpu_count() or 1)))
+
+    inicio = time.perf_counter()
+    ultimo_aviso = inicio
+    total = errores = 0
+    try:
+        while True:
+            while len(en_vuelo) < args.prefetch:
+                bloque = next(bloques, None)
+                if bloque is None:
+                    break
+                en_vuelo.append(pool.map_async(decodificar, bloque, chunksize))
+            if not en_vuelo:
+                break
+
+            resultados = en_vuelo.popleft().get()
+            validas = [(ruta, imagen) for ruta, imagen, error in resultados if imagen is not None]
+            for ruta, imagen, error in resultados:
+                if error:
+                    salida.escribir(ruta, error=error)
+                    errores += 1
+            if validas:
+                n = len(validas)
+                for i, (_, imagen) in enumerate(validas):
+                    np.multiply(imagen, escala, out=lote[i])
+                probabilidades = np.asarray(predecir(lote[:n]))
+                mejores = np.argsort(-probabilidades, axis=1)[:, :top_k]
+                for (ruta, _), fila, ids in zip(validas, probabilidades, mejores):
+                    salida.escribir(ruta, top=[(classes[i], round(float(fila[i]), 4)) for i in ids])
+            salida.vaciar()
+            total += len(resultados)
+
+            ahora = time.perf_counter()
+            if ahora - ultimo_aviso >= args.intervalo:
+                ultimo_aviso = ahora
+                print(f"  {total} imágenes, {errores} errores, {total / (ahora - inicio):.1f} img/s",
+                      file=sys.stderr)
+    finally:
+        pool.terminate()
+        salida.cerrar()
+
+    duracion = time.perf_counter() - inicio
+    print(f"{total} imágenes clasificadas en {duracion:.1f} s ({total / max(duracion, 1e-9):.1f} img/s), "
+          f"{errores} errores -> {args.salida}", file=sys.stderr)
+    return total, errores
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clasificación por lotes de carpetas o listas de imágenes")
+    parser.add_argument('--modelo', default='modelo.h5', help='Artefacto .h5, .tflite u .onnx')
+    parser.add_argument('--classes', default='classes.txt', help='Lista de clases del modelo')
+    parser.add_argument('--entrada', required=True,
+                        help="Carpeta (recursiva), archivo con una ruta por línea o '-' para leer de stdin")
+    parser.add_argument('--salida', default='etiquetas.csv', help='Archivo .csv o .jsonl de resultados')
+    parser.add_argument('--batch-size', type=int, default=128, help='Imágenes por lote de inferencia')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos que decodifican imágenes (por defecto, uno por CPU)')
+    parser.add_argument('--prefetch', type=int, default=4, help='Lotes decodificándose por adelantado')
+    parser.add_argument('--top-k', type=int, default=1, help='Clases más probables por imagen')
+    parser.add_argument('--img-size', type=int, default=None,
+                        help='Lado de la entrada del modelo (por defecto, el del artefacto)')
+    parser.add_argument('--reanudar', action='store_true',
+                        help='Añadir al archivo de salida saltando las rutas que ya contiene')
+    parser.add_argument('--intervalo', type=float, default=10, help='Segundos entre mensajes de progreso')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    clasificar(parse_args())
@@ -0,0 +1,242 @@
+"""Destilación: un alumno pequeño aprende de las salidas del modelo ya entrenado
+
+El profesor (p. ej. best_model_20_clases.h5) se ejecuta una sola vez sobre train y val de los
+shards de preparar_dataset.py y sus salidas se guardan con la caché de evaluacion.py. El
+alumno, un MobileNetV2 más estrecho (--alpha) y con menos resolución de entrada (--img-size
+128 o 160), se entrena contra esas probabilidades suavizadas con temperatura y contra las
+etiquetas reales, sin volver a ejecutar el profesor en cada época.
+
+Al terminar se guarda el alumno (y con --tflite su versión TFLite) y reporte_destilacion.md
+compara profesor y alumno en Test: accuracy, top-3, ECE, imágenes/s, latencia, tamaño y
+coste de preprocesar una foto a la resolución de cada uno.
+
+Uso:
+    python destilacion.py --profesor best_model_20_clases.h5 --shards-dir dataset_shards --alpha 0.35 --img-size 128
+    python destilacion.py --profesor best_model_20_clases.h5 --img-size 160 --fine-tuning-epocas 10 --tflite
+"""
+import argparse
+import io
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from PIL import Image
+from preparar_dataset import leer_manifest, cargar_split
+from evaluacion import split_desde_shards, salidas_modelo, aplicar_temperatura, calcular_metricas
+from clasificador_alimentos import (AUTOTUNE, create_model, crear_optimizador, descongelar_bloques, configurar_cpu,
+                                    TiempoPorEpoca, save_model_and_classes, exportar_tflite)
+
+# --- Objetivos del profesor ---
+
+def salidas_profesor(ruta, shards_dir, directorio, split, batch_size=256):
+    """Probabilidades del profesor para un split, en el orden de sus shards (se guardan en caché)"""
+    xs, etiquetas, firma, class_names = split_desde_shards(shards_dir, split)
+    salidas, _ = salidas_modelo(ruta, xs, firma, directorio, batch_size, split=split)
+    return salidas, etiquetas, class_names
+
+def crear_dataset_destilacion(directorio, split, objetivos, num_classes, batch_size, img_size, entrenamiento=False):
+    """Lotes (imagen a img_size, [one-hot | probabilidades del profesor]) leídos de los shards
+
+    Las salidas del profesor se calcularon sin aumento, así que en entrenamiento solo se
+    voltea horizontalmente: con rotaciones o zoom el objetivo ya no correspondería a lo que
+    ve el alumno.
+    """
+    xs, ys = cargar_split(directorio, split)
+    forma = tuple(leer_manifest(directorio)['img_size']) + (3,)
+    inicios = np.cumsum([0] + [len(x) for x in xs])
+    objetivos = np.asarray(objetivos, dtype=np.float32)
+
+    def lotes():
+        orden = np.random.permutation(len(xs)) if entrenamiento else range(len(xs))
+        for i in orden:
+            x, y = xs[i], ys[i]
+            indices = np.random.permutation(len(x)) if entrenamiento else np.arange(len(x))
+            for inicio in range(0, len(indices), batch_size):
+                # Índices ordenados: lecturas secuenciales dentro del memmap
+                lote = np.sort(indices[inicio:inicio + batch_size])
+                yield x[lote], y[lote], objetivos[inicios[i] + lote]
+
+    ds = tf.data.Dataset.from_generator(lotes, output_signature=(
+        tf.TensorSpec((None,) + forma, tf.uint8),
+        tf.TensorSpec((None,), tf.int16),
+        tf.TensorSpec((None, num_classes), tf.float32),
+    ))
+
+    def preparar(imagenes, etiquetas, suaves):
+        imagenes = tf.image.resize(tf.cast(imagenes, tf.float32), (img_size, img_size), antialias=True) / 255.0
+        if entrenamiento:
+            imagenes = tf.image.random_flip_left_right(imagenes)
+        reales = tf.one_hot(tf.cast(etiquetas, tf.int32), num_classes)
+        return imagenes, tf.concat([reales, suaves], axis=1)
+
+    return ds.map(preparar, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+# --- Pérdida ---
+
+def perdida_destilacion(num_classes, temperatura, peso):
+    """peso * KL(profesor_T || alumno_T) * T² + (1 - peso) * entropía cruzada con la etiqueta
+
+    El alumno termina en softmax (el backend sirve probabilidades): softmax(log(p) / T) es
+    exactamente softmax(logits / T), así que no hace falta exponer los logits.
+    """
+    def perdida(objetivo, probabilidades):
+        reales, suaves = objetivo[:, :num_classes], objetivo[:, num_classes:]
+        dura = keras.losses.categorical_crossentropy(reales, probabilidades)
+        logits = tf.math.log(tf.clip_by_value(probabilidades, 1e-7, 1.0)) / temperatura
+        blanda = keras.losses.kl_divergence(suaves, tf.nn.softmax(logits)) * temperatura ** 2
+        return peso * blanda + (1.0 - peso) * dura
+    return perdida
+
+def accuracy_etiquetas(num_classes):
+    def accuracy(objetivo, probabilidades):
+        return keras.metrics.categorical_accuracy(objetivo[:, :num_classes], probabilidades)
+    return accuracy
+
+def compilar_alumno(model, learning_rate, num_classes, temperatura, peso):
+    model.compile(
+        optimizer=crear_optimizador(learning_rate),
+        loss=perdida_destilacion(num_classes, temperatura, peso),
+        metrics=[accuracy_etiquetas(num_classes)],
+    )
+    return model
+
+# --- Comparación ---
+
+def coste_preprocesado(img_size, repeticiones=30):
+    """p50 (ms) de decodificar y redimensionar una foto de 1600x1200 como hace el backend"""
+    ruido = np.random.default_rng(0).integers(0, 255, (300, 400, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(ruido).resize((1600, 1200), Image.BILINEAR).save(buffer, format='JPEG', quality=90)
+    datos = buffer.getvalue()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        imagen = Image.open(io.BytesIO(datos))
+        imagen.draft('RGB', (img_size, img_size))
+        np.asarray(imagen.convert('RGB').resize((img_size, img_size), Image.BILINEAR), dtype=np.float32)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.percentile(tiempos, 50))
+
+def reporte_destilacion(filas, configuracion, salida='reporte_destilacion.md'):
+    """filas: [(nombre, ruta, metricas, meta)] del profesor y del alumno, en ese orden"""
+    lineas = [
+        "# Destilación", "", configuracion, "",
+        "| Modelo | Entrada | Accuracy | Top-3 | ECE | Imgs/s | Latencia p50 (ms) | Preprocesado p50 (ms) | Tamaño (MB) |",
+        "|--------|---------|----------|-------|-----|--------|-------------------|-----------------------|-------------|",
+    ]
+    for nombre, ruta, m, meta in filas:
+        latencia = meta.get('latencia_p50_ms')
+        lineas.append(
+            f"| {nombre} ({os.path.basename(ruta)}) | {meta['img_size']} | {m['accuracy']*100:.2f}% | "
+            f"{m['top_k'][3]*100:.2f}% | {m['ece']:.3f} | {meta['imgs_por_segundo']:.1f} | "
+            f"{'-' if latencia is None else f'{latencia:.2f}'} | {meta['preprocesado_p50_ms']:.2f} | "
+            f"{os.path.getsize(ruta) / 1e6:.2f} |"
+        )
+    (_, ruta_p, profesor, meta_p), (_, ruta_a, alumno, meta_a) = filas
+    resumen = (f"El alumno conserva el {alumno['accuracy'] / max(profesor['accuracy'], 1e-9) * 100:.1f}% "
+               f"de la accuracy del profesor, con {os.path.getsize(ruta_p) / os.path.getsize(ruta_a):.1f}x "
+               f"menos tamaño y {meta_a['imgs_por_segundo'] / meta_p['imgs_por_segundo']:.1f}x más imágenes/s.")
+    lineas += ["", resumen]
+
+    with open(salida, 'w') as f:
+        f.write("\n".join(lineas) + "\n")
+    print("\n".join(lineas))
+    print(f"\nReporte guardado en: {salida}")
+
+def destilar(args):
+    configurar_cpu(args.intra_op, args.inter_op)
+    os.makedirs(args.directorio, exist_ok=True)
+
+    print(f"Salidas del profesor {args.profesor} (se calculan una vez y se reutilizan)...")
+    train_p, _, class_names = salidas_profesor(args.profesor, args.shards_dir, args.directorio, 'train', args.batch_size_profesor)
+    val_p, _, _ = salidas_profesor(args.profesor, args.shards_dir, args.directorio, 'val', args.batch_size_profesor)
+    num_classes = len(class_names)
+    if train_p.shape[1] != num_classes:
+        raise SystemExit(f"{args.profesor} tiene {train_p.shape[1]} salidas y los shards {num_classes} clases")
+
+    # Objetivos suavizados una sola vez en NumPy
+    train_ds = crear_dataset_destilacion(args.shards_dir, 'train', aplicar_temperatura(train_p, args.temperatura),
+                                         num_classes, args.batch_size, args.img_size, entrenamiento=True)
+    val_ds = crear_dataset_destilacion(args.shards_dir, 'val', aplicar_temperatura(val_p, args.temperatura),
+                                       num_classes, args.batch_size, args.img_size)
+
+    print(f"\nAlumno: MobileNetV2 alpha {args.alpha:g}, entrada {args.img_size}x{args.img_size}")
+    alumno = create_model(num_classes, alpha=args.alpha, img_size=args.img_size)
+    compilar_alumno(alumno, args.lr, num_classes, args.temperatura, args.peso_destilacion)
+    callbacks = [
+        keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True),
+        keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=3, min_lr=1e-7),
+    ]
+    tiempos = TiempoPorEpoca()
+    historia = alumno.fit(train_ds, validation_data=val_ds, epochs=args.epocas,
+                          callbacks=callbacks + [tiempos], verbose=1)
+
+    if args.fine_tuning_epocas > 0:
+        descongelar_bloques(alumno, args.bloques_fine_tuning, args.lr_fine_tuning)
+        # descongelar_bloques compila con la entropía cruzada: se vuelve a poner la de destilación
+        compilar_alumno(alumno, args.lr_fine_tuning, num_classes, args.temperatura, args.peso_destilacion)
+        epocas = len(historia.history['loss'])
+        alumno.fit(train_ds, validation_data=val_ds, epochs=epocas + args.fine_tuning_epocas,
+                   initial_epoch=epocas, callbacks=callbacks + [tiempos], verbose=1)
+
+    # Guardado con una pérdida estándar: el backend carga el .h5 sin objetos personalizados
+    alumno.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    ruta_alumno = f"alumno_alpha{args.alpha:g}_{args.img_size}.h5"
+    save_model_and_classes(alumno, class_names, ruta_alumno)
+    rutas = [ruta_alumno]
+    if args.tflite:
+        rutas.append(exportar_tflite(alumno, os.path.splitext(ruta_alumno)[0] + '.tflite'))
+
+    print("\nComparando profesor y alumno en Test...")
+    xs, etiquetas, firma, _ = split_desde_shards(args.shards_dir, 'test')
+    filas = []
+    for nombre, ruta in [('profesor', args.profesor)] + [('alumno', ruta) for ruta in rutas]:
+        salidas, meta = salidas_modelo(ruta, xs, firma, args.directorio, args.batch_size_profesor,
+                                       latencia=args.latencia)
+        meta['preprocesado_p50_ms'] = coste_preprocesado(meta['img_size'])
+        filas.append((nombre, ruta, calcular_metricas(salidas, etiquetas, num_classes, (1, 3)), meta))
+
+    configuracion = (f"Alumno MobileNetV2 alpha {args.alpha:g} a {args.img_size}x{args.img_size}; "
+                     f"T={args.temperatura:g}, peso KL {args.peso_destilacion:g}; "
+                     f"{len(tiempos.tiempos)} épocas, {np.mean(tiempos.tiempos):.1f} s/época")
+    reporte_destilacion(filas[:2], configuracion, args.reporte)
+    for fila in filas[2:]:
+        print(f"{os.path.basename(fila[1])}: accuracy {fila[2]['accuracy']*100:.2f}%, "
+              f"{fila[3]['imgs_por_segundo']:.1f} imgs/s, {os.path.getsize(fila[1]) / 1e6:.2f} MB")
+
+    print(f"\nPublicar en el backend (preprocesa directamente a {args.img_size}x{args.img_size}):")
+    print(f"python ../backend/registro_modelos.py --registro ../backend/modelos publicar {rutas[-1]} "
+          f"--classes classes.txt --img-size {args.img_size}")
+    return filas
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Destila el modelo entrenado en un alumno más pequeño")
+    parser.add_argument('--profesor', default='best_model_20_clases.h5', help='Modelo ya entrenado (.h5, .tflite, .onnx)')
+    parser.add_argument('--shards-dir', default='dataset_shards', help='Carpeta generada por preparar_dataset.py')
+    parser.add_argument('--alpha', type=float, choices=[0.35, 0.5, 0.75, 1.0], default=0.35,
+                        help='Ancho de MobileNetV2 del alumno')
+    parser.add_argument('--img-size', type=int, choices=[96, 128, 160, 192, 224], default=128,
+                        help='Resolución de entrada del alumno (con pesos de ImageNet)')
+    parser.add_argument('--temperatura', type=float, default=4.0, help='Temperatura de los objetivos blandos')
+    parser.add_argument('--peso-destilacion', type=float, default=0.7,
+                        help='Peso del término del profesor frente a la etiqueta real (0-1)')
+    parser.add_argument('--epocas', type=int, default=10)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--fine-tuning-epocas', type=int, default=0,
+                        help='Épocas con los últimos bloques del alumno descongelados')
+    parser.add_argument('--bloques-fine-tuning', type=int, default=5)
+    parser.add_argument('--lr-fine-tuning', type=float, default=1e-4)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-size-profesor', type=int, default=256, help='Lote para inferir con el profesor')
+    parser.add_argument('--directorio', default='evaluacion',
+                        help='Caché de salidas de los modelos (compartida con evaluacion.py)')
+    parser.add_argument('--latencia', type=int, default=50, help='Repeticiones para la latencia de una imagen')
+    parser.add_argument('--tflite', action='store_true', help='Exportar también el alumno a TFLite')
+    parser.add_argument('--reporte', default='reporte_destilacion.md')
+    parser.add_argument('--intra-op', type=int, default=0, help='Hilos por operación (0 = automático)')
+    parser.add_argument('--inter-op', type=int, default=0, help='Operaciones en paralelo (0 = automático)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    destilar(parse_args())
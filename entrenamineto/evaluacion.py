@@ -0,0 +1,447 @@
+"""Evaluación rápida de uno o varios modelos sobre el split Test
+
+Cada artefacto (.h5, .tflite, .onnx) se ejecuta una sola vez sobre el Test en lotes grandes
+y sus salidas se guardan en un .npy reutilizable. A partir de ellas se calculan en NumPy,
+sin volver a ejecutar el modelo, la matriz de confusión, precisión/recall/F1 por clase,
+accuracy top-k, log loss y error de calibración (ECE). Con varios --modelos se genera una
+tabla comparativa para elegir el que se despliega.
+
+Con --calibrar se ajusta la temperatura de cada modelo y se escribe junto al artefacto el
+.calibracion.json que aplica el backend; conviene hacerlo sobre el split de validación
+(--split val, con shards). Con --cascada se simula, con las mismas salidas guardadas, qué
+accuracy y qué coste tendría servir un modelo rápido que escala las imágenes dudosas.
+
+Uso:
+    python evaluacion.py --modelos modelo.h5 best_model_20_clases.h5 best_model_20_clases_int8.tflite
+    python evaluacion.py --modelos best_model_20_clases.h5 --shards-dir dataset_shards --latencia 50
+    python evaluacion.py --modelos modelo_rapido.tflite modelo.h5 --shards-dir dataset_shards --split val \
+        --calibrar --cascada modelo_rapido.tflite modelo.h5 --latencia 50
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from numpy.lib.format import open_memmap
+from PIL import Image
+from preparar_dataset import listar_imagenes, cargar_imagen, leer_manifest, cargar_split
+
+# --- Métricas (solo NumPy) ---
+
+def matriz_confusion(etiquetas, predicciones, num_classes):
+    """Filas: clase real; columnas: clase predicha"""
+    indices = etiquetas.astype(np.int64) * num_classes + predicciones
+    return np.bincount(indices, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+def metricas_por_clase(matriz):
+    aciertos = np.diag(matriz).astype(np.float64)
+    predichas = matriz.sum(axis=0)
+    soporte = matriz.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predichas > 0, aciertos / predichas, 0.0)
+        recall = np.where(soporte > 0, aciertos / soporte, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return precision, recall, f1, soporte
+
+def accuracy_top_k(probabilidades, etiquetas, k):
+    k = min(k, probabilidades.shape[1])
+    # argpartition: no hace falta ordenar todas las clases para saber si la real está entre las k
+    mejores = np.argpartition(-probabilidades, k - 1, axis=1)[:, :k]
+    return float(np.mean(np.any(mejores == etiquetas[:, None], axis=1)))
+
+def error_calibracion(probabilidades, etiquetas, bins=15):
+    """ECE: diferencia media ponderada entre confianza y accuracy en `bins` tramos de confianza"""
+    confianza = probabilidades.max(axis=1)
+    acierto = (probabilidades.argmax(axis=1) == etiquetas).astype(np.float64)
+    tramo = np.minimum((confianza * bins).astype(np.int64), bins - 1)
+    n = np.bincount(tramo, minlength=bins)
+    suma_confianza = np.bincount(tramo, weights=confianza, minlength=bins)
+    suma_acierto = np.bincount(tramo, weights=acierto, minlength=bins)
+    return float(np.abs(suma_confianza - suma_acierto).sum() / max(len(etiquetas), 1))
+
+def log_loss(probabilidades, etiquetas):
+    reales = probabilidades[np.arange(len(etiquetas)), etiquetas]
+    return float(-np.mean(np.log(np.clip(reales, 1e-7, 1.0))))
+
+# --- Calibración y umbrales ---
+
+def aplicar_temperatura(probabilidades, temperatura):
+    """softmax(log(p) / T): lo mismo que hace runtimes.calibrar en el backend"""
+    logits = np.log(np.clip(probabilidades, 1e-12, 1.0)) / temperatura
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def ajustar_temperatura(probabilidades, etiquetas, minimo=0.05, maximo=20.0, iteraciones=60):
+    """Temperatura que minimiza el log loss (búsqueda de sección áurea sobre log T)"""
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    perdida = lambda log_t: log_loss(aplicar_temperatura(probabilidades, np.exp(log_t)), etiquetas)
+    a, b = np.log(minimo), np.log(maximo)
+    phi = (np.sqrt(5) - 1) / 2
+    c, d = b - phi * (b - a), a + phi * (b - a)
+    fc, fd = perdida(c), perdida(d)
+    for _ in range(iteraciones):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - phi * (b - a)
+            fc = perdida(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + phi * (b - a)
+            fd = perdida(d)
+    return float(np.exp((a + b) / 2))
+
+def cobertura_por_umbral(probabilidades, etiquetas, umbrales):
+    """Para cada umbral: fracción de imágenes con respuesta y accuracy entre ellas"""
+    confianza = probabilidades.max(axis=1)
+    acierto = probabilidades.argmax(axis=1) == etiquetas
+    filas = []
+    for umbral in umbrales:
+        aceptadas = confianza >= umbral
+        filas.append((umbral, float(aceptadas.mean()),
+                      float(acierto[aceptadas].mean()) if aceptadas.any() else 0.0))
+    return filas
+
+def simular_cascada(rapido, completo, etiquetas, umbrales, coste_rapido=1.0, coste_completo=1.0):
+    """Accuracy, fracción escalada y coste medio por imagen de la cascada para cada umbral"""
+    escalar = rapido.max(axis=1)[None, :] < np.asarray(umbrales)[:, None]
+    acierto_rapido = rapido.argmax(axis=1) == etiquetas
+    acierto_completo = completo.argmax(axis=1) == etiquetas
+    filas = []
+    for umbral, escaladas in zip(umbrales, escalar):
+        acierto = np.where(escaladas, acierto_completo, acierto_rapido)
+        fraccion = float(escaladas.mean())
+        filas.append((umbral, fraccion, float(acierto.mean()), coste_rapido + fraccion * coste_completo))
+    return filas
+
+def calibrar_modelo(ruta, probabilidades, etiquetas, split, bins=15):
+    """Ajusta la temperatura y la guarda en {artefacto}.calibracion.json para el backend"""
+    temperatura = ajustar_temperatura(probabilidades, etiquetas)
+    calibradas = aplicar_temperatura(probabilidades, temperatura)
+    datos = {
+        'temperatura': temperatura,
+        'split': split,
+        'num_imagenes': int(len(etiquetas)),
+        'ece_antes': error_calibracion(probabilidades, etiquetas, bins),
+        'ece_despues': error_calibracion(calibradas, etiquetas, bins),
+        'log_loss_antes': log_loss(probabilidades, etiquetas),
+        'log_loss_despues': log_loss(calibradas, etiquetas),
+    }
+    with open(os.path.splitext(ruta)[0] + '.calibracion.json', 'w') as f:
+        json.dump(datos, f, indent=2)
+    return calibradas, datos
+
+def calcular_metricas(probabilidades, etiquetas, num_classes, top_k=(1, 3, 5), bins=15):
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    etiquetas = np.asarray(etiquetas, dtype=np.int64)
+    matriz = matriz_confusion(etiquetas, probabilidades.argmax(axis=1), num_classes)
+    precision, recall, f1, soporte = metricas_por_clase(matriz)
+    return {
+        'num_imagenes': int(len(etiquetas)),
+        'accuracy': float(np.trace(matriz) / max(matriz.sum(), 1)),
+        'top_k': {k: accuracy_top_k(probabilidades, etiquetas, k) for k in top_k},
+        'f1_macro': float(f1[soporte > 0].mean()) if soporte.any() else 0.0,
+        'log_loss': log_loss(probabilidades, etiquetas),
+        'ece': error_calibracion(probabilidades, etiquetas, bins),
+        'matriz': matriz,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'soporte': soporte,
+    }
+
+# --- Datos de Test ---
+
+def _decodificar(tarea):
+    ruta, img_size = tarea
+    return cargar_imagen(ruta, img_size)
+
+def preparar_test(dataset_path, class_names, directorio, img_size=(224, 224), procesos=None):
+    """Decodifica una vez el Test a un .npy uint8 (memmap) que reutilizan todas las evaluaciones"""
+    rutas, etiquetas = listar_imagenes(os.path.join(dataset_path, 'Test'), class_names)
+    firma = hashlib.sha1(json.dumps([list(img_size), class_names, rutas]).encode()).hexdigest()
+    ruta_x = os.path.join(directorio, 'test_x.npy')
+    ruta_meta = os.path.join(directorio, 'test.json')
+
+    if os.path.exists(ruta_meta):
+        with open(ruta_meta) as f:
+            if json.load(f).get('firma') == firma and os.path.exists(ruta_x):
+                return np.load(ruta_x, mmap_mode='r'), np.asarray(etiquetas, dtype=np.int64), firma
+
+    print(f"Decodificando {len(rutas)} imágenes de Test en {ruta_x}...")
+    x = open_memmap(ruta_x + '.tmp', mode='w+', dtype=np.uint8,
+                    shape=(len(rutas), img_size[0], img_size[1], 3))
+    with Pool(procesos) as pool:
+        for i, imagen in enumerate(pool.imap(_decodificar, ((r, img_size) for r in rutas), chunksize=16)):
+            x[i] = imagen
+    x.flush()
+    del x
+    os.replace(ruta_x + '.tmp', ruta_x)
+    with open(ruta_meta, 'w') as f:
+        json.dump({'firma': firma, 'num_imagenes': len(rutas)}, f)
+    return np.load(ruta_x, mmap_mode='r'), np.asarray(etiquetas, dtype=np.int64), firma
+
+def split_desde_shards(directorio, split='test'):
+    """Un split de preparar_dataset.py como una lista de memmaps por shard"""
+    manifest = leer_manifest(directorio)
+    xs, ys = cargar_split(directorio, split)
+    firma = hashlib.sha1(json.dumps(manifest['splits'][split]).encode()).hexdigest()
+    return xs, np.concatenate(ys).astype(np.int64), firma, manifest['class_names']
+
+def redimensionar_lote(lote, img_size):
+    """Imágenes del Test a la resolución de un modelo con entrada más pequeña"""
+    return np.stack([np.asarray(Image.fromarray(imagen).resize((img_size, img_size), Image.BOX))
+                     for imagen in lote])
+
+def lotes_uint8(xs, batch_size):
+    for x in xs:
+        for inicio in range(0, len(x), batch_size):
+            yield x[inicio:inicio + batch_size]
+
+# --- Inferencia con caché de salidas ---
+
+def firma_artefacto(ruta):
+    estado = os.stat(ruta)
+    return {'ruta': os.path.abspath(ruta), 'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+def inferir(predecir, xs, batch_size=256, img_size=None):
+    """Salidas del modelo para todas las imágenes y su throughput (img/s)
+
+    Con img_size distinto del de los datos, cada lote se redimensiona antes del modelo.
+    """
+    total = sum(len(x) for x in xs)
+    salidas = None
+    buffer = None
+    escala = np.float32(1.0 / 255.0)
+    hechas = 0
+    inicio = time.perf_counter()
+    for lote in lotes_uint8(xs, batch_size):
+        if img_size and lote.shape[1] != img_size:
+            lote = redimensionar_lote(lote, img_size)
+        if buffer is None or buffer.shape[1:] != lote.shape[1:]:
+            buffer = np.empty((batch_size,) + lote.shape[1:], dtype=np.float32)
+        entrada = buffer[:len(lote)]
+        np.multiply(lote, escala, out=entrada)
+        resultado = np.asarray(predecir(entrada), dtype=np.float32)
+        if salidas is None:
+            salidas = np.empty((total, resultado.shape[1]), dtype=np.float32)
+        salidas[hechas:hechas + len(lote)] = resultado
+        hechas += len(lote)
+    return salidas, total / (time.perf_counter() - inicio)
+
+def latencia_unitaria(predecir, imagen, repeticiones, img_size=None):
+    """p50 y p95 (ms) de una imagen suelta, como en /predict"""
+    if img_size and imagen.shape[0] != img_size:
+        imagen = redimensionar_lote(imagen[None], img_size)[0]
+    entrada = (np.asarray(imagen, dtype=np.float32) / 255.0)[None]
+    predecir(entrada)
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        predecir(entrada)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(tiempos, 50)), float(np.percentile(tiempos, 95))
+
+def salidas_modelo(ruta, xs, firma_datos, directorio, batch_size=256, recalcular=False, latencia=0,
+                   split='test'):
+    """Salidas guardadas en {directorio}/{artefacto}.npy; el modelo solo se ejecuta si faltan o cambió"""
+    nombre = os.path.basename(ruta) + ('' if split == 'test' else f'.{split}')
+    ruta_npy = os.path.join(directorio, nombre + '.npy')
+    ruta_meta = os.path.join(directorio, nombre + '.json')
+    firma = {'artefacto': firma_artefacto(ruta), 'datos': firma_datos}
+
+    meta = None
+    if not recalcular and os.path.exists(ruta_meta) and os.path.exists(ruta_npy):
+        with open(ruta_meta) as f:
+            meta = json.load(f)
+        if meta.get('firma') != firma:
+            meta = None
+
+    predecir = None
+    if meta is None or latencia:
+        from clasificador_alimentos import crear_predictor
+        predecir = crear_predictor(ruta)
+
+    img_size = getattr(predecir, 'img_size', None)
+    if meta is None:
+        print(f"Ejecutando {nombre} sobre {sum(len(x) for x in xs)} imágenes...")
+        salidas, imgs_por_segundo = inferir(predecir, xs, batch_size, img_size)
+        np.save(ruta_npy, salidas)
+        meta = {'firma': firma, 'imgs_por_segundo': imgs_por_segundo, 'img_size': img_size or xs[0].shape[1]}
+    else:
+        print(f"{nombre}: salidas reutilizadas de {ruta_npy}")
+        salidas = np.load(ruta_npy)
+
+    if latencia:
+        meta['latencia_p50_ms'], meta['latencia_p95_ms'] = latencia_unitaria(predecir, xs[0][0], latencia, img_size)
+    with open(ruta_meta, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return salidas, meta
+
+# --- Reporte ---
+
+def tabla_por_clase(m, class_names):
+    lineas = [
+        "| Clase | Precisión | Recall | F1 | Soporte |",
+        "|-------|-----------|--------|----|---------|",
+    ]
+    # Las clases con peor F1 primero: son las que conviene revisar
+    for i in np.argsort(m['f1'], kind='stable'):
+        lineas.append(f"| {class_names[i]} | {m['precision'][i]*100:.1f}% | {m['recall'][i]*100:.1f}% | "
+                      f"{m['f1'][i]:.3f} | {int(m['soporte'][i])} |")
+    return lineas
+
+def confusiones_principales(matriz, class_names, n=10):
+    errores = matriz.copy()
+    np.fill_diagonal(errores, 0)
+    planos = np.argsort(errores, axis=None)[::-1][:n]
+    lineas = []
+    for real, predicha in zip(*np.unravel_index(planos, errores.shape)):
+        if errores[real, predicha] == 0:
+            break
+        lineas.append(f"- {class_names[real]} → {class_names[predicha]}: {int(errores[real, predicha])}")
+    return lineas
+
+def tabla_umbrales(filas):
+    lineas = [
+        "| Umbral | Con respuesta | Accuracy de las respondidas |",
+        "|--------|---------------|-----------------------------|",
+    ]
+    for umbral, cobertura, accuracy in filas:
+        lineas.append(f"| {umbral:.2f} | {cobertura*100:.1f}% | {accuracy*100:.2f}% |")
+    return lineas
+
+def tabla_cascada(filas, coste):
+    lineas = [
+        f"| Umbral | Escaladas | Accuracy | Coste por imagen ({coste}) |",
+        "|--------|-----------|----------|---------------------------|",
+    ]
+    for umbral, escaladas, accuracy, coste_medio in filas:
+        lineas.append(f"| {umbral:.2f} | {escaladas*100:.1f}% | {accuracy*100:.2f}% | {coste_medio:.3f} |")
+    return lineas
+
+def reporte_evaluacion(resultados, class_names, salida='reporte_evaluacion.md', split='test', secciones=()):
+    """resultados: lista de (ruta_artefacto, metricas, meta); secciones: líneas extra al final"""
+    ks = list(resultados[0][1]['top_k'])
+    cabecera = ("| Artefacto | Accuracy | " + " | ".join(f"Top-{k}" for k in ks if k > 1) +
+                " | F1 macro | Log loss | ECE | Imgs/s | Latencia p50 (ms) | Tamaño (MB) |")
+    titulo = "Test" if split == 'test' else split
+    lineas = [f"# Evaluación en {titulo}", "", cabecera, "|" + "---|" * (cabecera.count("|") - 1)]
+    for ruta, m, meta in sorted(resultados, key=lambda r: -r[1]['accuracy']):
+        latencia = meta.get('latencia_p50_ms')
+        lineas.append(
+            f"| {os.path.basename(ruta)} | {m['accuracy']*100:.2f}% | " +
+            " | ".join(f"{m['top_k'][k]*100:.2f}%" for k in ks if k > 1) +
+            f" | {m['f1_macro']:.3f} | {m['log_loss']:.3f} | {m['ece']:.3f} | "
+            f"{meta.get('imgs_por_segundo', 0):.1f} | {'-' if latencia is None else f'{latencia:.2f}'} | "
+            f"{os.path.getsize(ruta) / 1e6:.2f} |"
+        )
+
+    for ruta, m, _ in resultados:
+        lineas += ["", f"## {os.path.basename(ruta)}", ""]
+        lineas += tabla_por_clase(m, class_names)
+        confusiones = confusiones_principales(m['matriz'], class_names)
+        if confusiones:
+            lineas += ["", "Confusiones más frecuentes (real → predicha):", ""] + confusiones
+        if 'umbrales' in m:
+            lineas += ["", "Respuestas por umbral de confianza (CONFIDENCE_THRESHOLD):", ""]
+            lineas += tabla_umbrales(m['umbrales'])
+    lineas += list(secciones)
+
+    with open(salida, 'w') as f:
+        f.write("\n".join(lineas) + "\n")
+    print("\n".join(lineas[:4 + len(resultados)]))
+    print(f"\nReporte guardado en: {salida}")
+
+def guardar_matriz(matriz, class_names, ruta):
+    with open(ruta, 'w') as f:
+        f.write("real\\predicha," + ",".join(class_names) + "\n")
+        for nombre, fila in zip(class_names, matriz):
+            f.write(nombre + "," + ",".join(str(int(v)) for v in fila) + "\n")
+
+def evaluar(args):
+    os.makedirs(args.directorio, exist_ok=True)
+    if args.shards_dir:
+        xs, etiquetas, firma_datos, class_names = split_desde_shards(args.shards_dir, args.split)
+    elif args.split != 'test':
+        raise SystemExit("--split val necesita --shards-dir (dataset/ solo tiene Test)")
+    else:
+        with open(args.classes) as f:
+            class_names = [line.strip() for line in f if line.strip()]
+        x, etiquetas, firma_datos = preparar_test(args.dataset, class_names, args.directorio,
+                                                  (args.img_size, args.img_size), args.procesos)
+        xs = [x]
+
+    resultados = []
+    secciones = []
+    probabilidades = {}
+    for ruta in args.modelos:
+        salidas, meta = salidas_modelo(ruta, xs, firma_datos, args.directorio, args.batch_size,
+                                       args.recalcular, args.latencia, args.split)
+        if salidas.shape[1] != len(class_names):
+            raise SystemExit(f"{ruta} tiene {salidas.shape[1]} salidas y hay {len(class_names)} clases")
+        if args.calibrar:
+            salidas, calibracion = calibrar_modelo(ruta, salidas, etiquetas, args.split, args.bins)
+            secciones.append(f"- {os.path.basename(ruta)}: T={calibracion['temperatura']:.3f}, "
+                             f"ECE {calibracion['ece_antes']:.3f} → {calibracion['ece_despues']:.3f}, "
+                             f"log loss {calibracion['log_loss_antes']:.3f} → {calibracion['log_loss_despues']:.3f}")
+        m = calcular_metricas(salidas, etiquetas, len(class_names), tuple(args.top_k), args.bins)
+        m['umbrales'] = cobertura_por_umbral(salidas, etiquetas, args.umbrales)
+        guardar_matriz(m['matriz'], class_names,
+                       os.path.join(args.directorio, f"confusion_{os.path.basename(ruta)}.csv"))
+        resultados.append((ruta, m, meta))
+        probabilidades[ruta] = salidas
+    if secciones:
+        secciones = ["", "## Calibración (temperature scaling)", ""] + secciones
+
+    if args.cascada:
+        rapido, completo = args.cascada
+        if rapido not in probabilidades or completo not in probabilidades:
+            raise SystemExit("Los dos modelos de --cascada tienen que estar en --modelos")
+        metas = {ruta: meta for ruta, _, meta in resultados}
+        if 'latencia_p50_ms' in metas[rapido] and 'latencia_p50_ms' in metas[completo]:
+            costes, unidad = (metas[rapido]['latencia_p50_ms'], metas[completo]['latencia_p50_ms']), "ms p50"
+        else:
+            costes = (1000 / metas[rapido]['imgs_por_segundo'], 1000 / metas[completo]['imgs_por_segundo'])
+            unidad = "ms/img en lote"
+        filas = simular_cascada(probabilidades[rapido], probabilidades[completo], etiquetas,
+                                args.umbrales, *costes)
+        secciones += ["", f"## Cascada {os.path.basename(rapido)} → {os.path.basename(completo)} (CASCADE_THRESHOLD)", ""]
+        secciones += tabla_cascada(filas, unidad)
+
+    reporte_evaluacion(resultados, class_names, args.reporte, args.split, secciones)
+    return resultados
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluación y comparación de modelos en el split Test")
+    parser.add_argument('--modelos', nargs='+', default=['modelo.h5'],
+                        help='Artefactos a comparar (.h5, .tflite, .onnx)')
+    parser.add_argument('--dataset', default='dataset', help='Carpeta con Test/')
+    parser.add_argument('--classes', default='classes.txt', help='Clases de los modelos, en orden')
+    parser.add_argument('--shards-dir', help='Usar el Test de preparar_dataset.py en lugar de dataset/Test')
+    parser.add_argument('--directorio', default='evaluacion',
+                        help='Carpeta de las salidas guardadas (.npy) y las matrices de confusión')
+    parser.add_argument('--reporte', default='reporte_evaluacion.md')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--img-size', type=int, default=224)
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos para decodificar el Test')
+    parser.add_argument('--top-k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--bins', type=int, default=15, help='Tramos de confianza para el ECE')
+    parser.add_argument('--latencia', type=int, default=0,
+                        help='Repeticiones para medir la latencia de una imagen (0 = no medir)')
+    parser.add_argument('--recalcular', action='store_true', help='Volver a ejecutar los modelos')
+    parser.add_argument('--split', choices=['test', 'val'], default='test',
+                        help='Split de los shards a usar; val para calibrar sin tocar el Test')
+    parser.add_argument('--calibrar', action='store_true',
+                        help='Ajustar la temperatura de cada modelo y escribir {artefacto}.calibracion.json')
+    parser.add_argument('--umbrales', type=float, nargs='+',
+                        default=[0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9],
+                        help='Umbrales de confianza para las tablas de cobertura y de cascada')
+    parser.add_argument('--cascada', nargs=2, metavar=('RAPIDO', 'COMPLETO'),
+                        help='Simular la cascada entre dos de los --modelos')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    evaluar(parse_args())
@@ -0,0 +1,231 @@
+"""Preprocesa una sola vez el dataset en shards binarios de imágenes uint8 ya redimensionadas
+
+Cada split (train, val, test) se guarda en shards NumPy ({split}_00000_x.npy con forma
+(N, alto, ancho, 3) y {split}_00000_y.npy con las etiquetas) más un manifest.json con las
+clases, el tamaño y la lista de shards. Los shards se escriben en paralelo con varios
+procesos y de forma atómica, así que si se interrumpe basta con volver a ejecutarlo:
+solo se generan los que faltan. No necesita TensorFlow.
+
+Uso:
+    python preparar_dataset.py --dataset dataset --salida dataset_shards [--procesos 8]
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from PIL import Image
+
+# 20 clases principales que queremos reconocer
+CLASES_PRINCIPALES = [
+    'Apple', 'Banana', 'Orange', 'Tomato', 'Carrot', 
+    'Cucumber', 'Onion', 'Peach', 'Pear', 'Cherry',
+    'Grape', 'Pepper', 'Potato', 'Avocado', 'Mango',
+    'Strawberry', 'Lemon', 'Watermelon', 'Corn', 'Eggplant'
+]
+
+
+def seleccionar_clases(train_path):
+    """Primera carpeta de Training que coincide con cada clase principal (máximo 20)"""
+    # Encontrar carpetas que coincidan con nuestras clases principales
+    all_classes = os.listdir(train_path)
+    selected_classes = []
+    
+    for clase_principal in CLASES_PRINCIPALES:
+        for folder_name in all_classes:
+            if clase_principal.lower() in folder_name.lower():
+                if folder_name not in selected_classes:
+                    selected_classes.append(folder_name)
+                    break
+    
+    # Limitar a 20 clases máximo
+    selected_classes = selected_classes[:20]
+    
+    print(f"Clases seleccionadas ({len(selected_classes)}):")
+    for i, clase in enumerate(selected_classes):
+        print(f"  {i+1}. {clase}")
+    
+    return selected_classes
+
+
+def listar_imagenes(carpeta, class_names):
+    """Rutas y etiquetas de las imágenes de cada clase, en orden alfabético como Keras"""
+    rutas, etiquetas = [], []
+    for etiqueta, clase in enumerate(class_names):
+        directorio = os.path.join(carpeta, clase)
+        nombres = sorted(e.name for e in os.scandir(directorio)
+                         if e.is_file() and e.name.lower().endswith(('.jpg', '.jpeg', '.png')))
+        rutas.extend(os.path.join(directorio, n) for n in nombres)
+        etiquetas.extend([etiqueta] * len(nombres))
+    return rutas, etiquetas
+
+def dividir_validacion(rutas, etiquetas, validation_split):
+    """Mismo reparto que flow_from_directory: el primer 20% de cada clase es validación"""
+    train, val = ([], []), ([], [])
+    for etiqueta in sorted(set(etiquetas)):
+        indices = [i for i, e in enumerate(etiquetas) if e == etiqueta]
+        corte = int(validation_split * len(indices))
+        for destino, parte in ((val, indices[:corte]), (train, indices[corte:])):
+            destino[0].extend(rutas[i] for i in parte)
+            destino[1].extend(etiquetas[i] for i in parte)
+    return train, val
+
+def planificar(dataset_path, img_size, imagenes_por_shard, validation_split=0.2, seed=42):
+    """Reparto determinista de imágenes en shards: igual en cada ejecución, para poder reanudar"""
+    train_path = os.path.join(dataset_path, 'Training')
+    class_names = seleccionar_clases(train_path)
+    rutas, etiquetas = listar_imagenes(train_path, class_names)
+    train, val = dividir_validacion(rutas, etiquetas, validation_split)
+    test = listar_imagenes(os.path.join(dataset_path, 'Test'), class_names)
+    
+    # El train se mezcla antes de partirlo para que cada shard tenga todas las clases
+    orden = np.random.default_rng(seed).permutation(len(train[0]))
+    train = ([train[0][i] for i in orden], [train[1][i] for i in orden])
+    
+    splits = {}
+    tareas = []
+    for split, (rutas_split, etiquetas_split) in (('train', train), ('val', val), ('test', test)):
+        shards = []
+        for inicio in range(0, len(rutas_split), imagenes_por_shard):
+            nombre = f"{split}_{len(shards):05d}"
+            fin = inicio + imagenes_por_shard
+            shards.append({'x': nombre + '_x.npy', 'y': nombre + '_y.npy', 'n': len(rutas_split[inicio:fin])})
+            tareas.append((nombre, rutas_split[inicio:fin], etiquetas_split[inicio:fin]))
+        splits[split] = {'num_imagenes': len(rutas_split), 'shards': shards}
+    
+    manifest = {
+        'class_names': class_names,
+        'img_size': list(img_size),
+        'imagenes_por_shard': imagenes_por_shard,
+        'validation_split': validation_split,
+        'seed': seed,
+        'splits': splits,
+        'completo': False,
+    }
+    return manifest, tareas
+
+def indices_bilineales(tamano_origen, tamano_destino):
+    # Centros de píxel como tf.image.resize (half_pixel_centers), y en float32 como
+    # TensorFlow: con float64 algunos píxeles redondean a otro nivel
+    escala = np.float32(tamano_origen / tamano_destino)
+    posicion = (np.arange(tamano_destino, dtype=np.float32) + 0.5) * escala - 0.5
+    inferior = np.floor(posicion)
+    peso = posicion - inferior
+    inferior = np.maximum(inferior, 0).astype(np.intp)
+    superior = np.minimum(np.ceil(posicion), tamano_origen - 1).astype(np.intp)
+    return inferior, superior, peso
+
+def redimensionar_bilineal(imagen, img_size):
+    """Igual que tf.image.resize(imagen, img_size) bilineal + tf.round, sin TensorFlow
+
+    Image.BILINEAR de PIL no sirve: al reducir promedia toda la ventana (antialiasing) y
+    tf.image.resize solo interpola los 4 vecinos, así que las imágenes de los shards no
+    serían las mismas que las del pipeline tf.data. Sobre los mismos píxeles el resultado
+    es idéntico; en JPEG queda una diferencia de pocos niveles porque tf.io.decode_image
+    usa la IDCT rápida de libjpeg y PIL la exacta.
+    """
+    y0, y1, peso_y = indices_bilineales(imagen.shape[0], img_size[0])
+    x0, x1, peso_x = indices_bilineales(imagen.shape[1], img_size[1])
+    filas_arriba = imagen[y0].astype(np.float32)
+    filas_abajo = imagen[y1].astype(np.float32)
+    peso_x = peso_x[:, None]
+    arriba = filas_arriba[:, x0] + (filas_arriba[:, x1] - filas_arriba[:, x0]) * peso_x
+    abajo = filas_abajo[:, x0] + (filas_abajo[:, x1] - filas_abajo[:, x0]) * peso_x
+    resultado = arriba + (abajo - arriba) * peso_y[:, None, None]
+    return np.round(resultado).astype(np.uint8)
+
+def cargar_imagen(ruta, img_size):
+    with Image.open(ruta) as imagen:
+        return redimensionar_bilineal(np.asarray(imagen.convert('RGB')), img_size)
+
+def escribir_shard(tarea):
+    nombre, rutas, etiquetas, salida, img_size = tarea
+    ruta_x = os.path.join(salida, nombre + '_x.npy')
+    ruta_y = os.path.join(salida, nombre + '_y.npy')
+    
+    x = np.empty((len(rutas), img_size[0], img_size[1], 3), dtype=np.uint8)
+    for i, ruta in enumerate(rutas):
+        x[i] = cargar_imagen(ruta, img_size)
+    
+    # Escritura atómica: un shard a medias nunca queda con su nombre final
+    for ruta, datos in ((ruta_y, np.asarray(etiquetas, dtype=np.int16)), (ruta_x, x)):
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as f:
+            np.save(f, datos)
+        os.replace(temporal, ruta)
+    return nombre, len(rutas)
+
+def shard_completo(salida, nombre):
+    # La x se escribe después de la y: si existe la x, el shard está completo
+    return os.path.exists(os.path.join(salida, nombre + '_x.npy'))
+
+def leer_manifest(directorio):
+    with open(os.path.join(directorio, 'manifest.json')) as f:
+        return json.load(f)
+
+def guardar_manifest(directorio, manifest):
+    temporal = os.path.join(directorio, 'manifest.json.tmp')
+    with open(temporal, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporal, os.path.join(directorio, 'manifest.json'))
+
+def preparar(dataset_path, salida, img_size=(224, 224), imagenes_por_shard=1024, procesos=None, forzar=False):
+    manifest, tareas = planificar(dataset_path, img_size, imagenes_por_shard)
+    os.makedirs(salida, exist_ok=True)
+    
+    if os.path.exists(os.path.join(salida, 'manifest.json')):
+        anterior = leer_manifest(salida)
+        anterior.pop('completo', None)
+        actual = {k: v for k, v in manifest.items() if k != 'completo'}
+        if anterior != actual:
+            if not forzar:
+                raise SystemExit(f"{salida} contiene shards de otra configuración; usa --forzar para regenerarlos")
+            for archivo in os.listdir(salida):
+                if archivo.endswith(('.npy', '.tmp')):
+                    os.remove(os.path.join(salida, archivo))
+    guardar_manifest(salida, manifest)
+    
+    pendientes = [(nombre, rutas, etiquetas, salida, tuple(img_size))
+                  for nombre, rutas, etiquetas in tareas if not shard_completo(salida, nombre)]
+    print(f"{len(tareas)} shards en total, {len(tareas) - len(pendientes)} ya hechos, {len(pendientes)} pendientes")
+    
+    inicio = time.perf_counter()
+    imagenes = 0
+    with Pool(procesos) as pool:
+        for i, (nombre, n) in enumerate(pool.imap_unordered(escribir_shard, pendientes), 1):
+            imagenes += n
+            transcurrido = time.perf_counter() - inicio
+            print(f"  [{i}/{len(pendientes)}] {nombre}: {n} imágenes ({imagenes / transcurrido:.0f} img/s)")
+    
+    manifest['completo'] = True
+    guardar_manifest(salida, manifest)
+    for split, datos in manifest['splits'].items():
+        print(f"- {split}: {datos['num_imagenes']} imágenes en {len(datos['shards'])} shards")
+    return manifest
+
+def cargar_split(directorio, split):
+    """(x, y) de un split leyendo los shards como memmap, sin cargarlos en memoria"""
+    manifest = leer_manifest(directorio)
+    if not manifest.get('completo'):
+        raise ValueError(f"Los shards de {directorio} están incompletos; vuelve a ejecutar preparar_dataset.py")
+    shards = manifest['splits'][split]['shards']
+    xs = [np.load(os.path.join(directorio, s['x']), mmap_mode='r') for s in shards]
+    ys = [np.load(os.path.join(directorio, s['y'])) for s in shards]
+    return xs, ys
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocesa el dataset en shards NumPy reanudables")
+    parser.add_argument('--dataset', default='dataset', help='Carpeta con Training/ y Test/')
+    parser.add_argument('--salida', default='dataset_shards', help='Carpeta de los shards y el manifest')
+    parser.add_argument('--img-size', type=int, default=224, help='Lado de las imágenes redimensionadas')
+    parser.add_argument('--imagenes-por-shard', type=int, default=1024)
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos en paralelo (por defecto, uno por CPU)')
+    parser.add_argument('--forzar', action='store_true',
+                        help='Regenerar si la carpeta tiene shards de otra configuración')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    preparar(args.dataset, args.salida, (args.img_size, args.img_size), args.imagenes_por_shard,
+             args.procesos, args.forzar)
@@ -25,7 +25,8 @@ function GeminiChat() {
     setIsLoading(true)
 
     try {
-      const response = await fetch('http://localhost:5001/chat', {
+      // La respuesta llega por fragmentos (Server-Sent Events) a medida que Gemini la genera
+      const response = await fetch('http://localhost:5001/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -33,14 +34,40 @@ function GeminiChat() {
         body: JSON.stringify({ mensaje: inputMessage })
       })
 
-      const data = await response.json()
-      
-      if (data.success) {
-        const botMessage = { type: 'bot', content: data.respuesta }
-        setMessages(prev => [...prev, botMessage])
-      } else {
-        const errorMessage = { type: 'bot', content: 'Lo siento, hubo un error procesando tu consulta. 😔' }
-        setMessages(prev => [...prev, errorMessage])
+      if (!response.ok) {
+        throw new Error('Error en el chat')
+      }
+
+      setMessages(prev => [...prev, { type: 'bot', content: '' }])
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      const appendToLastMessage = (text) => {
+        setMessages(prev => {
+          const updated = [...prev]
+          const last = updated[updated.length - 1]
+          updated[updated.length - 1] = { ...last, content: last.content + text }
+          return updated
+        })
+      }
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+        for (const event of events) {
+          if (!event.startsWith('data:')) continue
+          const data = JSON.parse(event.slice(5))
+          if (data.texto) {
+            setIsLoading(false)
+            appendToLastMessage(data.texto)
+          } else if (data.error) {
+            appendToLastMessage('Lo siento, hubo un error procesando tu consulta. 😔')
+          }
+        }
       }
     } catch (error) {
       const errorMessage = { type: 'bot', content: 'Error de conexión. Por favor, intenta de nuevo. 🔄' }
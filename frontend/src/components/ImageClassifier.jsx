@@ -1,5 +1,5 @@
 import React, { useState } from 'react'
-import { predictImage } from '../services/api'
+import { analyzeImage } from '../services/api'
 
 function ImageClassifier() {
   const [selectedFile, setSelectedFile] = useState(null)
@@ -22,7 +22,7 @@ function ImageClassifier() {
 
     setLoading(true)
     try {
-      const prediction = await predictImage(selectedFile)
+      const prediction = await analyzeImage(selectedFile)
       setResult(prediction)
     } catch (error) {
       setResult({ error: 'Error al clasificar la imagen' })
@@ -65,8 +65,32 @@ function ImageClassifier() {
           ) : (
             <div className="result">
               <h3>Resultado:</h3>
-              <p><strong>Clase:</strong> {result.clase}</p>
-              <p><strong>Probabilidad:</strong> {result.probabilidad}%</p>
+              {result.incierto ? (
+                <p>No estoy seguro de qué alimento es (máximo {result.probabilidad}%)</p>
+              ) : (
+                <>
+                  <p><strong>Clase:</strong> {result.clase}</p>
+                  <p><strong>Probabilidad:</strong> {result.probabilidad}%</p>
+                </>
+              )}
+              {!result.incierto && result.predicciones?.[0]?.nutricion && (
+                <div className="nutrition-info">
+                  <h4>Información nutricional (100g):</h4>
+                  <p>Calorías: {result.predicciones[0].nutricion.calorias} kcal</p>
+                  <p>Carbohidratos: {result.predicciones[0].nutricion.carbs}g</p>
+                  <p>Proteína: {result.predicciones[0].nutricion.proteina}g</p>
+                  <p>Grasa: {result.predicciones[0].nutricion.grasa}g</p>
+                  <p>Fibra: {result.predicciones[0].nutricion.fibra}g</p>
+                </div>
+              )}
+              {result.predicciones?.length > (result.incierto ? 0 : 1) && (
+                <div className="alternatives">
+                  <h4>{result.incierto ? 'Posibilidades:' : 'Otras posibilidades:'}</h4>
+                  {result.predicciones.slice(result.incierto ? 0 : 1).map((p) => (
+                    <p key={p.id}>{p.clase}: {p.probabilidad}%</p>
+                  ))}
+                </div>
+              )}
             </div>
           )}
         </div>
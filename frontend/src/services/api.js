@@ -16,6 +16,27 @@ export const predictImage = async (file) => {
   return response.json()
 }
 
+export const analyzeImage = async (file, { topK = 3, mensaje } = {}) => {
+  const formData = new FormData()
+  formData.append('file', file)
+  formData.append('top_k', topK)
+  if (mensaje) {
+    formData.append('mensaje', mensaje)
+  }
+
+  // Predicción top-k, datos nutricionales y respuesta del asistente en una sola petición
+  const response = await fetch(`${API_BASE_URL}/analyze`, {
+    method: 'POST',
+    body: formData,
+  })
+
+  if (!response.ok) {
+    throw new Error('Error en el análisis')
+  }
+
+  return response.json()
+}
+
 export const sendChatMessage = async (message) => {
   const response = await fetch(`${API_BASE_URL}/chat`, {
     method: 'POST',
@@ -31,3 +52,41 @@ export const sendChatMessage = async (message) => {
 
   return response.json()
 }
+
+export const predictImageBatch = async (files, onResult) => {
+  const formData = new FormData()
+  for (const file of files) {
+    formData.append('files', file)
+  }
+
+  const response = await fetch(`${API_BASE_URL}/predict/batch`, {
+    method: 'POST',
+    body: formData,
+  })
+
+  if (!response.ok) {
+    throw new Error('Error en la predicción por lotes')
+  }
+
+  // La respuesta es NDJSON: un resultado por línea a medida que se procesan los trozos
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  const results = []
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop()
+    for (const line of lines) {
+      if (!line.trim()) continue
+      const result = JSON.parse(line)
+      results.push(result)
+      if (onResult) onResult(result)
+    }
+  }
+
+  return results
+}